@@ -0,0 +1,266 @@
+# multi board batched solving, vectorized engine
+# solves one set of ranges and one bet tree on K river boards at the same time.
+# the tree only depends on the pot, stacks and bet sizes, so it is built once, and every array in it (regrets, strategy
+# sums, showdown matrices) gets a leading board dimension where pysolver_vec has its river card dimension.
+# one numpy op per node handles every board, so the python overhead of an iteration is paid once for all K boards.
+# combos blocked by a board are masked out of that board (the same card removal as a turn spot's river cards).
+# exploitability is checked per board, a board that reaches the target has its solution written and is dropped from
+# the batch, so the others carry on with smaller arrays
+#
+# output: one solution json per board (same format as pysolver_vec) and batch_summary.json with each board's iterations,
+# exploitability and root EVs
+#
+# usage: python pysolver_batch.py inputs.txt out_dir --boards Kh9s5d3c2h,Qd8c4h3s2d   (or --boards-file boards.txt)
+
+import json, time, os, argparse
+import numpy as np
+from treys import Card, Evaluator
+from pysolver_v10 import Range, get_inputs, set_bet_config, FixedCheckSchedule, AdaptiveCheckSchedule
+from pysolver_vec import VecTree, combo_cards, board_cards
+from solver_profiler import Profiler, report_filename
+from solver_cache import RankCache, default_cache_dir
+from solver_isomorphism import CARD_INDEX
+
+
+class BoardBatchTree(VecTree):
+    '''VecTree of one river spot on several boards (list of 5 card board strings), batch entry k of every array is boards[k]'''
+    def __init__(self, starting_pot, starting_stack, OOP_range, IP_range, boards, dtype=np.float64, templates=None):
+        self.starting_pot = starting_pot
+        self.starting_stack = starting_stack
+        self.dtype = np.dtype(dtype)
+        self.state_dir = None
+        self.templates = templates
+        self.state = None
+        self.state_file = None
+        self.boards = list(boards)
+        if len(set(self.boards)) != len(self.boards):
+            raise ValueError('the same board is in the batch twice')
+        for board in self.boards:
+            if len(board_cards(board)) != 5:
+                raise ValueError(f'batched boards must be river boards (5 cards), got {board}')
+        self.board = board_cards(self.boards[0])
+        self.is_turn = False
+        board_idx = [np.array([CARD_INDEX[card] for card in board_cards(board)]) for board in self.boards]
+
+        # combos blocked by every board are dropped, the others are masked out of the boards that block them
+        self.ranges = []
+        self.masks = []
+        for player_range in (OOP_range, IP_range):
+            cards = np.array([combo_cards(hand.hand) for hand in player_range.hands_list], dtype=np.int64).reshape(-1, 2)
+            # masks[p][k, i] = combo i of player p doesn't hold a card of board k
+            mask = np.array([~np.isin(cards, idx).any(axis=1) for idx in board_idx]).reshape(len(self.boards), len(cards))
+            keep = mask.any(axis=0)
+            self.ranges.append(Range([hand for hand, kept in zip(player_range.hands_list, keep) if kept]))
+            self.masks.append(mask[:, keep].astype(self.dtype))
+        self.full_combos = [[hand.hand for hand in rg.hands_list] for rg in self.ranges]
+        self.combos = self.full_combos
+        self.full_weights = [np.array([hand.weighting for hand in rg.hands_list], dtype=self.dtype) for rg in self.ranges]
+        self.weights = self.full_weights
+        self.group = [None]
+        self.members = None
+        self.class_matrix = None
+
+        c0, c1 = [np.array([combo_cards(c) for c in combos], dtype=np.int64).reshape(-1, 2) for combos in self.full_combos]
+        clash = np.zeros((len(c0), len(c1)), dtype=bool)
+        for a in range(2):
+            for b in range(2):
+                clash |= c0[:, a, None] == c1[None, :, b]
+        self.full_valid = (~clash).astype(self.dtype)
+        self.valid = self.full_valid
+
+        self.river_rep_index = None
+        self.river_combo_perm = None
+        self.all_river_cards = []
+        self.river_cards = []
+        self.runouts = 1
+        self.nodes = []
+        self.showdown = None
+        self.iterations_done = 0
+        self.exploitabilities = None
+
+    def compute_equities(self, rank_cache=None):
+        '''showdown[k, i, j] = +1 if OOP combo i beats IP combo j on board k, -1 if it loses, 0 for a tie or if either is blocked'''
+        evaluator = Evaluator()
+        ranks = []
+        for player in (0, 1):
+            player_ranks = np.zeros((len(self.boards), len(self.combos[player])), dtype=np.int64)
+            for k, board in enumerate(self.boards):
+                cards = board_cards(board)
+                if rank_cache is not None:
+                    player_ranks[k] = rank_cache.combo_ranks(cards, self.combos[player])
+                    continue
+                board_ints = [Card.new(card) for card in cards]
+                for i, combo in enumerate(self.combos[player]):
+                    if self.masks[player][k, i]:
+                        player_ranks[k, i] = evaluator.evaluate(board_ints, [Card.new(combo[:2]), Card.new(combo[2:4])])
+            ranks.append(player_ranks)
+        showdown = np.sign(ranks[1][:, None, :] - ranks[0][:, :, None]).astype(self.dtype) * self.valid[None]
+        self.showdown = showdown * self.masks[0][:, :, None] * self.masks[1][:, None, :]
+        self.hand_ranks = ranks
+
+    def batch_size(self, street):
+        return len(self.boards)
+
+    def root_reach(self):
+        return self.weights[0][None, :] * self.masks[0], self.weights[1][None, :] * self.masks[1]
+
+    def export_mask(self, node, b):
+        return self.masks[node.to_act][b]
+
+    def calc_board_exploitabilities(self):
+        '''Returns [OOP exploitability, IP exploitability] of every board of the batch (array (boards, 2)) as a percent of the
+        starting pot, and the OOP EV on every board'''
+        reach0, reach1 = self.root_reach()
+        norm = np.einsum('ki,ij,kj->k', reach0, self.valid, reach1)
+        v0, v1 = self._evaluate(self.nodes[0], reach0, reach1)
+        ev0 = (reach0 * v0).sum(axis=1) / norm
+        ev1 = (reach1 * v1).sum(axis=1) / norm
+        br0 = (reach0 * self._best_response(self.nodes[0], 0, reach1)).sum(axis=1) / norm
+        br1 = (reach1 * self._best_response(self.nodes[0], 1, reach0)).sum(axis=1) / norm
+        return 100 * np.stack([br1 - ev1, br0 - ev0], axis=1) / self.starting_pot, ev0
+
+    def calc_exploitabilities(self):
+        '''[OOP, IP] exploitability of the worst board'''
+        expls, _ = self.calc_board_exploitabilities()
+        return [float(expls[:, 0].max()), float(expls[:, 1].max())]
+
+    def export_board(self, b):
+        '''The json solution of board b of the batch, _evaluate must have been run on the current strategies'''
+        return [self._export_node(node, ID, node.action_seq, b) for ID, node in enumerate(self.nodes)]
+
+    def keep_boards(self, keep):
+        '''Drops every board of the batch but the ones at the indices in keep'''
+        keep = np.asarray(keep, dtype=np.int64)
+        self.boards = [self.boards[k] for k in keep]
+        self.masks = [mask[keep] for mask in self.masks]
+        self.showdown = self.showdown[keep]
+        for node in self.nodes:
+            if node.kind == 'decision':
+                node.regrets = node.regrets[keep]
+                node.strat_sum = node.strat_sum[keep]
+
+    def do_batch_cfr(self, max_iter, target_expl, output_dir, profiler=None, check_schedule=None, max_seconds=None):
+        '''Solves every board of the batch, writing each board's solution to output_dir/<board>.json as soon as it reaches
+        target_expl (the rest at max_iter or max_seconds). Returns the summary rows of the boards, in the order they were given'''
+        if profiler is None:
+            profiler = Profiler(enabled=False)
+        if check_schedule is None:
+            check_schedule = FixedCheckSchedule()
+
+        start_time = time.perf_counter()
+        rows = {}
+        i = -1
+
+        def finish(indices, iterations):
+            # writes the solutions of the batch entries in indices, expls / EVs / the node values are from the last check
+            with profiler.timer('export_solution'):
+                for k in indices:
+                    board = self.boards[k]
+                    filename = os.path.join(output_dir, f'{board}.json')
+                    with open(filename, 'w') as json_file:
+                        json.dump(self.export_board(k), json_file)
+                    rows[board] = {'board': board, 'iterations': iterations, 'exploitability': float(expls[k].max()),
+                                   'OOP_exploitability': float(expls[k, 0]), 'IP_exploitability': float(expls[k, 1]),
+                                   'OOP_EV': float(EVs[k]), 'IP_EV': self.starting_pot - float(EVs[k]),
+                                   'solve_s': time.perf_counter() - start_time, 'solution': filename}
+                    print(f'{board}: done after {iterations} iterations, exploitability {rows[board]["exploitability"]}')
+
+        all_boards = list(self.boards)
+        for i in range(max_iter):
+            iter_start = time.perf_counter()
+            with profiler.iteration(i):
+                with profiler.timer('cfr_pass'):
+                    self._cfr(self.nodes[0], *self.root_reach(), i + 1)
+                profiler.count('board_iterations', len(self.boards))
+                check_schedule.record_iteration(time.perf_counter() - iter_start)
+
+                if check_schedule.should_check(i):
+                    check_start = time.perf_counter()
+                    with profiler.timer('calc_exploitability'):
+                        expls, EVs = self.calc_board_exploitabilities()
+                    worst = float(expls.max())
+                    check_schedule.record_check(i, time.perf_counter() - check_start, worst)
+                    profiler.count('exploitability_checks')
+                    print(f'iteration {i} / {max_iter}, {len(self.boards)} boards left\nExploitability:\t{worst}\n')
+                    done = [k for k in range(len(self.boards)) if expls[k].max() <= target_expl]
+                    if done:
+                        # calc_board_exploitabilities left the average strategy values on the nodes for the export
+                        finish(done, i + 1)
+                        if len(done) == len(self.boards):
+                            break
+                        keep = [k for k in range(len(self.boards)) if k not in done]
+                        self.keep_boards(keep)
+                        expls, EVs = expls[keep], EVs[keep]
+
+            if max_seconds is not None and time.perf_counter() - start_time >= max_seconds:
+                print(f'time budget of {max_seconds}s used at iteration {i}')
+                break
+
+        self.iterations_done += i + 1
+        if len(rows) < len(all_boards):
+            expls, EVs = self.calc_board_exploitabilities()
+            finish(range(len(self.boards)), i + 1)
+        self.exploitabilities = [max(row['OOP_exploitability'] for row in rows.values()), max(row['IP_exploitability'] for row in rows.values())]
+        profiler.set_info(final_exploitability=max(self.exploitabilities))
+        return [rows[board] for board in all_boards]
+
+
+def read_boards(text=None, filename=None):
+    '''Boards from a comma / whitespace separated string and / or a file with one board per line'''
+    boards = []
+    if text:
+        boards += text.replace(',', ' ').split()
+    if filename:
+        with open(filename, 'r') as board_file:
+            boards += board_file.read().replace(',', ' ').split()
+    return boards
+
+
+def main(inputs_file_name, output_dir, boards=None, profile=False, adaptive_checks=False, check_budget=0.1, max_seconds=None,
+         rank_cache=None, dtype='float64'):
+    '''Solves the spot in inputs_file_name on every board of boards (default the inputs file's board) in one batch.
+    Writes output_dir/<board>.json for every board and output_dir/batch_summary.json. Returns the BoardBatchTree'''
+    if isinstance(rank_cache, str):
+        rank_cache = RankCache(rank_cache)
+    profiler = Profiler(enabled=profile)
+    profiler.start()
+    with profiler.timer('get_inputs'):
+        potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl = get_inputs(inputs_file_name, drop_blocked=not boards)
+    set_bet_config(OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+    os.makedirs(output_dir, exist_ok=True)
+    tree = BoardBatchTree(potsz, stacksz, OOP_range, IP_range, boards or [board], dtype)
+    with profiler.timer('computeEquities'):
+        tree.compute_equities(rank_cache)
+    with profiler.timer('buildTree'):
+        tree.buildTree()
+    profiler.set_info(inputs_file=inputs_file_name, engine='vec-batch', boards=len(tree.boards), num_nodes=len(tree.nodes),
+                      num_decision_nodes=sum(1 for node in tree.nodes if node.kind == 'decision'),
+                      OOP_combos=len(tree.combos[0]), IP_combos=len(tree.combos[1]), max_iters=max_iters, target_expl=target_expl,
+                      dtype=tree.dtype.name)
+    with profiler.timer('do_cfr'):
+        check_schedule = AdaptiveCheckSchedule(target_expl, check_budget, last_iter=max_iters - 1) if adaptive_checks else None
+        rows = tree.do_batch_cfr(max_iters, target_expl, output_dir, profiler, check_schedule, max_seconds)
+    summary_file = os.path.join(output_dir, 'batch_summary.json')
+    with open(summary_file, 'w') as json_file:
+        json.dump(rows, json_file, indent=4)
+    profiler.stop()
+    if profiler.enabled:
+        profiler.write_report(report_filename(summary_file))
+    return tree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Solve one river spot on many boards at once with the vectorized engine')
+    parser.add_argument('inputs', nargs='?', default='solver_inputs.txt')
+    parser.add_argument('output_dir', nargs='?', default='batch_results')
+    parser.add_argument('--boards', help='comma separated river boards (default the inputs file board)')
+    parser.add_argument('--boards-file', help='file with one river board per line')
+    parser.add_argument('--profile', action='store_true', help='write a timing report next to the summary')
+    parser.add_argument('--adaptive-checks', action='store_true', help='schedule exploitability checks from their measured cost')
+    parser.add_argument('--check-budget', type=float, default=0.1, help='max fraction of solve time spent on adaptive checks')
+    parser.add_argument('--max-seconds', type=float, help='stop the solve after this many seconds')
+    parser.add_argument('--rank-cache', nargs='?', const=default_cache_dir(), help='reuse hand ranks from this on-disk cache directory (default ~/.cache/pysolver)')
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64', help='float type of every solver array')
+    args = parser.parse_args()
+    main(args.inputs, args.output_dir, read_boards(args.boards, args.boards_file), args.profile, args.adaptive_checks, args.check_budget,
+         args.max_seconds, args.rank_cache, args.dtype)
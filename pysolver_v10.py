@@ -23,28 +23,40 @@ ID = -1
 
 from treys import Card, Evaluator
 from collections import deque
-import json, time
+import json, time, os, argparse, math
 #import matplotlib.pyplot as plt
 import copy
 import numpy as np
+from solver_profiler import Profiler, report_filename
+from solver_telemetry import open_sink, regret_stats
+from solver_cache import RankCache, default_cache_dir
+from solver_store import CanonicalSpot, open_store, default_store_dir, write_stored_solution, store_solution, engine_name
+from solver_isomorphism import symmetry_group, reduce_range, class_pair_tables, expand_combos
+from solver_buckets import bucket_range
+from solver_snapshot import open_snapshot, layout_members
+from solver_async_check import AsyncChecker
+from solver_templates import TreeTemplate, TemplateCache, template_key, open_templates, default_template_dir
 
 
 def evalHS(evaluator, hand, board):
     return evaluator.evaluate(board, hand)
 
-def get_inputs(filename):
-    '''Returns potsz, stacksz, OOP_range(as dict), IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl'''
+def get_inputs(filename, drop_blocked=True):
+    '''Returns potsz, stacksz, OOP_range(as dict), IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl.
+    drop_blocked=False keeps the combos blocked by the board (for solving the ranges on other boards)'''
     with open(filename, 'r') as file:
         lines = [line.strip() for line in file]
 
     for i in range(5, 9):
         lines[i] = lines[i].replace('A', 'a')
 
+    board_cards = {lines[4][i:i+2] for i in range(0, len(lines[4]), 2)}
+
     def parse_range(line):
         hands = []
         for combo in line.split(','):
             stripped = combo.strip().replace('\t', '')
-            if combo[:2] in lines[4] or combo[2:4] in lines[4]: # combo blocked by the board so don't include
+            if drop_blocked and (stripped[:2] in board_cards or stripped[2:4] in board_cards): # combo blocked by the board so don't include
                 print(combo, 'blocked')
                 continue
             if ':' in stripped:
@@ -77,15 +89,64 @@ def get_inputs(filename):
 
     return float(lines[0]), float(lines[1]), Range(OOP_range), Range(IP_range), lines[4], lines[5].split(','), lines[6].split(','), lines[7].split(','), lines[8].split(','), float(lines[9]), int(lines[10]), float(lines[11])
 
+def set_bet_config(OOP_bet_sizes, IP_bet_sizes, OOP_raise_sizes, IP_raise_sizes, AI_threshold):
+    '''Sets the bet / raise size lists and all-in threshold that Node.getAvailActions builds trees from'''
+    global OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh
+    OOP_b_szs = [] if OOP_bet_sizes == [''] else OOP_bet_sizes
+    IP_b_szs = [] if IP_bet_sizes == [''] else IP_bet_sizes
+    OOP_r_szs = [] if OOP_raise_sizes == [''] else OOP_raise_sizes
+    IP_r_szs = [] if IP_raise_sizes == [''] else IP_raise_sizes
+    AI_thresh = AI_threshold
+
+float_dtype = np.dtype(np.float64) # of every regret / strategy / EV buffer, see set_dtype
+
+def set_dtype(dtype):
+    '''Sets the float type (float64 or float32) of the regret, strategy and EV arrays of every Hand created after this.
+    float32 halves their memory, the solution still converges to the same exploitability'''
+    global float_dtype
+    new_dtype = np.dtype(dtype)
+    if new_dtype not in (np.float32, np.float64):
+        raise ValueError(f'dtype must be float32 or float64, got {dtype}')
+    float_dtype = new_dtype
+
+memory_templates = TemplateCache() # tree_template's cache when it isn't given one
+
+def tree_template(pot, stack, cache=None):
+    '''The TreeTemplate of a full tree with this pot and stack under the current bet config (set_bet_config), from cache
+    (a TemplateCache, default an in-memory one) or built from an empty-range tree on a miss'''
+    cache = cache or memory_templates
+    key = template_key(pot, stack, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+    def build():
+        skeleton = Tree(pot, stack, Range([]), Range([]))
+        skeleton.buildTree()
+        return skeleton.to_template(key)
+    return cache.get(key, build)
+
+def json_floats(values, dtype=None):
+    '''Returns values (array or list) as python floats for the json output, float32 ones in their shortest decimal form,
+    which reads back as exactly the same float32'''
+    if np.dtype(dtype or float_dtype) == np.float32:
+        return [float(str(np.float32(value))) for value in values]
+    return [float(value) for value in values]
+
 def get_next_ID():
     global ID
     ID += 1
     return ID
 
-def computeEquities(range1, range2):
-    ''''Call at the start once know ranges to create a lookup dictionary of all equities of possible hands. range1&2 are Range objects'''
+def computeEquities(range1, range2, rank_cache=None):
+    ''''Call at the start once know ranges to create a lookup dictionary of all equities of possible hands. range1&2 are Range objects
+    rank_cache is an optional solver_cache.RankCache, the board's hand ranks are then read from disk instead of evaluated'''
     global equities
     equities = {} # dictionary with value being the EQ of first hand in key against second
+    if rank_cache is not None:
+        combos1 = [hand.hand for hand in range1.hands_list]
+        combos2 = [hand.hand for hand in range2.hands_list]
+        matrix = rank_cache.equity_matrix([Card.int_to_str(card) for card in board], combos1, combos2)
+        for i, combo1 in enumerate(combos1):
+            for j, combo2 in enumerate(combos2):
+                equities[(combo1, combo2)] = float(matrix[i, j])
+        return
     evaluator = Evaluator()
     
     for hand1 in range1.hands_list:
@@ -100,8 +161,31 @@ def computeEquities(range1, range2):
                 equities[(hand1.hand, hand2.hand)] = 0.5
     
 
+class_pairs = None # set when solving isomorphism classes or buckets, see solver_isomorphism.class_pair_tables
+
+def set_equities(equities_table, class_pairs_table=None):
+    '''Sets the equity lookups computeEquities / class_pair_tables made, in another process (see solver_async_check)'''
+    global equities, class_pairs
+    equities = equities_table
+    class_pairs = class_pairs_table
+
+def class_v_range_equity(hand, theRange):
+    '''hand_v_range_equity for isomorphism classes: each class pair is weighted by the share of its member pairs that don't share a card'''
+    weighting_sum = 0
+    equity_tally = 0
+    for theHand in theRange.hands_list:
+        valid, equity = class_pairs[(hand.hand, theHand.hand)]
+        weight = theHand.weighting * theHand.reach_probability * valid
+        weighting_sum += weight
+        equity_tally += weight * equity
+    if weighting_sum == 0:
+        return 0.5
+    return equity_tally / weighting_sum
+
 def hand_v_range_equity(hand, theRange):
     '''Returns the equity as a decimal of hand against theRange'''
+    if class_pairs is not None:
+        return class_v_range_equity(hand, theRange)
     blockers = {hand.hand[:2], hand.hand[2:]}
     weighting_sum = 0
     equity_tally = 0
@@ -149,30 +233,301 @@ def update_strat_on_iteration(action_freqs, action_EVs, cummulative_regrets, cou
     # Compute new strategy
     n_actions = len(action_freqs)
     if sum_of_pos_regrets <= 0:
-        new_strat = np.full(n_actions, 1.0 / n_actions)
+        new_strat = np.full(n_actions, 1.0 / n_actions, dtype=new_cumm_regs.dtype)
     else:
         new_strat = pos_regrets / sum_of_pos_regrets
     
     return new_strat, new_cumm_regs
     
 
+def sample_index(freqs, rng):
+    '''Index drawn with probability freqs[i] (freqs needn't sum to exactly 1)'''
+    cumulative = np.cumsum(freqs)
+    return min(int(np.searchsorted(cumulative, rng.random() * cumulative[-1], side='right')), len(freqs) - 1)
+
+
+class FixedCheckSchedule(object):
+    '''Checks exploitability every `every` iterations, starting from iteration `start`'''
+    def __init__(self, every=5, start=5):
+        self.every = every
+        self.start = start
+
+    def should_check(self, i):
+        return i % self.every == 0 and i >= self.start
+
+    def record_iteration(self, seconds):
+        pass
+
+    def record_check(self, i, seconds, exploitability):
+        pass
+
+    def restart(self, last_iter=None):
+        '''The schedule for another do_cfr loop on the same tree'''
+        return self
+
+
+class RegretPruning(object):
+    '''Regret based pruning for do_cfr. After the first `start` iterations, except on every recheck_every-th iteration:
+    - nodes the acting player reaches with less than reach_threshold of their range, and everything below them, are skipped
+      (below such a node the other player's counterfactual reach is 0 too, so nothing there would change)
+    - hands reaching a node with probability under reach_threshold keep their strategy there
+    - actions whose cumulative regret for a hand is below -regret_threshold * pot are not re-evaluated, their regret is updated
+      with their last EV. Regret matching plays them 0% anyway, and as their EVs are stale the node value the regrets are
+      measured against leaves them out (live_freqs).
+    The full iterations re-evaluate everything, so an action or line that has become good again is picked up'''
+    def __init__(self, regret_threshold=1.0, reach_threshold=1e-9, recheck_every=10, start=20):
+        self.regret_threshold = regret_threshold
+        self.reach_threshold = reach_threshold
+        self.recheck_every = recheck_every
+        self.start = start
+
+    def full_pass(self, i):
+        return i < self.start or i % self.recheck_every == 0
+
+    def prune_nodes(self, nodes):
+        '''Returns nodes (in BFS order) without the unreached ones and their subtrees'''
+        skipped = set()
+        kept = []
+        for node in nodes:
+            if node.parent_node is not None and node.parent_node.ID in skipped:
+                skipped.add(node.ID)
+            elif not node.endNode and node.player_range.get_range_reach() < self.reach_threshold:
+                skipped.add(node.ID)
+            else:
+                kept.append(node)
+        return kept
+
+    def hand_active(self, hand):
+        return hand.reach_probability >= self.reach_threshold
+
+    def pruned_actions(self, hand, node):
+        '''Boolean mask of the actions of hand at node that are pruned, never all of them'''
+        pruned = hand.cumm_regrets < -self.regret_threshold * node.pot_size
+        if pruned.all():
+            pruned[:] = False
+        return pruned
+
+    def live_freqs(self, freqs, pruned):
+        '''freqs with the pruned actions at 0 and the rest renormalised (even over the live actions if they had no weight)'''
+        live = np.where(pruned, 0, freqs)
+        total = live.sum()
+        if total <= 0:
+            return (~pruned) / (~pruned).sum()
+        return live / total
+
+
+class NodeFreezing(object):
+    '''Convergence-aware node freezing for do_cfr. After the first `start` iterations, every `window` iterations each decision
+    node's average strategies are compared with the ones a window before. The average moves window / iterations of the way
+    towards the strategies played in the window, so scaling the change up by that gives how far the node's current play is from
+    its average, which unlike the raw change doesn't shrink as the solve goes on. A node whose play is within tol of its average
+    and whose positive regrets grew by less than regret_tol of the pot per iteration (both averaged over the hands, weighted by
+    how much of each reaches the node, so hands that never get there don't keep it busy) is frozen: its hands
+    play their average strategy, and do_cfr skips the node's calc_EVs and strategy update. Playing the average leaves the average
+    as it is, so the node's average strategy stays correct while it is frozen. Every recheck_every iterations all nodes thaw,
+    and a node is frozen again only if it is still stable a window later. The rest of the tree can drift into exploiting a frozen
+    node in the meantime, so an exploitability check more than guard times the best one so far thaws every node straight away.
+    Range.calc_EVs walks the whole subtree below a node for every hand, so freezing the nodes near the root saves the most'''
+    def __init__(self, tol=0.02, regret_tol=1e-3, window=10, recheck_every=30, start=50, guard=3):
+        self.tol = tol
+        self.regret_tol = regret_tol
+        self.window = window
+        self.recheck_every = recheck_every
+        self.start = start
+        self.guard = guard
+        self.best = None # lowest exploitability checked
+        self.frozen = set() # action sequences (tuples) of the frozen nodes, node IDs change when prune_sizes rebuilds the tree
+        self.last = {} # action sequence: (average strategies, weighted positive regret) at the last window
+        self.freezes = 0
+        self.skipped = 0 # node iterations skipped
+        self.guard_thaws = 0
+
+    def active_nodes(self, nodes):
+        '''nodes without the frozen ones'''
+        if not self.frozen:
+            return nodes
+        active = [node for node in nodes if tuple(node.action_seq) not in self.frozen]
+        self.skipped += len(nodes) - len(active)
+        return active
+
+    def update(self, i, nodes, iterations=None):
+        '''Call after iteration i with the tree's nodes and the number of iterations in the average so far (default i + 1).
+        Returns the number of nodes frozen'''
+        iterations = iterations or i + 1
+        if i + 1 < self.start or (i + 1) % self.window:
+            return 0
+        if (i + 1) % self.recheck_every == 0:
+            self.thaw()
+        frozen = 0
+        for node in nodes:
+            seq = tuple(node.action_seq)
+            if node.endNode or node.isLocked or seq in self.frozen or not node.player_range.hands_list:
+                continue
+            hands = node.player_range.hands_list
+            reach = np.array([hand.weighting * hand.reach_probability for hand in hands])
+            total = reach.sum()
+            if total <= 0:
+                continue
+            avg = np.array([hand.avg_strat for hand in hands])
+            regret = float(reach @ np.array([np.maximum(hand.cumm_regrets, 0).max() for hand in hands])) / total
+            prev = self.last.get(seq)
+            self.last[seq] = (avg, regret)
+            if prev is None or prev[0].shape != avg.shape:
+                continue
+            # the average moves window / iterations of the way to the strategies played meanwhile, so this is how far those are from it
+            drift = float(reach @ np.abs(avg - prev[0]).max(axis=1)) / total * iterations / self.window
+            growth = (regret - prev[1]) / self.window / node.pot_size
+            if drift < self.tol and growth < self.regret_tol:
+                for hand in hands:
+                    hand.actions_taken = hand.avg_strat.copy()
+                    hand.next_strat = hand.avg_strat.copy()
+                self.frozen.add(seq)
+                frozen += 1
+        self.freezes += frozen
+        return frozen
+
+    def record_check(self, exploitability):
+        '''Call with every exploitability check'''
+        if self.best is not None and exploitability > self.guard * self.best and self.frozen:
+            self.thaw()
+            self.guard_thaws += 1
+        self.best = exploitability if self.best is None else min(self.best, exploitability)
+
+    def thaw(self):
+        '''Thaws every node and forgets the last window, eg after the tree is rebuilt with other actions'''
+        if self.frozen:
+            self.frozen.clear()
+            self.last = {}
+
+    def stats(self):
+        return {'frozen': len(self.frozen), 'freezes': self.freezes, 'skipped_node_iterations': self.skipped, 'guard_thaws': self.guard_thaws}
+
+
+class SizePruning(object):
+    '''Bet size pruning for do_cfr. At iteration warmup (and every `every` iterations after, if given) the bet and raise sizes
+    the range plays less than threshold of the time (and less than avg_threshold on average) are removed and the tree rebuilt without them (Tree.prune_sizes).
+    After the solve the full tree is rebuilt and its exploitability checked; if it's more than verify_tol (% of pot) worse than
+    the pruned tree's, up to verify_iters more iterations are run on the full tree'''
+    def __init__(self, warmup=100, threshold=0.005, avg_threshold=0.1, min_reach=0.01, every=None, verify_tol=0.1, verify_iters=50):
+        self.warmup = warmup
+        self.threshold = threshold
+        self.avg_threshold = avg_threshold
+        self.min_reach = min_reach
+        self.every = every
+        self.verify_tol = verify_tol
+        self.verify_iters = verify_iters
+        self.removed = 0
+
+    def should_prune(self, i):
+        if i == self.warmup:
+            return True
+        return self.every is not None and i > self.warmup and (i - self.warmup) % self.every == 0
+
+
+class AdaptiveCheckSchedule(object):
+    '''Schedules exploitability checks from their measured cost.
+    The gap between checks is always long enough that checking costs at most overhead_budget of the solve time.
+    On top of that, while exploitability is far above target_expl, the gap grows to a fraction (approach) of the predicted
+    number of iterations left, predicted from a power law fit (expl ~ a * iter^-k) of the last 2 checks, so checks get
+    more frequent as the target gets close. If last_iter is given the final iteration is always checked'''
+    def __init__(self, target_expl, overhead_budget=0.1, first_check=5, max_gap=100, approach=0.5, last_iter=None):
+        self.target_expl = target_expl
+        self.last_iter = last_iter
+        self.overhead_budget = overhead_budget
+        self.first_check = first_check
+        self.max_gap = max_gap
+        self.approach = approach
+        self.next_check = first_check
+        self.iter_cost = None
+        self.check_cost = None
+        self.history = [] # (iteration, exploitability) of each check
+
+    def should_check(self, i):
+        return i >= self.next_check
+
+    def record_iteration(self, seconds):
+        # exponential moving average so the estimate follows any drift in iteration cost
+        self.iter_cost = seconds if self.iter_cost is None else 0.8 * self.iter_cost + 0.2 * seconds
+
+    def record_check(self, i, seconds, exploitability):
+        self.check_cost = seconds if self.check_cost is None else 0.5 * self.check_cost + 0.5 * seconds
+        self.history.append((i + 1, exploitability))
+        self.next_check = i + self.next_gap()
+        if self.last_iter is not None and i < self.last_iter:
+            self.next_check = min(self.next_check, self.last_iter)
+
+    def restart(self, last_iter=None):
+        '''The schedule for another do_cfr loop on the same tree (iterations counted from 0 again) ending at last_iter,
+        keeping the measured iteration and check costs'''
+        self.last_iter = last_iter
+        self.next_check = self.first_check
+        self.history = []
+        return self
+
+    def budget_gap(self):
+        '''Smallest gap (in iterations) that keeps check time / total time <= overhead_budget'''
+        if not self.iter_cost or not self.check_cost:
+            return 1
+        return max(1, math.ceil(self.check_cost * (1 - self.overhead_budget) / (self.overhead_budget * self.iter_cost)))
+
+    def predicted_iters_left(self):
+        '''Predicted iterations until target_expl is reached, None if it can't be predicted yet'''
+        if len(self.history) < 2:
+            return None
+        (t1, e1), (t2, e2) = self.history[-2:]
+        if e2 <= self.target_expl:
+            return 0
+        if e1 <= 0 or e2 <= 0 or e2 >= e1 or self.target_expl <= 0:
+            return None
+        k = math.log(e1 / e2) / math.log(t2 / t1)
+        return t2 * (e2 / self.target_expl) ** (1 / k) - t2
+
+    def next_gap(self):
+        gap = self.budget_gap()
+        left = self.predicted_iters_left()
+        if left is not None:
+            gap = max(gap, min(int(self.approach * left), self.max_gap))
+        return gap
+
+
 class Tree(object):
     '''A game tree, which contains nodes'''
-    def __init__(self, starting_pot, starting_stack, OOP_range, IP_range):
+    def __init__(self, starting_pot, starting_stack, OOP_range, IP_range, root_seq=(), root_state=None):
+        '''root_seq makes this the subgame below that action sequence of the full tree (starting_pot / starting_stack are
+        still those of the full tree's root), the ranges are then the ranges as they reach it. root_state (pot, OOP stack, IP stack)
+        overrides the pot and stacks at the subgame root'''
         self.nodes = []
         self.starting_pot = starting_pot
         self.starting_stack = starting_stack
         self.OOP_start_range = OOP_range
         self.IP_start_range = IP_range
-
-    def buildTree(self):
+        self.iso_members = None # [OOP, IP] dicts of representative: members when solving isomorphism classes or buckets
+        self.iterations_done = 0 # iterations already averaged into avg_strat, so a re-solve continues the average
+        self.exploitabilities = None
+        self.active_nodes = None # IDs of the nodes CFR updates, None for all. Set by resolve
+        self.change_tol = None
+        self.root_seq = list(root_seq)
+        self.root_state = root_state
+        self.excluded = {} # action_seq tuple: actions left out of the tree at that node, see prune_sizes
+        self.pruned_nodes = {} # action_seq tuple: last state of the nodes prune_sizes took out, put back by restore_sizes
+
+    def buildTree(self, template=None):
+        '''Creates every node from the root. template is an optional TreeTemplate of this tree's pot, stack and bet config
+        (see tree_template) that the nodes are laid out from instead, not used for subgames or pruned sizes'''
+        if template is not None and not self.root_seq and not self.excluded:
+            self.build_from_template(template)
+            return
         # to create all nodes, starting from the root:
         # for every available action create a node
         # for each created node create more nodes based on avail actions, if not an endnode
 
         queue = deque()
         
-        root = Node(0, self.OOP_start_range, [], None, self.starting_pot, self.starting_stack, self.starting_stack)
+        # a copy, so a rebuild doesn't reset the strategies of the old root while they are transferred
+        root = Node(0, self.OOP_start_range.getCopy(), [], None, self.starting_pot, self.starting_stack, self.starting_stack)
+        if self.root_seq:
+            root = self.get_subgame_root(root)
+        self.exclude_actions(root)
         self.nodes.append(root)
         queue.append(root)
         
@@ -185,60 +540,212 @@ class Tree(object):
                 continue
             
             for action in available_actions:
-                # work out the variables for the child node
-                # initially don't change weightings for new nodes as strategies not yet initialised
-                if current_node.to_act == 0:
-                    next_range = self.IP_start_range.getCopy()
-                else:
-                    next_range = self.OOP_start_range.getCopy()
-
-                # work out new pot size and new IP & OOP stack sizes
-                if action in ('X', 'F'):
-                    new_ps = current_node.pot_size
-                    new_OOP_stack, new_IP_stack = current_node.OOP_stack_size, current_node.IP_stack_size
-                    
-                elif action == 'C':
-                    new_ps = abs(current_node.OOP_stack_size-current_node.IP_stack_size)+ current_node.pot_size
-                    new_OOP_stack = new_IP_stack = min(current_node.OOP_stack_size, current_node.IP_stack_size)
-                    
-                elif action[0] == 'B':
-                    if not action[1] == 'A':
-                        bet_made = (float(action[1:]) / 100 * current_node.pot_size)
-                    else:
-                        bet_made = current_node.OOP_stack_size
-                    new_ps = current_node.pot_size + bet_made
-                    
-                    if current_node.to_act == 0:
-                        new_OOP_stack = current_node.OOP_stack_size - bet_made
-                        new_IP_stack = current_node.IP_stack_size
-                    else:
-                        new_IP_stack = current_node.IP_stack_size - bet_made
-                        new_OOP_stack = current_node.OOP_stack_size
+                new_node = self.make_child(current_node, action)
+                self.exclude_actions(new_node)
+                current_node.child_nodes[action] = new_node
                 
+                self.nodes.append(new_node)
+                queue.append(new_node)  # Continue expansion
 
-                elif action[0] == 'R':
-                    if not action[1] == 'A':
-                        raise_amnt = (current_node.pot_size + abs(current_node.OOP_stack_size-current_node.IP_stack_size)) * float(action[1:])/100 # note this doesnt include the chips to "call" the last bet or raise before raising
-                        
-                    else:
-                        raise_amnt = max(current_node.OOP_stack_size,current_node.IP_stack_size) - abs(current_node.OOP_stack_size-current_node.IP_stack_size)
+        if self.root_seq:
+            # the action rules needed the ancestors while building, after that the subgame is cut off from them
+            root.parent_node = None
+        # the path to a subgame root or an earlier build used IDs too, so number from 0 like a fresh full tree
+        for i, node in enumerate(self.nodes):
+            node.ID = i
+
+    def to_template(self, key=None):
+        '''The TreeTemplate of this (full) tree'''
+        index = {node.ID: i for i, node in enumerate(self.nodes)}
+        rows = [[index[node.parent_node.ID] if node.parent_node is not None else None, node.action_seq[-1] if node.action_seq else None,
+                 node.to_act, node.pot_size, node.OOP_stack_size, node.IP_stack_size, list(node.availActs) if node.availActs else None]
+                for node in self.nodes]
+        return TreeTemplate(key, self.starting_pot, self.starting_stack, rows)
+
+    def build_from_template(self, template):
+        '''Lays out the nodes of template, each with a copy of the start range of its player. Only the initial strategies, regrets
+        and average strategies share one allocation: every hand's start at every node is a view of one block for the whole tree,
+        which saves 3 small allocations per hand at build time. do_cfr replaces them with new arrays from the first iteration on'''
+        hands = (self.OOP_start_range.hands_list, self.IP_start_range.hands_list)
+        sizes = [len(hands[row[2]]) * len(row[6]) if row[6] else 0 for row in template.rows]
+        block = np.empty((3, sum(sizes)), dtype=float_dtype)
+        offset = 0
+        self.nodes = []
+        for i, (parent, action, to_act, pot, OOP_stack, IP_stack, avail_acts) in enumerate(template.rows):
+            parent_node = self.nodes[parent] if parent is not None else None
+            action_seq = parent_node.action_seq + [action] if parent_node is not None else []
+            player_range = Range([Hand(hand.hand, hand.weighting) for hand in hands[to_act]])
+            node = Node(to_act, player_range, action_seq, parent_node, pot, OOP_stack, IP_stack, list(avail_acts) if avail_acts else None)
+            if avail_acts:
+                num_acts = len(avail_acts)
+                strats = block[:, offset:offset + sizes[i]].reshape(3, -1, num_acts)
+                offset += sizes[i]
+                strats[0] = round(1/num_acts, 3) # same start as Range.initialize_strats
+                strats[1] = 0
+                strats[2] = round(1/num_acts, 3)
+                for h, hand in enumerate(player_range.hands_list):
+                    hand.actions_taken, hand.cumm_regrets, hand.avg_strat = strats[0, h], strats[1, h], strats[2, h]
+            if parent_node is not None:
+                parent_node.child_nodes[action] = node
+            node.ID = i
+            self.nodes.append(node)
+
+    def exclude_actions(self, node):
+        '''Takes the actions in self.excluded out of node's available actions'''
+        excluded = self.excluded.get(tuple(node.action_seq))
+        if excluded and node.availActs:
+            node.availActs = [action for action in node.availActs if action not in excluded]
+            node.player_range.initialize_strats(len(node.availActs))
+
+    def unused_sizes(self, threshold, min_reach=0.01, avg_threshold=0.1):
+        '''Returns {action_seq tuple: bet / raise actions the range plays less than threshold of the time in the current strategy
+        and less than avg_threshold in the average strategy} at every unlocked node its player reaches with at least min_reach
+        of their range. The average carries the early iterations, so on its own it is slow to show a size has been given up.
+        Checks, calls and folds are always kept'''
+        unused = {}
+        for node in self.nodes:
+            if node.endNode or node.isLocked or node.player_range.get_range_reach() < min_reach:
+                continue
+            freqs = np.zeros(len(node.availActs))
+            avg_freqs = np.zeros(len(node.availActs))
+            total = 0
+            for hand in node.player_range.hands_list:
+                weight = hand.weighting * hand.reach_probability
+                freqs += weight * hand.actions_taken
+                avg_freqs += weight * hand.avg_strat
+                total += weight
+            freqs /= total
+            avg_freqs /= total
+            sizes = {action for action, freq, avg_freq in zip(node.availActs, freqs, avg_freqs)
+                     if action[0] in ('B', 'R') and freq < threshold and avg_freq < avg_threshold}
+            if sizes:
+                unused[tuple(node.action_seq)] = sizes
+        return unused
+
+    def transfer_state(self, old_nodes):
+        '''Copies regrets and strategies from the nodes of an earlier build of this tree (with other actions excluded) into
+        the nodes with the same action sequence. Actions the old node didn't have start at 0 regret and 0%'''
+        old_by_seq = {tuple(node.action_seq): node for node in old_nodes}
+        for node in self.nodes:
+            old = old_by_seq.get(tuple(node.action_seq))
+            if old is None or node.endNode or old.endNode:
+                continue
+            index = [old.availActs.index(action) if action in old.availActs else None for action in node.availActs]
+            old_hands = {old_hand.hand: old_hand for old_hand in old.player_range.hands_list}
+            for hand in node.player_range.hands_list:
+                old_hand = old_hands.get(hand.hand)
+                if old_hand is None:
+                    continue
+                def take(values, fill):
+                    return np.array([values[j] if j is not None else fill for j in index], dtype=float_dtype)
+                def normalise(strat):
+                    return strat / strat.sum() if strat.sum() > 0 else np.full(len(strat), 1 / len(strat))
+                hand.cumm_regrets = take(old_hand.cumm_regrets, 0.0)
+                hand.avg_strat = normalise(take(old_hand.avg_strat, 0.0))
+                hand.actions_taken = normalise(take(old_hand.actions_taken, 0.0))
+                hand.next_strat = hand.actions_taken.copy()
+                hand.EVs = take(old_hand.EVs, 0.0) if len(old_hand.EVs) == len(old.availActs) else np.array([])
+            if old.isLocked:
+                node.isLocked = True
+        self.update_reach_probs()
 
-                    new_ps = current_node.pot_size + abs(current_node.OOP_stack_size-current_node.IP_stack_size) + raise_amnt
+    def rebuild(self, excluded):
+        '''Rebuilds the tree with the actions in excluded ({action_seq tuple: actions}) left out, keeping regrets and strategies.
+        Nodes that are left out are kept aside, so putting an action back restores its subtree as it was'''
+        old_nodes = list(self.pruned_nodes.values()) + self.nodes # current nodes last, so they win
+        self.excluded = excluded
+        self.nodes = []
+        self.buildTree()
+        self.transfer_state(old_nodes)
+        seqs = {tuple(node.action_seq) for node in self.nodes}
+        self.pruned_nodes = {tuple(node.action_seq): node for node in old_nodes if tuple(node.action_seq) not in seqs}
+
+    def prune_sizes(self, threshold, min_reach=0.01, avg_threshold=0.1):
+        '''Removes the bet / raise sizes the solver has settled on not using (see unused_sizes) and rebuilds the smaller tree.
+        Returns the number of actions removed'''
+        unused = self.unused_sizes(threshold, min_reach, avg_threshold)
+        if not unused:
+            return 0
+        excluded = {seq: set(actions) for seq, actions in self.excluded.items()}
+        for seq, actions in unused.items():
+            excluded.setdefault(seq, set()).update(actions)
+        self.rebuild(excluded)
+        return sum(len(actions) for actions in unused.values())
+
+    def restore_sizes(self):
+        '''Rebuilds the full tree after prune_sizes, the removed actions at 0%'''
+        if self.excluded:
+            self.rebuild({})
+
+    def make_child(self, current_node, action):
+        '''Returns the node reached by taking action at current_node'''
+        # work out the variables for the child node
+        # initially don't change weightings for new nodes as strategies not yet initialised
+        if current_node.to_act == 0:
+            next_range = self.IP_start_range.getCopy()
+        else:
+            next_range = self.OOP_start_range.getCopy()
 
-                    if current_node.to_act:
-                        new_OOP_stack = current_node.OOP_stack_size
-                        new_IP_stack = current_node.OOP_stack_size - raise_amnt
-                    else:
-                        new_IP_stack = current_node.IP_stack_size
-                        new_OOP_stack = current_node.IP_stack_size - raise_amnt
-                    
-                
-                new_node = Node(1 - current_node.to_act, next_range, current_node.action_seq.copy()+[action], current_node, new_ps, new_OOP_stack, new_IP_stack)
-                current_node.child_nodes[action] = new_node
+        # work out new pot size and new IP & OOP stack sizes
+        if action in ('X', 'F'):
+            new_ps = current_node.pot_size
+            new_OOP_stack, new_IP_stack = current_node.OOP_stack_size, current_node.IP_stack_size
+            
+        elif action == 'C':
+            new_ps = abs(current_node.OOP_stack_size-current_node.IP_stack_size)+ current_node.pot_size
+            new_OOP_stack = new_IP_stack = min(current_node.OOP_stack_size, current_node.IP_stack_size)
+            
+        elif action[0] == 'B':
+            if not action[1] == 'A':
+                bet_made = (float(action[1:]) / 100 * current_node.pot_size)
+            else:
+                bet_made = current_node.OOP_stack_size
+            new_ps = current_node.pot_size + bet_made
+            
+            if current_node.to_act == 0:
+                new_OOP_stack = current_node.OOP_stack_size - bet_made
+                new_IP_stack = current_node.IP_stack_size
+            else:
+                new_IP_stack = current_node.IP_stack_size - bet_made
+                new_OOP_stack = current_node.OOP_stack_size
+        
+
+        elif action[0] == 'R':
+            if not action[1] == 'A':
+                raise_amnt = (current_node.pot_size + abs(current_node.OOP_stack_size-current_node.IP_stack_size)) * float(action[1:])/100 # note this doesnt include the chips to "call" the last bet or raise before raising
                 
-                self.nodes.append(new_node)
-                queue.append(new_node)  # Continue expansion
+            else:
+                raise_amnt = max(current_node.OOP_stack_size,current_node.IP_stack_size) - abs(current_node.OOP_stack_size-current_node.IP_stack_size)
 
+            new_ps = current_node.pot_size + abs(current_node.OOP_stack_size-current_node.IP_stack_size) + raise_amnt
+
+            if current_node.to_act:
+                new_OOP_stack = current_node.OOP_stack_size
+                new_IP_stack = current_node.OOP_stack_size - raise_amnt
+            else:
+                new_IP_stack = current_node.IP_stack_size
+                new_OOP_stack = current_node.IP_stack_size - raise_amnt
+            
+        
+        return Node(1 - current_node.to_act, next_range, current_node.action_seq.copy()+[action], current_node, new_ps, new_OOP_stack, new_IP_stack)
+
+    def get_subgame_root(self, root):
+        '''Follows root_seq from the root of the full tree and returns the node there, the root of the subgame.
+        The nodes on the way are only its ancestors (the action rules look back at them), they aren't part of the tree'''
+        node = root
+        for action in self.root_seq:
+            if not node.availActs or action not in node.availActs:
+                raise ValueError(f'{",".join(self.root_seq)} is not a line of this tree, {action} not in {node.availActs} at {node.action_seq}')
+            node = self.make_child(node, action)
+        if node.endNode:
+            raise ValueError(f'{",".join(self.root_seq)} ends the hand, a subgame needs a decision node')
+        if self.root_state is not None:
+            if node.action_seq[-1][0] in ('B', 'R'):
+                raise ValueError('pot and stacks of a node facing a bet follow from the bet sizes, only set them at the start of betting or after a check')
+            node.pot_size, node.OOP_stack_size, node.IP_stack_size = self.root_state
+            node.getAvailActions()
+            node.player_range.initialize_strats(len(node.availActs))
+        return node
 
     def update_reach_probs(self):
         '''Updates reach probabilities for all hands in all child nodes systematically'''
@@ -270,8 +777,20 @@ class Tree(object):
 
             
 
-    def do_cfr(self, max_iter, target_expl, json_filename):
-        '''Does CFR solve and saves to a json file'''
+    def do_cfr(self, max_iter, target_expl, json_filename, profiler=None, telemetry=None, check_schedule=None, max_seconds=None, pruning=None,
+               size_pruning=None, snapshot=None, async_checker=None, freezing=None):
+        '''Does CFR solve and saves to a json file. profiler is an optional solver_profiler.Profiler that times each phase,
+        telemetry an optional solver_telemetry sink that gets one event per iteration.
+        check_schedule decides when exploitability is checked (default every 5 iterations, see AdaptiveCheckSchedule),
+        max_seconds stops the solve once that much time has been spent, whatever the iteration.
+        pruning is an optional RegretPruning that skips unreached nodes / hands and very negative regret actions,
+        size_pruning an optional SizePruning that removes unused bet sizes from the tree during the solve (not with resolve).
+        snapshot is an optional solver_snapshot.SnapshotWriter of snapshot_layout() the average strategies are published to
+        every snapshot.every iterations and at the end.
+        async_checker is an optional solver_async_check.AsyncChecker of a copy of this tree. The checks then run in its process
+        back to back while CFR carries on (check_schedule is not used) and the solve stops at the first reported value under
+        target_expl. The strategy saved at the end is checked too, if it isn't the one reported last. Not with size_pruning.
+        freezing is an optional NodeFreezing that stops updating nodes whose average strategy has settled, rechecking them on a schedule'''
         # algorithm
         # loop until reach either max_iters or target exploitability
         # within loop:
@@ -281,75 +800,570 @@ class Tree(object):
         # then if every 5th iter, calc exploitability (EV OOP MAX-EXPL-STRAT + EV IP MAX-EXPL-STRAT) - TODO
         # then save into json file
         #
+        if profiler is None:
+            profiler = Profiler(enabled=False)
+        if check_schedule is None:
+            check_schedule = FixedCheckSchedule()
 
-        self.update_reach_probs()
+        num_hands = sum(len(node.player_range.hands_list) for node in self.nodes)
+        num_decision_nodes = sum(1 for node in self.nodes if not node.endNode)
+        num_decision_hands = sum(len(node.player_range.hands_list) for node in self.nodes if not node.endNode)
+        start_time = time.perf_counter()
+
+        with profiler.timer('update_reach_probs'):
+            self.update_reach_probs()
         exploitability = 100
+        player_expls = None
+        checked_at = None # iteration of the strategy the last check was of
 
         #x = []
         #y = []
 
         for i in range(max_iter):
             #time.sleep(1.5)
+            iter_start = time.perf_counter()
+            event = None
+            with profiler.iteration(i):
+
+                if size_pruning is not None and self.active_nodes is None and size_pruning.should_prune(i):
+                    with profiler.timer('prune_sizes'):
+                        removed = self.prune_sizes(size_pruning.threshold, size_pruning.min_reach, size_pruning.avg_threshold)
+                    if removed:
+                        size_pruning.removed += removed
+                        profiler.count('pruned_sizes', removed)
+                        if freezing is not None:
+                            freezing.thaw() # the rebuilt nodes with fewer actions have renormalised averages
+                        num_hands = sum(len(node.player_range.hands_list) for node in self.nodes)
+                        num_decision_nodes = sum(1 for node in self.nodes if not node.endNode)
+                        num_decision_hands = sum(len(node.player_range.hands_list) for node in self.nodes if not node.endNode)
+                        print(f'iteration {i}: removed {removed} unused bet sizes, {len(self.nodes)} nodes left\n')
             
-            # calc EVs for every hand in every node
-            for node in self.nodes:
-                node.player_range.calc_EVs(node)
-
-            for node in self.nodes:
-                if not node.endNode:
-                    reachedFreq = node.getCounterfactReachProb()
-                    for hand in node.player_range.hands_list:
-                        new_strat, new_cumm_regs = update_strat_on_iteration(hand.avg_strat, hand.EVs, hand.cumm_regrets, reachedFreq)
-                        hand.next_strat = new_strat
-                        hand.cumm_regrets = new_cumm_regs
-                        hand.add_strat_to_avg_strat(new_strat, i+1)
-
-            # now update the strategies to the next calculated one
-            for node in self.nodes:
-                for hand in node.player_range.hands_list:
-                    hand.actions_taken = hand.next_strat.copy()
+                if self.active_nodes is None:
+                    nodes = self.nodes
+                else:
+                    nodes = [node for node in self.nodes if node.ID in self.active_nodes]
+                    num_hands = sum(len(node.player_range.hands_list) for node in nodes)
+                    num_decision_nodes = sum(1 for node in nodes if not node.endNode and not node.isLocked)
+                    num_decision_hands = sum(len(node.player_range.hands_list) for node in nodes if not node.endNode and not node.isLocked)
+                changed_nodes = []
+                nodes_updated, hands_updated = num_decision_nodes, num_decision_hands
+                prune = pruning is not None and not pruning.full_pass(i)
+                if prune:
+                    num_nodes = len(nodes)
+                    nodes = pruning.prune_nodes(nodes)
+                    profiler.count('pruned_nodes', num_nodes - len(nodes))
+                    decision_nodes = [node for node in nodes if not node.endNode and not node.isLocked]
+                    nodes_updated = len(decision_nodes)
+                    hands_updated = sum(1 for node in decision_nodes for hand in node.player_range.hands_list if pruning.hand_active(hand))
+                if freezing is not None and freezing.frozen:
+                    nodes = freezing.active_nodes(nodes)
+                    decision_nodes = [node for node in nodes if not node.endNode and not node.isLocked]
+                    nodes_updated = len(decision_nodes)
+                    hands_updated = sum(len(node.player_range.hands_list) for node in decision_nodes)
+                    ev_hands = sum(len(node.player_range.hands_list) for node in nodes)
+                    profiler.count('frozen_nodes', len(freezing.frozen))
+                else:
+                    ev_hands = num_hands
 
-            self.update_reach_probs()
+                # calc EVs for every hand in every node
+                with profiler.timer('calc_EVs'):
+                    if prune:
+                        evaluated = sum(node.player_range.calc_EVs_pruned(node, pruning) for node in nodes)
+                        profiler.count('hand_action_EV_evals', evaluated)
+                    else:
+                        for node in nodes:
+                            node.player_range.calc_EVs(node)
+                        profiler.count('hand_EV_evals', ev_hands)
+                        if profiler.enabled:
+                            profiler.count('hand_action_EV_evals', sum(len(node.player_range.hands_list) * (1 if node.endNode else len(node.availActs))
+                                                                       for node in nodes))
+
+                with profiler.timer('update_strat_on_iteration'):
+                    for node in nodes:
+                        if not node.endNode and not node.isLocked: # locked nodes keep their strategy and regrets
+                            reachedFreq = node.getCounterfactReachProb()
+                            node_change = 0
+                            for hand in node.player_range.hands_list:
+                                if prune and not pruning.hand_active(hand):
+                                    continue
+                                freqs = hand.avg_strat
+                                pruned = pruning.pruned_actions(hand, node) if prune else None
+                                if pruned is not None and pruned.any():
+                                    # the EVs of pruned actions are stale, so the node value is taken over the live actions only
+                                    freqs = pruning.live_freqs(freqs, pruned)
+                                # pruned actions' regrets still move, by their last EV against the node value
+                                new_strat, new_cumm_regs = update_strat_on_iteration(freqs, hand.EVs, hand.cumm_regrets, reachedFreq)
+                                if self.change_tol is not None:
+                                    node_change = max(node_change, np.max(np.abs(new_strat - hand.actions_taken)))
+                                hand.next_strat = new_strat
+                                hand.cumm_regrets = new_cumm_regs
+                                hand.add_strat_to_avg_strat(new_strat, self.iterations_done + i + 1)
+                            if self.change_tol is not None and node_change > self.change_tol:
+                                changed_nodes.append(node)
+                profiler.count('hand_strat_updates', hands_updated)
+
+                if self.active_nodes is not None:
+                    # a node whose strategy moved changes the values above it and the ranges below it
+                    for node in changed_nodes:
+                        self.active_nodes.update(n.ID for n in node.get_ancestors())
+                        self.active_nodes.update(n.ID for n in node.get_subtree())
+
+                # now update the strategies to the next calculated one
+                with profiler.timer('apply_next_strats'):
+                    for node in nodes:
+                        for hand in node.player_range.hands_list:
+                            hand.actions_taken = hand.next_strat.copy()
+
+                with profiler.timer('update_reach_probs'):
+                    self.update_reach_probs()
+
+                if freezing is not None:
+                    freezing.update(i, self.nodes, self.iterations_done + i + 1)
             
 
-            # to add: every 5 iterations calc exploitability and if < target exploitability stop the solver
-            if i % 5 == 0 and i > 4:
-                exploitability = self.calc_exploitability()
-                #x.append(i)
-                #y.append(exploitability)
-                print(f'iteration {i} / {max_iter}\nExploitability:\t{exploitability}\n')
-                if exploitability <= target_expl:
-                    # stop the solver
-                    break
+                # to add: every 5 iterations calc exploitability and if < target exploitability stop the solver
+                iter_s = time.perf_counter() - iter_start
+                check_schedule.record_iteration(iter_s)
+
+                if telemetry is not None:
+                    abs_sum, pos_sum, reg_max = regret_stats(self.nodes)
+                    event = {'iter': i, 'iter_s': iter_s, 'nodes_updated': nodes_updated,
+                             'hands_updated': hands_updated, 'regret_abs_sum': abs_sum, 'regret_pos_sum': pos_sum,
+                             'regret_max': reg_max, 'exploitability': None, 'OOP_exploitability': None, 'IP_exploitability': None}
+
+                if async_checker is not None:
+                    result = async_checker.poll()
+                    if result is not None:
+                        checked_iter, player_expls, _ = result
+                        exploitability = max(player_expls)
+                        checked_at = checked_iter
+                        profiler.count('exploitability_checks')
+                        if freezing is not None:
+                            freezing.record_check(exploitability)
+                        if event is not None:
+                            event.update(exploitability=exploitability, OOP_exploitability=player_expls[0], IP_exploitability=player_expls[1])
+                        print(f'iteration {checked_iter} / {max_iter} (checked in the background)\nExploitability:\t{exploitability}\n')
+                    if async_checker.idle() and exploitability > target_expl:
+                        with profiler.timer('submit_check'):
+                            async_checker.submit(i, self.average_strategies())
+                elif check_schedule.should_check(i):
+                    check_start = time.perf_counter()
+                    with profiler.timer('calc_exploitability'):
+                        player_expls = self.calc_exploitabilities()
+                    exploitability = max(player_expls)
+                    checked_at = i
+                    check_schedule.record_check(i, time.perf_counter() - check_start, exploitability)
+                    profiler.count('exploitability_checks')
+                    if freezing is not None:
+                        freezing.record_check(exploitability)
+                    if event is not None:
+                        event.update(exploitability=exploitability, OOP_exploitability=player_expls[0], IP_exploitability=player_expls[1])
+                    #x.append(i)
+                    #y.append(exploitability)
+                    print(f'iteration {i} / {max_iter}\nExploitability:\t{exploitability}\n')
+
+                if snapshot is not None and snapshot.should_publish(i):
+                    with profiler.timer('publish_snapshot'):
+                        self.publish_snapshot(snapshot, self.iterations_done + i + 1, player_expls)
+
+            if event is not None:
+                event['elapsed_s'] = time.perf_counter() - start_time
+                telemetry.record(event)
+            if exploitability <= target_expl:
+                # stop the solver
+                profiler.set_info(target_iteration=i, time_to_target_s=time.perf_counter() - start_time)
+                break
+            if max_seconds is not None and time.perf_counter() - start_time >= max_seconds:
+                print(f'time budget of {max_seconds}s used at iteration {i}')
+                break
                     
-        
+        if async_checker is not None and max_iter and checked_at != i:
+            # the background checks lag behind CFR (the first one can still be in flight at the end of a short solve),
+            # so wait for the one in flight and then check the strategy that gets saved, if that wasn't the one reported
+            stopped_on_target = exploitability <= target_expl
+            with profiler.timer('async_check_wait'):
+                result = async_checker.poll(wait=True)
+                if result is not None:
+                    checked_at, player_expls, _ = result
+                    exploitability = max(player_expls)
+                    profiler.count('exploitability_checks')
+                if checked_at != i:
+                    async_checker.submit(i, self.average_strategies())
+                    _, player_expls, _ = async_checker.poll(wait=True)
+                    exploitability = max(player_expls)
+                    checked_at = i
+                    profiler.count('exploitability_checks')
+                    if exploitability <= target_expl and not stopped_on_target:
+                        profiler.set_info(target_iteration=i, time_to_target_s=time.perf_counter() - start_time)
+                    print(f'iteration {i} / {max_iter} (checked in the background)\nExploitability:\t{exploitability}\n')
+        if async_checker is not None:
+            profiler.set_info(async_checks=async_checker.stats())
+        if max_iter and checked_at != i and exploitability > target_expl:
+            # out of iterations or time, the last check can be a whole check interval old: report the strategy that gets saved
+            check_start = time.perf_counter()
+            with profiler.timer('calc_exploitability'):
+                player_expls = self.calc_exploitabilities()
+            exploitability = max(player_expls)
+            profiler.count('exploitability_checks')
+            if exploitability <= target_expl:
+                profiler.set_info(target_iteration=i, time_to_target_s=check_start - start_time)
+            print(f'iteration {i} / {max_iter}\nExploitability:\t{exploitability}\n')
+
+        self.iterations_done += i + 1 if max_iter else 0
+        self.exploitabilities = player_expls # [OOP, IP] of the last check, None if there was none
+
+        if size_pruning is not None and self.excluded:
+            # verify on the full tree, where the other player can use the removed sizes too
+            with profiler.timer('verify_sizes'):
+                pruned_expl = max(self.calc_exploitabilities())
+                self.restore_sizes()
+                player_expls = self.calc_exploitabilities()
+                exploitability = max(player_expls)
+            self.exploitabilities = player_expls
+            print(f'removed {size_pruning.removed} bet sizes, exploitability {pruned_expl} in the pruned tree, {exploitability} in the full tree\n')
+            profiler.set_info(size_pruning={'removed': size_pruning.removed, 'pruned_exploitability': pruned_expl, 'full_exploitability': exploitability})
+            time_left = max_seconds - (time.perf_counter() - start_time) if max_seconds is not None else None
+            if exploitability > pruned_expl + size_pruning.verify_tol and size_pruning.verify_iters and (time_left is None or time_left > 0):
+                print(f're-solving the full tree for up to {size_pruning.verify_iters} iterations\n')
+                return self.do_cfr(size_pruning.verify_iters, max(target_expl, pruned_expl + size_pruning.verify_tol), json_filename,
+                                   profiler, telemetry, check_schedule.restart(size_pruning.verify_iters - 1), time_left, pruning, snapshot=snapshot)
+
+        if snapshot is not None:
+            self.publish_snapshot(snapshot, self.iterations_done, player_expls, finished=True)
+        profiler.set_info(final_exploitability=exploitability)
+        self.save_solution(json_filename, profiler)
+
+        #plt.plot(x,y)
+        #plt.show()
+
+    def save_solution(self, json_filename, profiler):
+        '''Sets every strategy to the average strategy and saves the solution to json_filename'''
         # set strat to avg_strat
         for node in self.nodes:
             for hand in node.player_range.hands_list:
                 hand.actions_taken = hand.avg_strat.copy()
-        self.update_reach_probs()
+        with profiler.timer('update_reach_probs'):
+            self.update_reach_probs()
+
+        with profiler.timer('export_solution'):
+            nodes = self.export_solution()
+        
+        with profiler.timer('json_dump'):
+            with open(json_filename, 'w') as json_file:
+                json.dump(nodes, json_file, indent=4)
+
+    def do_mccfr(self, max_iter, target_expl, json_filename, samples=None, profiler=None, telemetry=None, check_schedule=None,
+                 max_seconds=None, seed=None):
+        '''External sampling Monte Carlo CFR, an approximate alternative to do_cfr for trees too big for full passes.
+        Every iteration deals `samples` (default the size of the bigger range) pairs of combos for each player in turn,
+        with the probability of the combo pair in the ranges. The player being updated tries every one of their actions,
+        the other player only the one sampled from their current strategy, so a deal visits a small part of the tree.
+        Regrets go in the same Hand.cumm_regrets as do_cfr's, the average strategy is the sum of the strategies
+        played at the sampled nodes. Exploitability is checked on the full tree with check_schedule (default every 100 iterations)'''
+        if profiler is None:
+            profiler = Profiler(enabled=False)
+        if check_schedule is None:
+            check_schedule = FixedCheckSchedule(every=100, start=100)
+        rng = np.random.default_rng(seed)
+        deals, valid, equity = self.deal_tables()
+        if samples is None:
+            samples = max(valid.shape)
+        for node in self.nodes:
+            for hand in node.player_range.hands_list:
+                if len(hand.strat_sum) != len(hand.actions_taken):
+                    hand.strat_sum = np.zeros(len(hand.actions_taken), dtype=float_dtype)
+        start_time = time.perf_counter()
+        exploitability = 100
+        player_expls = None
+        checked_at = None
 
+        for i in range(max_iter):
+            iter_start = time.perf_counter()
+            event = None
+            with profiler.iteration(i):
+                self.sampled_updates = 0
+                with profiler.timer('mccfr_traverse'):
+                    for traverser in (0, 1):
+                        for k in rng.choice(len(deals), size=samples, p=deals):
+                            combos = divmod(k, valid.shape[1])
+                            self.sampled_traverse(self.nodes[0], combos, traverser, equity[combos], rng)
+                profiler.count('sampled_deals', 2 * samples)
+                profiler.count('hand_strat_updates', self.sampled_updates)
+
+                iter_s = time.perf_counter() - iter_start
+                check_schedule.record_iteration(iter_s)
+
+                if telemetry is not None:
+                    abs_sum, pos_sum, reg_max = regret_stats(self.nodes)
+                    event = {'iter': i, 'iter_s': iter_s, 'nodes_updated': None, 'hands_updated': self.sampled_updates,
+                             'regret_abs_sum': abs_sum, 'regret_pos_sum': pos_sum, 'regret_max': reg_max,
+                             'exploitability': None, 'OOP_exploitability': None, 'IP_exploitability': None}
+
+                if check_schedule.should_check(i):
+                    check_start = time.perf_counter()
+                    with profiler.timer('calc_exploitability'):
+                        self.average_sampled_strats()
+                        player_expls = self.calc_exploitabilities()
+                    exploitability = max(player_expls)
+                    checked_at = i
+                    check_schedule.record_check(i, time.perf_counter() - check_start, exploitability)
+                    profiler.count('exploitability_checks')
+                    if event is not None:
+                        event.update(exploitability=exploitability, OOP_exploitability=player_expls[0], IP_exploitability=player_expls[1])
+                    print(f'iteration {i} / {max_iter}\nExploitability:\t{exploitability}\n')
+
+            if event is not None:
+                event['elapsed_s'] = time.perf_counter() - start_time
+                telemetry.record(event)
+            if exploitability <= target_expl:
+                profiler.set_info(target_iteration=i, time_to_target_s=time.perf_counter() - start_time)
+                break
+            if max_seconds is not None and time.perf_counter() - start_time >= max_seconds:
+                print(f'time budget of {max_seconds}s used at iteration {i}')
+                break
+
+        self.iterations_done += i + 1 if max_iter else 0
+        self.average_sampled_strats()
+        if not max_iter or checked_at != i:
+            # always finish with the exploitability of the strategy that is saved
+            with profiler.timer('calc_exploitability'):
+                player_expls = self.calc_exploitabilities()
+            exploitability = max(player_expls)
+            print(f'iteration {i} / {max_iter}\nExploitability:\t{exploitability}\n')
+        self.exploitabilities = player_expls
+        profiler.set_info(final_exploitability=exploitability, mccfr_samples=samples)
+        self.save_solution(json_filename, profiler)
+
+    def deal_tables(self):
+        '''Returns (probability of each (OOP combo, IP combo) pair being dealt, flattened, [OOP, IP] matrix of the share of
+        each pair that doesn't share a card, OOP equity matrix) for do_mccfr, combos in range order'''
+        OOP_hands, IP_hands = self.OOP_start_range.hands_list, self.IP_start_range.hands_list
+        valid = np.zeros((len(OOP_hands), len(IP_hands)))
+        equity = np.full((len(OOP_hands), len(IP_hands)), 0.5)
+        for i, OOP_hand in enumerate(OOP_hands):
+            blockers = {OOP_hand.hand[:2], OOP_hand.hand[2:]}
+            for j, IP_hand in enumerate(IP_hands):
+                if class_pairs is not None:
+                    valid[i, j], equity[i, j] = class_pairs[(OOP_hand.hand, IP_hand.hand)]
+                elif IP_hand.hand[:2] not in blockers and IP_hand.hand[2:] not in blockers:
+                    valid[i, j] = 1
+                    equity[i, j] = equities[(OOP_hand.hand, IP_hand.hand)]
+        weights = np.array([hand.weighting for hand in OOP_hands], dtype=float)[:, None] * np.array([hand.weighting for hand in IP_hands], dtype=float)[None, :]
+        deals = (weights * valid).ravel()
+        if deals.sum() <= 0:
+            raise ValueError('the ranges have no combos that can be dealt together')
+        return deals / deals.sum(), valid, equity
+
+    def sampled_traverse(self, node, combos, traverser, OOP_equity, rng):
+        '''One external sampling pass below node for the deal combos (OOP, IP range indices). Returns the traverser's value
+        (the pot share they end up with, minus what they put in below node) and updates their regrets on the way'''
+        if node.endNode:
+            if node.action_seq[-1] == 'F':
+                return node.pot_size if node.to_act == traverser else 0 # the player after the folder takes the pot
+            return node.pot_size * (OOP_equity if traverser == 0 else 1 - OOP_equity)
+        hand = node.player_range.hands_list[combos[node.to_act]]
+        if node.to_act != traverser:
+            if not node.isLocked:
+                hand.strat_sum = hand.strat_sum + hand.actions_taken
+            action = node.availActs[sample_index(hand.actions_taken, rng)]
+            return self.sampled_traverse(node.child_nodes[action], combos, traverser, OOP_equity, rng)
+        values = np.zeros(len(node.availActs), dtype=float_dtype)
+        for a, action in enumerate(node.availActs):
+            child = node.child_nodes[action]
+            if traverser == 0:
+                put_in = child.OOP_stack_size - node.OOP_stack_size
+            else:
+                put_in = child.IP_stack_size - node.IP_stack_size
+            values[a] = put_in + self.sampled_traverse(child, combos, traverser, OOP_equity, rng)
+        value = np.dot(hand.actions_taken, values)
+        if not node.isLocked:
+            # the sampled counterfactual values already carry the other player's and the deal's probabilities, so no reach weight
+            hand.actions_taken, hand.cumm_regrets = update_strat_on_iteration(hand.actions_taken, values, hand.cumm_regrets, 1)
+            self.sampled_updates += 1
+        return value
+
+    def average_sampled_strats(self):
+        '''Sets avg_strat from the strategy sums of do_mccfr. Hands never sampled keep theirs'''
+        for node in self.nodes:
+            if node.isLocked:
+                continue
+            for hand in node.player_range.hands_list:
+                total = hand.strat_sum.sum() if len(hand.strat_sum) else 0
+                if total > 0:
+                    hand.avg_strat = hand.strat_sum / total
+
+    def average_strategies(self):
+        '''Every decision node's average strategies as one array, for set_average_strategies on a copy of this tree'''
+        strats = [hand.avg_strat for node in self.nodes if not node.endNode for hand in node.player_range.hands_list]
+        return np.concatenate(strats) if strats else np.zeros(0, dtype=float_dtype)
+
+    def set_average_strategies(self, values):
+        offset = 0
+        for node in self.nodes:
+            if not node.endNode:
+                for hand in node.player_range.hands_list:
+                    n = len(hand.avg_strat)
+                    hand.avg_strat = values[offset:offset + n]
+                    offset += n
+
+    def snapshot_layout(self):
+        '''The solver_snapshot layout of the decision nodes'''
+        nodes = [{'id': node.ID, 'atn-sq': node.action_seq, 'avl-acs': node.availActs, 'player': node.to_act,
+                  'combos': [hand.hand for hand in node.player_range.hands_list], 'batch': None} for node in self.nodes if not node.endNode]
+        return {'engine': 'v10', 'nodes': nodes, 'members': layout_members(self.iso_members)}
+
+    def publish_snapshot(self, snapshot, iteration, exploitabilities=None, finished=False):
+        '''Writes every average strategy to snapshot, a solver_snapshot.SnapshotWriter of snapshot_layout()'''
+        snapshot.begin()
+        try:
+            for node in self.nodes:
+                if node.endNode:
+                    continue
+                # by action sequence, IDs are renumbered when prune_sizes rebuilds the tree
+                offset, size = snapshot.offsets.get(tuple(node.action_seq), (None, 0))
+                hands = node.player_range.hands_list
+                if offset is None or not size or size != len(hands) * len(node.availActs):
+                    continue # not in the layout, or its sizes were pruned since
+                snapshot.values[offset:offset + size] = np.concatenate([hand.avg_strat for hand in hands])
+        finally:
+            snapshot.end(iteration, exploitabilities, finished)
+
+    def export_solution(self):
+        '''Returns the list of node dicts that gets saved as the json solution'''
         nodes = []
         for node in self.nodes:
             rg_strat = {}
             rg_EVs = {}
             act_EVs = {}
             for hand in node.player_range.hands_list:
-                rg_strat[hand.hand] = list(hand.avg_strat)
-                rg_EVs[hand.hand] = node.calc_EV_hand(hand, node.to_act)
-                act_EVs[hand.hand] = node.calc_EV_hand_all_acts(hand, node.to_act)
+                rg_strat[hand.hand] = json_floats(hand.avg_strat)
+                rg_EVs[hand.hand] = json_floats([node.calc_EV_hand(hand, node.to_act)])[0]
+                act_EVs[hand.hand] = json_floats(node.calc_EV_hand_all_acts(hand, node.to_act))
+            if self.iso_members is not None:
+                # every member of a class plays like its representative
+                members = self.iso_members[node.to_act]
+                rg_strat, rg_EVs, act_EVs = expand_combos(rg_strat, members), expand_combos(rg_EVs, members), expand_combos(act_EVs, members)
             nodes.append({'id':node.ID, 'atn-sq':node.action_seq, 'avl-acs':node.availActs, 'rg-strat':rg_strat, 'act-EVs':act_EVs, 'rg-EVs':rg_EVs})
-            
-        
-        with open(json_filename, 'w') as json_file:
-            json.dump(nodes, json_file, indent=4)
+        return nodes
+
+
+    def get_node(self, action_seq):
+        '''Returns the node reached by action_seq (a list like ['X', 'B100'] or a string like 'X,B100'), None if there isn't one'''
+        if isinstance(action_seq, str):
+            action_seq = [action for action in action_seq.split(',') if action]
+        if list(action_seq[:len(self.root_seq)]) != self.root_seq:
+            return None # not in this subgame
+        node = self.nodes[0]
+        for action in action_seq[len(self.root_seq):]:
+            if action not in node.child_nodes:
+                return None
+            node = node.child_nodes[action]
+        return node
+
+    def lock_node(self, action_seq, strategy=None, never=()):
+        '''Locks the strategy of the node at action_seq so CFR no longer changes it.
+        strategy is either one list of action freqs used for every combo or a dict of combo: list of action freqs,
+        combos missing from the dict keep their current average strategy.
+        never is a list of actions (eg ['RA']) that are removed from the locked strategy, the rest renormalised'''
+        node = self.get_node(action_seq)
+        if node is None or node.endNode:
+            raise ValueError(f'{action_seq} is not a decision node')
+        for action in never:
+            if action not in node.availActs:
+                raise ValueError(f'{action} is not available at {action_seq}, actions are {node.availActs}')
+        locked = {}
+        for hand in node.player_range.hands_list:
+            if isinstance(strategy, dict):
+                strat = strategy.get(hand.hand, hand.avg_strat)
+            elif strategy is not None:
+                strat = strategy
+            else:
+                strat = hand.avg_strat
+            strat = np.array(strat, dtype=float_dtype)
+            if len(strat) != len(node.availActs):
+                raise ValueError(f'strategy for {hand.hand} has {len(strat)} freqs but {action_seq} has actions {node.availActs}')
+            for action in never:
+                strat[node.availActs.index(action)] = 0
+            if strat.sum() <= 0:
+                # nothing left, so spread evenly over the allowed actions
+                strat = np.array([0.0 if act in never else 1.0 for act in node.availActs], dtype=float_dtype)
+            locked[hand.hand] = strat / strat.sum()
+        node.lock(locked)
+        return node
+
+    def unlock_node(self, action_seq):
+        self.get_node(action_seq).isLocked = False
+
+    def load_solution(self, json_filename, warm_weight=10):
+        '''Warm starts from a previously saved solution of this tree (or of the same spot with other bet sizes):
+        sets every strategy to the saved one and seeds the regrets so regret matching reproduces it.
+        warm_weight is how many iterations the saved average counts as. Actions are matched by name, at a node
+        with other sizes than the saved one the new sizes start at 0% (lines the saved tree doesn't have stay uniform)'''
+        with open(json_filename, 'r') as json_file:
+            saved = json.load(json_file)
+        for saved_node in saved:
+            node = self.get_node(saved_node['atn-sq'])
+            if node is None or node.endNode or not saved_node['avl-acs']:
+                continue
+            index = [saved_node['avl-acs'].index(action) if action in saved_node['avl-acs'] else None for action in node.availActs]
+            if all(j is None for j in index):
+                continue
+            for hand in node.player_range.hands_list:
+                if hand.hand in saved_node['rg-strat']:
+                    strat = np.array(saved_node['rg-strat'][hand.hand], dtype=float_dtype)
+                    if node.availActs != saved_node['avl-acs']:
+                        strat = np.array([strat[j] if j is not None else 0 for j in index], dtype=float_dtype)
+                        strat = strat / strat.sum() if strat.sum() > 0 else np.full(len(strat), 1 / len(strat), dtype=float_dtype)
+                    hand.actions_taken = strat.copy()
+                    hand.avg_strat = strat.copy()
+                    hand.next_strat = strat.copy()
+                    hand.cumm_regrets = strat * warm_weight * self.nodes[0].pot_size / 100
+        self.iterations_done = warm_weight
+        self.update_reach_probs()
 
-        #plt.plot(x,y)
-        #plt.show()
+    def set_weights(self, player, weights):
+        '''Sets the weighting of player's combos (dict combo: weighting, combos missing keep theirs) in the start range
+        and at every node, keeping the tree and the strategies. The equities don't depend on the weights, so a solved tree
+        can be re-solved for a what-if range from where it is'''
+        start_range = self.OOP_start_range if player == 0 else self.IP_start_range
+        for theRange in [start_range] + [node.player_range for node in self.nodes if node.to_act == player]:
+            for hand in theRange.hands_list:
+                if hand.hand in weights:
+                    hand.weighting = weights[hand.hand]
+        self.update_reach_probs()
 
+    def resolve(self, max_iter, target_expl, json_filename, change_tol=1e-3, warm_weight=10, **cfr_kwargs):
+        '''Incremental re-solve after locking (or unlocking) nodes, starting from the current strategies.
+        Only the locked nodes' subtrees and ancestors are updated at first, other nodes join as soon as a node whose
+        strategy moves by more than change_tol affects them. The previous average is counted as warm_weight iterations
+        (and the regrets scaled to match) so the strategies can move to the new equilibrium quickly'''
+        if self.iterations_done > warm_weight:
+            scale = warm_weight / self.iterations_done
+            for node in self.nodes:
+                for hand in node.player_range.hands_list:
+                    hand.cumm_regrets = hand.cumm_regrets * scale
+            self.iterations_done = warm_weight
+
+        self.active_nodes = set()
+        for node in self.nodes:
+            if node.isLocked:
+                self.active_nodes.update(n.ID for n in node.get_ancestors())
+                self.active_nodes.update(n.ID for n in node.get_subtree())
+        if not self.active_nodes:
+            self.active_nodes = None
+        self.change_tol = change_tol
+        try:
+            self.do_cfr(max_iter, target_expl, json_filename, **cfr_kwargs)
+        finally:
+            self.active_nodes = None
+            self.change_tol = None
 
     def calc_exploitability(self):
         '''Returns the number as a percent of the maximum of the exploitability of the 2 players strategies'''
+        return max(self.calc_exploitabilities()) # abs min might not be correct
+
+    def calc_exploitabilities(self):
+        '''Returns [OOP exploitability, IP exploitability], each as a percent of the pot at the root (of the subgame)'''
         # algorithm
         # create a deep copy of the current tree
         # for each player:
@@ -361,6 +1375,9 @@ class Tree(object):
 
         exploitabilities = []
         # first set both strats to avg strat so get the initial OOP EV, and can calc IP EV as start_pot_size - OOP_EV
+        # (a subgame root can have IP to act, then it's the other way round)
+        root_player = self.nodes[0].to_act
+        root_pot = self.nodes[0].pot_size
 
         for player in (0, 1):
             tree_copy = copy.deepcopy(self)
@@ -372,11 +1389,11 @@ class Tree(object):
 
             tree_copy.update_reach_probs()
 
-            start_OOP_EV = tree_copy.nodes[0].calc_EV_range()
+            start_root_EV = tree_copy.nodes[0].calc_EV_range()
     
             # now set villain to the max exploitative strategy
             for node in reversed(tree_copy.nodes):
-                if node.to_act == 1-player:
+                if node.to_act == 1-player and not node.isLocked: # a locked node can't deviate
                     # change the strat to pure take highest EV
                     for hand in node.player_range.hands_list:
                         EVs = node.calc_EV_hand_all_acts(hand, node.to_act)
@@ -384,27 +1401,29 @@ class Tree(object):
                         strat[EVs.index(max(EVs))] = 1
                         hand.actions_taken = strat
 
-            expl_OOP_EV = tree_copy.nodes[0].calc_EV_range()
-            #print(start_OOP_EV, expl_OOP_EV, player, sep='\t')
+            expl_root_EV = tree_copy.nodes[0].calc_EV_range()
+            #print(start_root_EV, expl_root_EV, player, sep='\t')
 
-            if player == 0:
-                ex = 100 * (start_OOP_EV - expl_OOP_EV) / tree_copy.starting_pot 
-                exploitabilities.append(ex)
+            if player == root_player:
+                ex = 100 * (start_root_EV - expl_root_EV) / root_pot
+                exploitabilities.append(float(ex))
             else:
-                start_IP_EV = tree_copy.starting_pot  - start_OOP_EV
-                expl_IP_EV = tree_copy.starting_pot - expl_OOP_EV
-                ex = 100 * (start_IP_EV - expl_IP_EV) / tree_copy.starting_pot
-                exploitabilities.append(ex)
+                start_EV = root_pot - start_root_EV
+                expl_EV = root_pot - expl_root_EV
+                ex = 100 * (start_EV - expl_EV) / root_pot
+                exploitabilities.append(float(ex))
 
             del tree_copy
         
-        return max(exploitabilities) # abs min might not be correct
+        return exploitabilities
 
         
 
 class Node(object):
     '''One node of the tree'''
-    def __init__(self, to_act, player_range, action_seq, parent_node, pot_size, OOP_stack_size, IP_stack_size):
+    def __init__(self, to_act, player_range, action_seq, parent_node, pot_size, OOP_stack_size, IP_stack_size, avail_acts=False):
+        '''avail_acts (list, None for an end node) are the node's actions when they are already known (from a TreeTemplate),
+        the strategies are then left to the caller'''
         self.ID = get_next_ID()
         self.to_act = to_act
         self.player_range = player_range
@@ -415,7 +1434,11 @@ class Node(object):
         
         self.action_seq = action_seq # tuple or list of previous actions eg F, B50, R33
         self.parent_node = parent_node
-        self.isLocked = False # to be used when nodelocking added
+        self.isLocked = False # locked nodes keep their strategy, see Tree.lock_node
+        if avail_acts is not False:
+            self.availActs = avail_acts
+            self.endNode = avail_acts is None
+            return
         self.endNode = False
         self.getAvailActions()
         if self.availActs:
@@ -425,6 +1448,31 @@ class Node(object):
         return f'---------------\n\nID:\t{self.ID}\nto_act:\t{self.to_act}\npot_size:\t{self.pot_size}\nOOP_stack_size:\t{self.OOP_stack_size}\nIP_stack_size:\t{self.IP_stack_size}\n\
 action_seq:\t{self.action_seq}\nendNode\t{self.endNode}\navailActs:\t{self.availActs}\nplayer_range:\t{str(self.player_range)}'
     
+    def lock(self, strategies):
+        '''Fixes the strategy of every hand, strategies is a dict of combo: action freqs'''
+        for hand in self.player_range.hands_list:
+            strat = np.array(strategies[hand.hand], dtype=float_dtype)
+            hand.actions_taken = strat.copy()
+            hand.avg_strat = strat.copy()
+            hand.next_strat = strat.copy()
+        self.isLocked = True
+
+    def get_ancestors(self):
+        '''Returns this node and every node above it'''
+        nodes = []
+        node = self
+        while node is not None:
+            nodes.append(node)
+            node = node.parent_node
+        return nodes
+
+    def get_subtree(self):
+        '''Returns this node and every node below it'''
+        nodes = [self]
+        for node in nodes:
+            nodes.extend(node.child_nodes.values())
+        return nodes
+
     def getHeroStackSize(self):
         if self.hero:
             return self.IP_stack_size
@@ -632,6 +1680,7 @@ class Hand(object):
         self.EVs = np.array([])
         self.avg_strat = actions_taken.copy()
         self.next_strat = np.array([])
+        self.strat_sum = np.array([]) # sum of the strategies played, for Tree.do_mccfr
 
     def add_strat_to_avg_strat(self, thisStrat, iter_num):
         '''iter_num should be 1 for the first iteration'''
@@ -666,13 +1715,40 @@ class Range(object):
         if not num_poss_acts:
             return
         for hand in self.hands_list:
-            hand.actions_taken = np.full(num_poss_acts, round(1/num_poss_acts, 3))
-            hand.cumm_regrets = np.zeros(num_poss_acts, dtype=int)
-            hand.avg_strat = np.full(num_poss_acts, round(1/num_poss_acts, 3))
+            hand.actions_taken = np.full(num_poss_acts, round(1/num_poss_acts, 3), dtype=float_dtype)
+            hand.cumm_regrets = np.zeros(num_poss_acts, dtype=float_dtype)
+            hand.avg_strat = np.full(num_poss_acts, round(1/num_poss_acts, 3), dtype=float_dtype)
 
     def calc_EVs(self, node):
         for hand in self.hands_list:
-            hand.EVs = np.array(node.calc_EV_hand_all_acts(hand, node.to_act))
+            hand.EVs = np.array(node.calc_EV_hand_all_acts(hand, node.to_act), dtype=float_dtype)
+
+    def get_range_reach(self):
+        '''Returns the share of the range's weight that reaches this node'''
+        total_weight = sum(hand.weighting for hand in self.hands_list)
+        if total_weight == 0:
+            return 0
+        return sum(hand.weighting * hand.reach_probability for hand in self.hands_list) / total_weight
+
+    def calc_EVs_pruned(self, node, pruning):
+        '''calc_EVs for the hands and actions that aren't pruned (see RegretPruning), pruned ones keep their last EVs.
+        Returns the number of hand actions evaluated (an end node counts once per hand)'''
+        evaluated = 0
+        for hand in self.hands_list:
+            if not pruning.hand_active(hand):
+                continue
+            if node.endNode:
+                hand.EVs = np.array(node.calc_EV_hand_all_acts(hand, node.to_act), dtype=float_dtype)
+                evaluated += 1
+                continue
+            pruned = pruning.pruned_actions(hand, node)
+            EVs = hand.EVs.copy()
+            for i, action in enumerate(node.availActs):
+                if not pruned[i]:
+                    EVs[i] = node.calc_EV_hand_and_action(hand, action, node.to_act)
+                    evaluated += 1
+            hand.EVs = EVs
+        return evaluated
 
     def get_range_action_freqs(self):
         '''Returns the list of action freqs of the entire range'''
@@ -695,23 +1771,271 @@ class Range(object):
 
 
 
-def main(inputs_file_name, outputs_file_name):
-    #start_time = time.time()
-    global OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, board
-    potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl = get_inputs(inputs_file_name)
-    if OOP_b_szs==['']: OOP_b_szs=[]
-    if IP_b_szs==['']: IP_b_szs=[]
-    if OOP_r_szs==['']: OOP_r_szs=[]
-    if IP_r_szs==['']: IP_r_szs=[]
-    tree = Tree(potsz, stacksz, OOP_range, IP_range)
+def map_bucket_solution(potsz, stacksz, OOP_range, IP_range, json_filename, root_seq=(), root_state=None, rank_cache=None, template=None):
+    '''Plays a bucketed solution (json_filename, where every combo has its bucket's strategy) in the full game of OOP_range / IP_range.
+    Rewrites json_filename with every combo's own EVs and returns the full Tree, its exploitabilities those of the mapped strategy'''
+    global class_pairs
+    class_pairs = None
+    computeEquities(OOP_range, IP_range, rank_cache)
+    tree = Tree(potsz, stacksz, OOP_range, IP_range, root_seq, root_state)
+    tree.buildTree(template)
+    tree.load_solution(json_filename)
+    tree.exploitabilities = tree.calc_exploitabilities()
+    tree.save_solution(json_filename, Profiler(enabled=False))
+    return tree
+
+def subgame_reach(solution, action_seq):
+    '''Returns [OOP, IP] dicts of combo: probability of the combo playing the actions of action_seq, from a saved solution
+    (list of node dicts). A player who hasn't acted on the way has an empty dict'''
+    by_seq = {tuple(node['atn-sq']): node for node in solution}
+    reach = [{}, {}]
+    for depth, action in enumerate(action_seq):
+        node = by_seq.get(tuple(action_seq[:depth]))
+        if node is None or not node['avl-acs'] or action not in node['avl-acs']:
+            raise ValueError(f'{",".join(action_seq)} is not a line of the solution')
+        player = depth % 2 # the players take turns from OOP at the root
+        index = node['avl-acs'].index(action)
+        for combo, strat in node['rg-strat'].items():
+            reach[player][combo] = reach[player].get(combo, 1) * strat[index]
+    return reach
+
+def reach_ranges(OOP_range, IP_range, reach):
+    '''Returns copies of the ranges with each weighting multiplied by the combo's reach in reach ([OOP, IP] dicts of combo: reach,
+    combos missing keep their weighting). Combos with no weight left are dropped'''
+    ranges = []
+    for theRange, player_reach in zip((OOP_range, IP_range), reach):
+        hands = []
+        for hand in theRange.hands_list:
+            weighting = hand.weighting * player_reach.get(hand.hand, 1)
+            if weighting > 0:
+                hands.append(Hand(hand.hand, weighting))
+        ranges.append(Range(hands))
+    return ranges
+
+def merge_solution(parent, subgame):
+    '''Returns the parent solution with the nodes of a subgame solution put in (both lists of node dicts), keeping the parent's ids.
+    Combos the subgame dropped (zero reach) keep the parent's values'''
+    solved = {tuple(node['atn-sq']): node for node in subgame}
+    merged = []
+    for node in parent:
+        sub_node = solved.get(tuple(node['atn-sq']))
+        if sub_node is not None:
+            node = dict(node)
+            for key in ('rg-strat', 'act-EVs', 'rg-EVs'):
+                node[key] = {**node[key], **sub_node[key]}
+        merged.append(node)
+    return merged
+
+
+def main(inputs_file_name, outputs_file_name, profile=False, use_cprofile=False, use_tracemalloc=False, telemetry=None,
+         adaptive_checks=False, check_budget=0.1, max_seconds=None, locks=None, warm_start=None, isomorphism=False, rank_cache=None, store=None,
+         subgame=None, reach=None, root_state=None, merge_into=None, prune=False, prune_sizes=False,
+         mccfr=False, samples=None, seed=None, dtype='float64', templates=None, buckets=None, bucket_blockers=True, snapshot=None, snapshot_every=10,
+         async_checks=False, freeze=False):
+    '''Solves the spot in inputs_file_name and saves the solution to outputs_file_name.
+    With profile=True a timing report (see solver_profiler) is written next to the solution as <name>.profile.json.
+    telemetry is either a solver_telemetry sink or the filename of a (rotating) .jsonl / .csv file for per iteration stats.
+    adaptive_checks schedules exploitability checks with AdaptiveCheckSchedule, keeping their cost under check_budget of the solve time.
+    locks is a json file of node locks, eg {"X,B100": {"never": ["RA"]}, "X": {"strategy": {"AsAc": [0, 1]}}} (see Tree.lock_node).
+    warm_start is a previous solution of the same spot, which is then incrementally re-solved with Tree.resolve.
+    isomorphism solves one representative per suit isomorphism class of combos (see solver_isomorphism), the output has every combo.
+    rank_cache is a solver_cache.RankCache or a cache directory, to reuse hand ranks of boards solved before.
+    store is a solver_store.SolutionStore or its directory. A stored solution of the spot (or a suit isomorphic one) that is at
+    least target_expl precise (or solved for max_iters iterations) is written out instead of solving, and new solutions are added to it. Not used with locks or warm_start.
+    subgame is an action sequence (eg 'X,B100'), only the tree below it is built and solved. The ranges there are the input ranges
+    times reach: a parent solution file (the reach is worked out from its strategies) or a json file {"OOP": {combo: reach}, "IP": {...}}.
+    root_state (pot, OOP stack, IP stack) overrides the pot and stacks at the subgame root. With merge_into (the parent solution file)
+    the output is the parent solution with the subgame's nodes replaced.
+    prune turns on RegretPruning (unreached lines and very negative regret actions are skipped between full iterations),
+    prune_sizes SizePruning (bet sizes the solver doesn't use are removed after a warm up, verified on the full tree at the end).
+    mccfr solves with external sampling Monte Carlo CFR (Tree.do_mccfr, samples deals per player per iteration, seed for the sampling)
+    instead of full passes, for an approximate solution of a big tree. max_iters then counts MCCFR iterations.
+    dtype is the float type of the regret / strategy / EV arrays (see set_dtype).
+    templates is a solver_templates.TemplateCache or its directory, the tree is laid out from the cached template of its
+    pot, stacks and bet config (built and stored on a miss) instead of being worked out node by node.
+    buckets solves an approximation with each range grouped into at most that many hand strength buckets (split by blockers unless
+    bucket_blockers is False, see solver_buckets). The bucket strategies are then played by every combo in the full game
+    (map_bucket_solution): the output has every combo's own EVs and the reported exploitability is that of the mapped strategy.
+    snapshot is a file (eg in /dev/shm) the average strategies and exploitability are published to every snapshot_every iterations,
+    for other processes to read during the solve (see solver_snapshot). Not with mccfr.
+    async_checks runs the exploitability checks in a background process while CFR carries on (see solver_async_check), not with
+    mccfr or prune_sizes.
+    freeze turns on NodeFreezing (nodes whose average strategy has settled are no longer updated, until their next recheck)'''
+    global board, class_pairs
+    if isinstance(rank_cache, str):
+        rank_cache = RankCache(rank_cache)
+    profiler = Profiler(enabled=profile or use_cprofile or use_tracemalloc, use_cprofile=use_cprofile, use_tracemalloc=use_tracemalloc)
+    profiler.start()
+    with profiler.timer('get_inputs'):
+        potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl = get_inputs(inputs_file_name)
+    set_bet_config(OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+    set_dtype(dtype)
+    root_seq = []
+    if subgame:
+        root_seq = [action for action in subgame.split(',') if action] if isinstance(subgame, str) else list(subgame)
+        if reach is not None:
+            with open(reach, 'r') as reach_file:
+                reach = json.load(reach_file)
+            reach = subgame_reach(reach, root_seq) if isinstance(reach, list) else [reach.get('OOP', {}), reach.get('IP', {})]
+            OOP_range, IP_range = reach_ranges(OOP_range, IP_range, reach)
+    spot = None
+    engine = engine_name('v10-mccfr' if mccfr else 'v10', float_dtype)
+    if store is not None and not locks and not warm_start and not root_seq and not buckets:
+        store = open_store(store)
+        with profiler.timer('store_lookup'):
+            spot = CanonicalSpot(potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+            entry = write_stored_solution(store, spot, outputs_file_name, target_expl, max_iters, engine)
+        if entry is not None:
+            print(f'stored solution {entry["id"]}: {entry["iterations"]} iterations, exploitability {entry["exploitability"]}')
+            profiler.stop()
+            if profiler.enabled:
+                profiler.set_info(inputs_file=inputs_file_name, store_hit=entry['id'], solution_bytes=os.path.getsize(outputs_file_name))
+                profiler.write_report(report_filename(outputs_file_name))
+            return
+    class_pairs = None
+    iso_members = None
+    if isomorphism:
+        with profiler.timer('isomorphism'):
+            group = symmetry_group(board, (OOP_range, IP_range))
+            OOP_full, IP_full = len(OOP_range.hands_list), len(IP_range.hands_list)
+            OOP_range, OOP_members = reduce_range(OOP_range, group)
+            IP_range, IP_members = reduce_range(IP_range, group)
+            class_pairs = class_pair_tables(OOP_members, IP_members, board, rank_cache)
+            iso_members = [OOP_members, IP_members]
+        print(f'{len(group)} suit symmetries, OOP {OOP_full} -> {len(OOP_range.hands_list)} combos, IP {IP_full} -> {len(IP_range.hands_list)} combos')
+        profiler.set_info(symmetries=len(group), OOP_full_combos=OOP_full, IP_full_combos=IP_full)
+    full_ranges = None
+    if buckets:
+        if isomorphism:
+            raise ValueError('buckets and isomorphism can not be combined')
+        with profiler.timer('buckets'):
+            full_ranges = (OOP_range, IP_range)
+            OOP_range, OOP_members = bucket_range(full_ranges[0], full_ranges[1], board, buckets, bucket_blockers, rank_cache)
+            IP_range, IP_members = bucket_range(full_ranges[1], full_ranges[0], board, buckets, bucket_blockers, rank_cache)
+            class_pairs = class_pair_tables(OOP_members, IP_members, board, rank_cache)
+            iso_members = [OOP_members, IP_members]
+        print(f'buckets: OOP {len(full_ranges[0].hands_list)} -> {len(OOP_range.hands_list)}, IP {len(full_ranges[1].hands_list)} -> {len(IP_range.hands_list)}')
+        profiler.set_info(OOP_full_combos=len(full_ranges[0].hands_list), IP_full_combos=len(full_ranges[1].hands_list),
+                          OOP_buckets=len(OOP_range.hands_list), IP_buckets=len(IP_range.hands_list))
+    tree = Tree(potsz, stacksz, OOP_range, IP_range, root_seq, root_state)
+    tree.iso_members = iso_members
     board = (board[:2], board[2:4], board[4:6], board[6:8], board[8:10])
     board = [Card.new(card) for card in board]
-    computeEquities(OOP_range, IP_range)
-    tree.buildTree()
-    tree.do_cfr(max_iters, target_expl, outputs_file_name)
-    #elapsed_time = time.time() - start_time
-    #print(f"Elapsed time: {elapsed_time:.2f} seconds")
+    if class_pairs is None:
+        with profiler.timer('computeEquities'):
+            computeEquities(OOP_range, IP_range, rank_cache)
+    if rank_cache is not None:
+        profiler.set_info(rank_cache=rank_cache.stats())
+    with profiler.timer('buildTree'):
+        templates = open_templates(templates)
+        tree.buildTree(tree_template(potsz, stacksz, templates) if templates is not None and not root_seq else None)
+    if templates is not None:
+        profiler.set_info(templates=templates.stats())
+    profiler.set_info(inputs_file=inputs_file_name, num_nodes=len(tree.nodes), num_decision_nodes=sum(1 for node in tree.nodes if not node.endNode),
+                      OOP_combos=len(OOP_range.hands_list), IP_combos=len(IP_range.hands_list), max_iters=max_iters, target_expl=target_expl,
+                      dtype=float_dtype.name)
+    sink = open_sink(telemetry) if isinstance(telemetry, str) else telemetry
+    snapshot_writer = open_snapshot(snapshot, tree.snapshot_layout(), snapshot_every) if not mccfr else None
+    async_checker = None
+    try:
+        with profiler.timer('do_cfr'):
+            check_schedule = AdaptiveCheckSchedule(target_expl, check_budget, last_iter=max_iters - 1) if adaptive_checks else None
+            pruning = RegretPruning() if prune else None
+            freezing = NodeFreezing() if freeze else None
+            size_pruning = SizePruning(warmup=min(100, max_iters // 4)) if prune_sizes else None
+            if warm_start:
+                tree.load_solution(warm_start)
+            if locks:
+                with open(locks, 'r') as locks_file:
+                    for action_seq, lock in json.load(locks_file).items():
+                        tree.lock_node(action_seq, lock.get('strategy'), lock.get('never', ()))
+            if async_checks and not mccfr and not prune_sizes:
+                with profiler.timer('start_async_checker'):
+                    async_checker = AsyncChecker(tree, set_equities, (globals().get('equities'), class_pairs))
+            if mccfr:
+                check_schedule = AdaptiveCheckSchedule(target_expl, check_budget, first_check=100, last_iter=max_iters - 1) if adaptive_checks else None
+                tree.do_mccfr(max_iters, target_expl, outputs_file_name, samples, profiler, sink, check_schedule, max_seconds, seed)
+            elif warm_start:
+                tree.resolve(max_iters, target_expl, outputs_file_name, profiler=profiler, telemetry=sink, check_schedule=check_schedule, max_seconds=max_seconds, pruning=pruning,
+                             snapshot=snapshot_writer, async_checker=async_checker, freezing=freezing)
+            else:
+                tree.do_cfr(max_iters, target_expl, outputs_file_name, profiler, sink, check_schedule, max_seconds, pruning, size_pruning, snapshot_writer,
+                            async_checker, freezing)
+            if freezing is not None:
+                profiler.set_info(freezing=freezing.stats())
+    finally:
+        if async_checker is not None:
+            async_checker.close()
+        if isinstance(telemetry, str):
+            sink.close()
+        if snapshot_writer is not None and snapshot_writer is not snapshot:
+            snapshot_writer.close()
+    if full_ranges is not None:
+        with profiler.timer('map_buckets'):
+            bucket_expls = tree.exploitabilities
+            tree = map_bucket_solution(potsz, stacksz, full_ranges[0], full_ranges[1], outputs_file_name, root_seq, root_state, rank_cache,
+                                       tree_template(potsz, stacksz, templates) if templates is not None and not root_seq else None)
+        exploitability = max(tree.exploitabilities)
+        print(f'exploitability {max(bucket_expls) if bucket_expls else None} in the bucketed game, {exploitability} of the mapped strategy in the full game\n')
+        profiler.set_info(bucket_exploitability=max(bucket_expls) if bucket_expls else None, final_exploitability=exploitability)
+    if merge_into:
+        with open(merge_into, 'r') as parent_file:
+            parent = json.load(parent_file)
+        with open(outputs_file_name, 'r') as json_file:
+            solved = json.load(json_file)
+        with open(outputs_file_name, 'w') as json_file:
+            json.dump(merge_solution(parent, solved), json_file, indent=4)
+    if spot is not None:
+        with profiler.timer('store_put'):
+            store_solution(store, spot, tree, outputs_file_name, engine, target_expl)
+    profiler.stop()
+    if profiler.enabled:
+        profiler.set_info(solution_bytes=os.path.getsize(outputs_file_name))
+        profiler.write_report(report_filename(outputs_file_name))
 
 
 if __name__ == "__main__":
-    main('solver_inputs.txt', 'solver_results.json')
+    parser = argparse.ArgumentParser(description='NLHE river solver')
+    parser.add_argument('inputs', nargs='?', default='solver_inputs.txt')
+    parser.add_argument('outputs', nargs='?', default='solver_results.json')
+    parser.add_argument('--profile', action='store_true', help='write a timing report next to the solution')
+    parser.add_argument('--cprofile', action='store_true', help='also capture cProfile stats in the report')
+    parser.add_argument('--tracemalloc', action='store_true', help='also capture memory allocation stats in the report')
+    parser.add_argument('--telemetry', help='write per iteration convergence stats to this .jsonl or .csv file')
+    parser.add_argument('--adaptive-checks', action='store_true', help='schedule exploitability checks from their measured cost')
+    parser.add_argument('--check-budget', type=float, default=0.1, help='max fraction of solve time spent on adaptive checks')
+    parser.add_argument('--max-seconds', type=float, help='stop the solve after this many seconds')
+    parser.add_argument('--locks', help='json file of node locks')
+    parser.add_argument('--warm-start', help='previous solution of this spot to incrementally re-solve from')
+    parser.add_argument('--isomorphism', action='store_true', help='solve one combo per suit isomorphism class')
+    parser.add_argument('--rank-cache', nargs='?', const=default_cache_dir(), help='reuse hand ranks from this on-disk cache directory (default ~/.cache/pysolver)')
+    parser.add_argument('--store', nargs='?', const=default_store_dir(), help='look up / save solutions in this solution store (default ~/.cache/pysolver/solutions)')
+    parser.add_argument('--subgame', help='only solve the tree below this action sequence, eg X,B100')
+    parser.add_argument('--reach', help='parent solution, or json of {"OOP": {combo: reach}, "IP": {...}}, giving the ranges at the subgame root')
+    parser.add_argument('--root-state', help='pot,OOP stack,IP stack at the subgame root')
+    parser.add_argument('--merge-into', help='parent solution to write out with the subgame merged in')
+    parser.add_argument('--prune', action='store_true', help='regret based pruning of unreached lines and bad actions')
+    parser.add_argument('--prune-sizes', action='store_true', help='remove bet sizes the solver stops using and rebuild a smaller tree')
+    parser.add_argument('--mccfr', action='store_true', help='external sampling Monte Carlo CFR, approximate but much cheaper per iteration')
+    parser.add_argument('--samples', type=int, help='deals sampled per player per MCCFR iteration (default the bigger range size)')
+    parser.add_argument('--seed', type=int, help='random seed for MCCFR')
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64', help='float type of regrets, strategies and EVs')
+    parser.add_argument('--templates', nargs='?', const=default_template_dir(), help='reuse tree templates from this on-disk cache directory (default ~/.cache/pysolver/templates)')
+    parser.add_argument('--buckets', type=int, help='approximate solve with each range grouped into this many hand strength buckets (eg 20-100)')
+    parser.add_argument('--no-bucket-blockers', action='store_true', help='bucket by hand strength only, not split by blockers')
+    parser.add_argument('--snapshot', help='publish the live strategies to this file (eg /dev/shm/spot.snap) for solver_snapshot.py / the viewer to read')
+    parser.add_argument('--snapshot-every', type=int, default=10, help='iterations between snapshot publishes')
+    parser.add_argument('--async-checks', action='store_true', help='check exploitability in a background process while CFR carries on')
+    parser.add_argument('--freeze', action='store_true', help='stop updating nodes whose average strategy has settled, rechecking them every 30 iterations')
+    parser.add_argument('--dry-run', action='store_true', help='only estimate the tree size, memory and time of the solve (see solver_estimate)')
+    args = parser.parse_args()
+    if args.dry_run:
+        import solver_estimate
+        solver_estimate.print_estimate(solver_estimate.estimate(args.inputs, 'v10', dtype=args.dtype, isomorphism=args.isomorphism, templates=args.templates,
+                                                                buckets=args.buckets))
+    else:
+        main(args.inputs, args.outputs, args.profile, args.cprofile, args.tracemalloc, args.telemetry,
+             args.adaptive_checks, args.check_budget, args.max_seconds, args.locks, args.warm_start, args.isomorphism, args.rank_cache, args.store,
+             args.subgame, args.reach, [float(x) for x in args.root_state.split(',')] if args.root_state else None, args.merge_into, args.prune, args.prune_sizes,
+             args.mccfr, args.samples, args.seed, args.dtype, args.templates, args.buckets, not args.no_bucket_blockers, args.snapshot, args.snapshot_every,
+             args.async_checks, args.freeze)
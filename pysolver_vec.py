@@ -0,0 +1,735 @@
+# vectorized CFR engine for turn and river spots, rake free
+# player 0 = OOP, 1 = IP
+#
+# takes the same inputs file as pysolver_v10. A 4 card board (eg Jh8s5h2d) is solved as a turn spot, a 5 card board as a river spot
+# turn and river bet trees both use the bet / raise sizes from the inputs file
+#
+# instead of a Hand object per combo per node, every node holds numpy arrays over all combos of a range at once
+# (regrets and strategy sums are shaped (batch, combos, actions)).
+# a turn spot has a chance node wherever turn betting closes (check-check or a call). The river tree below it is built
+# only once and every array in it has a leading river card dimension, so one numpy op per river node handles all river cards.
+# combos holding the dealt river card are masked out (card removal) so every runout has weight 1/44 for a pair of combos
+#
+# output
+# json file in the same format as pysolver_v10 (id, atn-sq, avl-acs, rg-strat, act-EVs, rg-EVs for each node).
+# chance nodes have the river cards as their avl-acs and the river nodes after them have the card in their atn-sq
+
+import json, time, os, argparse, tempfile
+import numpy as np
+from treys import Card, Evaluator
+import pysolver_v10
+from pysolver_v10 import Range, get_inputs, set_bet_config, json_floats, FixedCheckSchedule, AdaptiveCheckSchedule
+from solver_profiler import Profiler, report_filename
+from solver_telemetry import open_sink
+from solver_cache import RankCache, default_cache_dir
+from solver_store import CanonicalSpot, open_store, default_store_dir, write_stored_solution, store_solution, engine_name
+from solver_templates import open_templates, default_template_dir
+from solver_snapshot import open_snapshot, layout_members
+from solver_async_check import AsyncChecker
+from solver_isomorphism import CARD_INDEX, DECK, symmetry_group, reduce_range, card_orbits, combo_key, permute_combo_key, invert, expand_combos
+
+
+def combo_cards(combo):
+    '''Returns the deck indices of the 2 cards of a combo string like AsKc'''
+    return CARD_INDEX[combo[:2]], CARD_INDEX[combo[2:4]]
+
+def board_cards(board):
+    '''Splits a board string like JhJs8s5h into a list of cards'''
+    return [board[i:i+2] for i in range(0, len(board), 2)]
+
+def regret_matching(regrets):
+    '''Returns the strategy with each action in proportion to its positive regret, uniform where no regret is positive'''
+    pos = np.maximum(regrets, 0)
+    total = pos.sum(axis=-1, keepdims=True)
+    uniform = np.full_like(pos, 1 / pos.shape[-1])
+    return np.where(total > 0, pos / np.where(total > 0, total, 1), uniform)
+
+def normalise_strategy(strat_sum):
+    '''Returns the average strategy from the accumulated strategy sums'''
+    return regret_matching(strat_sum)
+
+
+class VecNode(object):
+    '''One node of a VecTree. kind is decision, fold, showdown or chance.
+    street is 0 for nodes before any chance node and 1 for nodes after one, contribs is the chips each player has put in since the root'''
+    def __init__(self, kind, action_seq, pot, contribs, street, to_act, actions=None, winner=None):
+        self.ID = None
+        self.kind = kind
+        self.action_seq = action_seq
+        self.pot = pot
+        self.contribs = contribs
+        self.street = street
+        self.to_act = to_act
+        self.actions = actions
+        self.winner = winner
+        self.children = []
+        self.regrets = None
+        self.strat_sum = None
+
+    @property
+    def player(self):
+        return self.to_act
+
+
+class VecTree(object):
+    '''Vectorized game tree for a river spot (5 card board) or a turn spot (4 card board)'''
+    def __init__(self, starting_pot, starting_stack, OOP_range, IP_range, board, dtype=np.float64, isomorphism=False, state_dir=None, templates=None):
+        '''state_dir puts the regrets and strategy sums in a memory-mapped file in that directory instead of RAM, see allocate.
+        templates is a solver_templates.TemplateCache the betting trees are taken from (default pysolver_v10's in-memory one)'''
+        self.starting_pot = starting_pot
+        self.starting_stack = starting_stack
+        self.dtype = np.dtype(dtype)
+        self.state_dir = state_dir
+        self.templates = templates
+        self.state = None # the memory-mapped array every node's regrets / strat_sum are views of, when state_dir is set
+        self.state_file = None
+        self.board = board_cards(board)
+        if len(self.board) not in (4, 5):
+            raise ValueError(f'board must have 4 (turn) or 5 (river) cards, got {board}')
+        self.is_turn = len(self.board) == 4
+        board_idx = {CARD_INDEX[card] for card in self.board}
+
+        # drop combos that are blocked by the board
+        self.ranges = []
+        for player_range in (OOP_range, IP_range):
+            hands = [hand for hand in player_range.hands_list if not set(combo_cards(hand.hand)) & board_idx]
+            self.ranges.append(Range(hands))
+        self.full_combos = [[hand.hand for hand in rg.hands_list] for rg in self.ranges]
+        self.full_weights = [np.array([hand.weighting for hand in rg.hands_list], dtype=self.dtype) for rg in self.ranges]
+        cards = [np.array([combo_cards(c) for c in combos], dtype=np.int64).reshape(-1, 2) for combos in self.full_combos]
+
+        # suit isomorphism, see solver_isomorphism. On a river the combos of each orbit are merged into one class,
+        # on a turn one river card per orbit is solved
+        self.group = symmetry_group(self.board, self.ranges) if isomorphism else [None]
+        self.members = None
+        self.class_matrix = None
+        if len(self.group) > 1 and not self.is_turn:
+            self.members = []
+            self.class_matrix = []
+            for player, player_range in enumerate(self.ranges):
+                reduced, members = reduce_range(player_range, self.group)
+                index = {combo: i for i, combo in enumerate(self.full_combos[player])}
+                # class_matrix[i, c] = weight of full combo i if it is in class c
+                matrix = np.zeros((len(self.full_combos[player]), len(reduced.hands_list)), dtype=self.dtype)
+                for c, hand in enumerate(reduced.hands_list):
+                    for combo, weight in members[hand.hand]:
+                        matrix[index[combo], c] = weight
+                self.members.append(members)
+                self.class_matrix.append(matrix)
+                self.ranges[player] = reduced
+        self.combos = [[hand.hand for hand in rg.hands_list] for rg in self.ranges]
+        self.weights = [np.array([hand.weighting for hand in rg.hands_list], dtype=self.dtype) for rg in self.ranges]
+
+        # valid[i, j] = OOP combo i and IP combo j don't share a card
+        c0, c1 = cards
+        clash = np.zeros((len(c0), len(c1)), dtype=bool)
+        for a in range(2):
+            for b in range(2):
+                clash |= c0[:, a, None] == c1[None, :, b]
+        self.full_valid = (~clash).astype(self.dtype)
+        self.valid = self.aggregate_pairs(self.full_valid)
+
+        # river cards that can be dealt and, per river card, which combos are still possible
+        self.river_rep_index = None
+        self.river_combo_perm = None
+        if self.is_turn:
+            self.all_river_cards = [card for card in DECK if CARD_INDEX[card] not in board_idx]
+            self.river_cards = self.all_river_cards
+            if len(self.group) > 1:
+                self._reduce_river_cards()
+            river_idx = np.array([CARD_INDEX[card] for card in self.river_cards])
+            self.masks = [(~((cds[None, :, 0] == river_idx[:, None]) | (cds[None, :, 1] == river_idx[:, None]))).astype(self.dtype) for cds in cards]
+            self.runouts = 52 - 4 - 4 # river cards possible for a given pair of combos
+        else:
+            self.all_river_cards = []
+            self.river_cards = []
+            self.masks = None
+            self.runouts = 1
+
+        self.nodes = []
+        self.showdown = None
+        self.iterations_done = 0
+        self.exploitabilities = None
+
+    def aggregate_pairs(self, matrix):
+        '''Turns a (..., full OOP combos, full IP combos) matrix into the class vs class matrix: the pair weighted average over the members'''
+        if self.class_matrix is None:
+            return matrix
+        P0, P1 = self.class_matrix
+        return (P0.T @ matrix @ P1) / np.outer(P0.sum(axis=0), P1.sum(axis=0))
+
+    def _reduce_river_cards(self):
+        '''Keeps one river card per orbit. For every river card k, river_rep_index[k] is its representative's position and
+        river_combo_perm[p][k, i] the combo that plays the part of combo i in the representative's subgame'''
+        orbits = card_orbits(self.all_river_cards, self.group)
+        self.river_cards = [rep for rep, _ in orbits]
+        rep_of = {}
+        for r, (rep, orbit) in enumerate(orbits):
+            for card, perm in orbit:
+                rep_of[card] = (r, invert(perm))
+        self.river_rep_index = np.array([rep_of[card][0] for card in self.all_river_cards])
+        self.river_combo_perm = []
+        for combos in self.combos:
+            index = {combo_key(combo): i for i, combo in enumerate(combos)}
+            perm_index = np.zeros((len(self.all_river_cards), len(combos)), dtype=np.int64)
+            for k, card in enumerate(self.all_river_cards):
+                inverse = rep_of[card][1]
+                for i, combo in enumerate(combos):
+                    perm_index[k, i] = index[permute_combo_key(combo, inverse)]
+            self.river_combo_perm.append(perm_index)
+
+    def compute_equities(self, rank_cache=None):
+        '''Evaluates every combo on every river board in bulk and builds the showdown matrices
+        showdown[b, i, j] = +1 if OOP combo i beats IP combo j on board b, -1 if it loses, 0 for a tie or if they can't both be dealt.
+        rank_cache is an optional solver_cache.RankCache that the ranks of each river board are read from'''
+        evaluator = Evaluator()
+        boards = [self.board + [card] for card in self.river_cards] if self.is_turn else [self.board]
+        ranks = []
+        for player in (0, 1):
+            player_ranks = np.zeros((len(boards), len(self.full_combos[player])), dtype=np.int64)
+            for b, cards in enumerate(boards):
+                if rank_cache is not None:
+                    player_ranks[b] = rank_cache.combo_ranks(cards, self.full_combos[player])
+                    continue
+                board_ints = [Card.new(card) for card in cards]
+                board_set = set(cards)
+                for i, combo in enumerate(self.full_combos[player]):
+                    if combo[:2] in board_set or combo[2:4] in board_set:
+                        continue # masked out anyway
+                    player_ranks[b, i] = evaluator.evaluate(board_ints, [Card.new(combo[:2]), Card.new(combo[2:4])])
+            ranks.append(player_ranks)
+        # smallest evaluator value = strongest hand
+        # with combo classes the ranks are of the full ranges and the matrix is merged into classes afterwards
+        showdown = np.sign(ranks[1][:, None, :] - ranks[0][:, :, None]).astype(self.dtype) * self.full_valid[None]
+        if self.is_turn:
+            showdown *= self.masks[0][:, :, None] * self.masks[1][:, None, :]
+        self.showdown = self.aggregate_pairs(showdown)
+        self.hand_ranks = ranks
+
+    def buildTree(self):
+        '''Builds the turn (and river) betting trees from the pysolver_v10 action rules (set_bet_config must have been called)'''
+        root = self._build_street(self.starting_pot, self.starting_stack, [], 0)
+        # BFS order, so a pass over self.nodes visits parents before children
+        self.nodes = [root]
+        for node in self.nodes:
+            self.nodes.extend(node.children)
+        for i, node in enumerate(self.nodes):
+            node.ID = i
+        self.allocate()
+
+    def _build_street(self, pot, stack, action_prefix, street):
+        # the betting of a street is the template of a full tree with this pot and stack (cached, a turn spot's river
+        # subtrees after different turn lines often share one)
+        template = pysolver_v10.tree_template(pot, stack, self.templates)
+        converted = []
+        for (parent, action, to_act, node_pot, OOP_stack, IP_stack, avail_acts), seq in zip(template.rows, template.action_seqs()):
+            contribs = (self.starting_stack - OOP_stack, self.starting_stack - IP_stack)
+            seq = action_prefix + seq
+            if avail_acts is not None:
+                vec_node = VecNode('decision', seq, node_pot, contribs, street, to_act, list(avail_acts))
+            elif action == 'F':
+                vec_node = VecNode('fold', seq, node_pot, contribs, street, to_act, winner=to_act)
+            elif self.is_turn and street == 0:
+                # betting on the turn is closed, deal the river
+                vec_node = VecNode('chance', seq, node_pot, contribs, street, to_act, list(self.all_river_cards))
+                remaining = min(OOP_stack, IP_stack)
+                if remaining > 0:
+                    vec_node.children.append(self._build_street(node_pot, remaining, seq + ['*'], 1))
+                else:
+                    # all in, straight to showdown on every river
+                    vec_node.children.append(VecNode('showdown', seq + ['*'], node_pot, contribs, 1, to_act))
+            else:
+                vec_node = VecNode('showdown', seq, node_pot, contribs, street, to_act)
+            converted.append(vec_node)
+            if parent is not None:
+                converted[parent].children.append(vec_node)
+        return converted[0]
+
+    def batch_size(self, street):
+        return len(self.river_cards) if street == 1 and self.is_turn else 1
+
+    def allocate(self):
+        '''Allocates the regret and strategy sum arrays of every decision node.
+        With state_dir they are slices of one memory-mapped scratch file instead, node after node in BFS order (each node's
+        regrets then its strategy sums), so the OS pages them in and out and the tree can be bigger than RAM.
+        The CFR passes update them in place, and nodes close together in the tree are close together in the file'''
+        shapes = {node.ID: (self.batch_size(node.street), len(self.combos[node.player]), len(node.actions))
+                  for node in self.nodes if node.kind == 'decision'}
+        if self.state_dir is None:
+            for node in self.nodes:
+                if node.kind == 'decision':
+                    node.regrets = np.zeros(shapes[node.ID], dtype=self.dtype)
+                    node.strat_sum = np.zeros(shapes[node.ID], dtype=self.dtype)
+            return
+        self.close()
+        os.makedirs(self.state_dir, exist_ok=True)
+        total = sum(2 * int(np.prod(shape)) for shape in shapes.values())
+        fd, self.state_file = tempfile.mkstemp(prefix='vecstate-', suffix='.dat', dir=self.state_dir)
+        os.close(fd)
+        self.state = np.memmap(self.state_file, dtype=self.dtype, mode='w+', shape=(max(total, 1),)) # a new file reads as zeros
+        try:
+            # the mapping stays valid, and the disk space is freed when the solver exits
+            os.remove(self.state_file)
+            self.state_file = None
+        except OSError: # windows can't delete a mapped file, close() does
+            pass
+        offset = 0
+        for node in self.nodes:
+            if node.kind == 'decision':
+                shape = shapes[node.ID]
+                size = int(np.prod(shape))
+                node.regrets = self.state[offset:offset + size].reshape(shape)
+                node.strat_sum = self.state[offset + size:offset + 2 * size].reshape(shape)
+                offset += 2 * size
+
+    def close(self):
+        '''Drops the memory-mapped state (and its file, if it still exists). Only needed with state_dir'''
+        if self.state is None:
+            return
+        # the map is unmapped once nothing references it any more
+        for node in self.nodes:
+            node.regrets = node.strat_sum = None
+        self.state = None
+        if self.state_file is not None:
+            try:
+                os.remove(self.state_file)
+            except OSError:
+                pass
+            self.state_file = None
+
+    def showdown_matrix(self, node):
+        return self.showdown
+
+    def _opp_mass(self, reach0, reach1):
+        '''Returns, for each combo of each player, the opponent's reach summed over the combos it can be up against'''
+        return reach1 @ self.valid.T, reach0 @ self.valid
+
+    def _terminal_values(self, node, reach0, reach1):
+        n0, n1 = self._opp_mass(reach0, reach1)
+        c0, c1 = node.contribs
+        if node.kind == 'fold':
+            if node.winner == 0:
+                return (node.pot - c0) * n0, -c1 * n1
+            return -c0 * n0, (node.pot - c1) * n1
+        showdown = self.showdown_matrix(node)
+        s0 = np.einsum('bij,bj->bi', showdown, reach1)
+        s1 = np.einsum('bij,bi->bj', showdown, reach0)
+        half = node.pot / 2
+        return half * (n0 + s0) - c0 * n0, half * (n1 - s1) - c1 * n1
+
+    def _chance_reach(self, reach0, reach1):
+        return reach0 * self.masks[0], reach1 * self.masks[1]
+
+    def _chance_sum(self, value, player):
+        '''Averages player's values over the river cards. With isomorphism each river card takes its representative's values
+        with the combos permuted'''
+        masked = value * self.masks[player]
+        if self.river_rep_index is not None:
+            masked = masked[self.river_rep_index[:, None], self.river_combo_perm[player]]
+        return masked.sum(axis=0, keepdims=True) / self.runouts
+
+    def _chance_values(self, v0, v1):
+        return self._chance_sum(v0, 0), self._chance_sum(v1, 1)
+
+    def _cfr(self, node, reach0, reach1, weight):
+        '''One CFR pass below node (regret matching+ with linear averaging). Returns the counterfactual values (v0, v1)'''
+        if node.kind in ('fold', 'showdown'):
+            return self._terminal_values(node, reach0, reach1)
+        if node.kind == 'chance':
+            r0, r1 = self._chance_reach(reach0, reach1)
+            return self._chance_values(*self._cfr(node.children[0], r0, r1, weight))
+
+        player = node.player
+        strat = regret_matching(node.regrets)
+        reach_p = reach0 if player == 0 else reach1
+        action_vals = []
+        v_p = 0
+        v_o = 0
+        for a, child in enumerate(node.children):
+            child_reach = reach_p * strat[..., a]
+            if player == 0:
+                cv_p, cv_o = self._cfr(child, child_reach, reach1, weight)
+            else:
+                cv_o, cv_p = self._cfr(child, reach0, child_reach, weight)
+            action_vals.append(cv_p)
+            v_p = v_p + strat[..., a] * cv_p
+            v_o = v_o + cv_o
+        node.regrets += np.stack(action_vals, axis=-1) - v_p[..., None]
+        np.maximum(node.regrets, 0, out=node.regrets)
+        node.strat_sum += weight * reach_p[..., None] * strat
+        return (v_p, v_o) if player == 0 else (v_o, v_p)
+
+    def _best_response(self, node, player, reach_o):
+        '''Returns the values of player's combos when player best responds to the opponent's average strategy'''
+        if node.kind in ('fold', 'showdown'):
+            zeros = np.zeros((reach_o.shape[0], len(self.combos[player])), dtype=self.dtype)
+            if player == 0:
+                return self._terminal_values(node, zeros, reach_o)[0]
+            return self._terminal_values(node, reach_o, zeros)[1]
+        if node.kind == 'chance':
+            masked = reach_o * self.masks[1 - player]
+            return self._chance_sum(self._best_response(node.children[0], player, masked), player)
+        if node.player == player:
+            return np.max(np.stack([self._best_response(child, player, reach_o) for child in node.children], axis=-1), axis=-1)
+        strat = normalise_strategy(node.strat_sum)
+        value = 0
+        for a, child in enumerate(node.children):
+            value = value + self._best_response(child, player, reach_o * strat[..., a])
+        return value
+
+    def _evaluate(self, node, reach0, reach1):
+        '''Values (v0, v1) when both players play their average strategy. Stores what the export needs on each node'''
+        node.mass = self._opp_mass(reach0, reach1)
+        if node.kind in ('fold', 'showdown'):
+            node.values = self._terminal_values(node, reach0, reach1)
+            return node.values
+        if node.kind == 'chance':
+            r0, r1 = self._chance_reach(reach0, reach1)
+            node.values = self._chance_values(*self._evaluate(node.children[0], r0, r1))
+            return node.values
+        player = node.player
+        strat = normalise_strategy(node.strat_sum)
+        reach_p = reach0 if player == 0 else reach1
+        action_vals = []
+        v_p = 0
+        v_o = 0
+        for a, child in enumerate(node.children):
+            child_reach = reach_p * strat[..., a]
+            if player == 0:
+                cv_p, cv_o = self._evaluate(child, child_reach, reach1)
+            else:
+                cv_o, cv_p = self._evaluate(child, reach0, child_reach)
+            action_vals.append(cv_p)
+            v_p = v_p + strat[..., a] * cv_p
+            v_o = v_o + cv_o
+        node.action_values = np.stack(action_vals, axis=-1)
+        node.values = (v_p, v_o) if player == 0 else (v_o, v_p)
+        return node.values
+
+    def root_reach(self):
+        return self.weights[0][None, :].copy(), self.weights[1][None, :].copy()
+
+    def calc_exploitabilities(self):
+        '''Returns [OOP exploitability, IP exploitability] as a percent of the starting pot, like pysolver_v10.Tree'''
+        reach0, reach1 = self.root_reach()
+        norm = self.weights[0] @ self.valid @ self.weights[1]
+        v0, v1 = self._evaluate(self.nodes[0], reach0, reach1)
+        ev0 = (self.weights[0] * v0[0]).sum() / norm
+        ev1 = (self.weights[1] * v1[0]).sum() / norm
+        br0 = (self.weights[0] * self._best_response(self.nodes[0], 0, reach1)[0]).sum() / norm
+        br1 = (self.weights[1] * self._best_response(self.nodes[0], 1, reach0)[0]).sum() / norm
+        # OOP loses what IP gains by best responding and vice versa
+        return [float(100 * (br1 - ev1) / self.starting_pot), float(100 * (br0 - ev0) / self.starting_pot)]
+
+    def calc_exploitability(self):
+        return max(self.calc_exploitabilities())
+
+    def regret_stats(self):
+        abs_sum = pos_sum = 0.0
+        reg_max = None
+        for node in self.nodes:
+            if node.regrets is not None and node.regrets.size:
+                abs_sum += float(np.abs(node.regrets).sum())
+                pos_sum += float(node.regrets[node.regrets > 0].sum())
+                node_max = float(node.regrets.max())
+                reg_max = node_max if reg_max is None else max(reg_max, node_max)
+        return abs_sum, pos_sum, reg_max
+
+    def do_cfr(self, max_iter, target_expl, json_filename, profiler=None, telemetry=None, check_schedule=None, max_seconds=None, snapshot=None,
+               async_checker=None):
+        '''Does CFR solve and saves to a json file, same arguments as pysolver_v10.Tree.do_cfr'''
+        if profiler is None:
+            profiler = Profiler(enabled=False)
+        if check_schedule is None:
+            check_schedule = FixedCheckSchedule()
+
+        decision_nodes = [node for node in self.nodes if node.kind == 'decision']
+        num_decision_hands = sum(node.regrets.shape[0] * node.regrets.shape[1] for node in decision_nodes)
+        start_time = time.perf_counter()
+        exploitability = 100
+        i = -1
+        player_expls = None
+        checked_at = None # iteration of the strategy the last check was of
+
+        for i in range(max_iter):
+            iter_start = time.perf_counter()
+            event = None
+            with profiler.iteration(i):
+                with profiler.timer('cfr_pass'):
+                    self._cfr(self.nodes[0], *self.root_reach(), i + 1)
+                profiler.count('hand_strat_updates', num_decision_hands)
+
+                iter_s = time.perf_counter() - iter_start
+                check_schedule.record_iteration(iter_s)
+
+                if telemetry is not None:
+                    abs_sum, pos_sum, reg_max = self.regret_stats()
+                    event = {'iter': i, 'iter_s': iter_s, 'nodes_updated': len(decision_nodes),
+                             'hands_updated': num_decision_hands, 'regret_abs_sum': abs_sum, 'regret_pos_sum': pos_sum,
+                             'regret_max': reg_max, 'exploitability': None, 'OOP_exploitability': None, 'IP_exploitability': None}
+
+                if async_checker is not None:
+                    result = async_checker.poll()
+                    if result is not None:
+                        checked_iter, player_expls, _ = result
+                        exploitability = max(player_expls)
+                        checked_at = checked_iter
+                        profiler.count('exploitability_checks')
+                        if event is not None:
+                            event.update(exploitability=exploitability, OOP_exploitability=player_expls[0], IP_exploitability=player_expls[1])
+                        print(f'iteration {checked_iter} / {max_iter} (checked in the background)\nExploitability:\t{exploitability}\n')
+                    if async_checker.idle() and exploitability > target_expl:
+                        with profiler.timer('submit_check'):
+                            async_checker.submit(i, self.average_strategies())
+                elif check_schedule.should_check(i):
+                    check_start = time.perf_counter()
+                    with profiler.timer('calc_exploitability'):
+                        player_expls = self.calc_exploitabilities()
+                    exploitability = max(player_expls)
+                    checked_at = i
+                    check_schedule.record_check(i, time.perf_counter() - check_start, exploitability)
+                    profiler.count('exploitability_checks')
+                    if event is not None:
+                        event.update(exploitability=exploitability, OOP_exploitability=player_expls[0], IP_exploitability=player_expls[1])
+                    print(f'iteration {i} / {max_iter}\nExploitability:\t{exploitability}\n')
+
+                if snapshot is not None and snapshot.should_publish(i):
+                    with profiler.timer('publish_snapshot'):
+                        self.publish_snapshot(snapshot, self.iterations_done + i + 1, player_expls)
+
+            if event is not None:
+                event['elapsed_s'] = time.perf_counter() - start_time
+                telemetry.record(event)
+            if exploitability <= target_expl:
+                profiler.set_info(target_iteration=i, time_to_target_s=time.perf_counter() - start_time)
+                break
+            if max_seconds is not None and time.perf_counter() - start_time >= max_seconds:
+                print(f'time budget of {max_seconds}s used at iteration {i}')
+                break
+
+        if async_checker is not None and max_iter and checked_at != i:
+            # the background checks lag behind CFR (the first one can still be in flight at the end of a short solve),
+            # so wait for the one in flight and then check the strategy that gets saved, if that wasn't the one reported
+            stopped_on_target = exploitability <= target_expl
+            with profiler.timer('async_check_wait'):
+                result = async_checker.poll(wait=True)
+                if result is not None:
+                    checked_at, player_expls, _ = result
+                    exploitability = max(player_expls)
+                    profiler.count('exploitability_checks')
+                if checked_at != i:
+                    async_checker.submit(i, self.average_strategies())
+                    _, player_expls, _ = async_checker.poll(wait=True)
+                    exploitability = max(player_expls)
+                    checked_at = i
+                    profiler.count('exploitability_checks')
+                    if exploitability <= target_expl and not stopped_on_target:
+                        profiler.set_info(target_iteration=i, time_to_target_s=time.perf_counter() - start_time)
+                    print(f'iteration {i} / {max_iter} (checked in the background)\nExploitability:\t{exploitability}\n')
+        if async_checker is not None:
+            profiler.set_info(async_checks=async_checker.stats())
+        if max_iter and checked_at != i and exploitability > target_expl:
+            # out of iterations or time, the last check can be a whole check interval old: report the strategy that gets saved
+            check_start = time.perf_counter()
+            with profiler.timer('calc_exploitability'):
+                player_expls = self.calc_exploitabilities()
+            exploitability = max(player_expls)
+            profiler.count('exploitability_checks')
+            if exploitability <= target_expl:
+                profiler.set_info(target_iteration=i, time_to_target_s=check_start - start_time)
+            print(f'iteration {i} / {max_iter}\nExploitability:\t{exploitability}\n')
+
+        self.iterations_done += i + 1
+        self.exploitabilities = player_expls # [OOP, IP] of the last check, None if there was none
+        if snapshot is not None:
+            self.publish_snapshot(snapshot, self.iterations_done, player_expls, finished=True)
+        profiler.set_info(final_exploitability=exploitability)
+        with profiler.timer('export_solution'):
+            nodes = self.export_solution()
+        with profiler.timer('json_dump'):
+            with open(json_filename, 'w') as json_file:
+                json.dump(nodes, json_file, indent=4)
+
+    def average_strategies(self):
+        '''The strategy sums of the decision nodes, for set_average_strategies on a copy of this tree'''
+        return [node.strat_sum for node in self.nodes if node.kind == 'decision']
+
+    def set_average_strategies(self, strat_sums):
+        for node, strat_sum in zip((node for node in self.nodes if node.kind == 'decision'), strat_sums):
+            node.strat_sum = strat_sum
+
+    def snapshot_layout(self):
+        '''The solver_snapshot layout of the decision nodes, river nodes of a turn spot with one batch entry per (solved) river card'''
+        nodes = [{'id': node.ID, 'atn-sq': node.action_seq, 'avl-acs': list(node.actions), 'player': node.to_act, 'combos': self.combos[node.to_act],
+                  'batch': list(self.river_cards) if node.street == 1 and self.is_turn else None}
+                 for node in self.nodes if node.kind == 'decision']
+        masks = [[np.flatnonzero(entry == 0).tolist() for entry in mask] for mask in self.masks] if self.masks is not None else None
+        return {'engine': 'vec', 'nodes': nodes, 'members': layout_members(self.members), 'masks': masks}
+
+    def publish_snapshot(self, snapshot, iteration, exploitabilities=None, finished=False):
+        '''Writes every average strategy to snapshot, a solver_snapshot.SnapshotWriter of snapshot_layout()'''
+        snapshot.begin()
+        try:
+            for node in self.nodes:
+                if node.kind == 'decision':
+                    offset, size = snapshot.offsets[tuple(node.action_seq)]
+                    snapshot.values[offset:offset + size] = normalise_strategy(node.strat_sum).ravel()
+        finally:
+            snapshot.end(iteration, exploitabilities, finished)
+
+    def export_mask(self, node, b):
+        '''Which combos of the player to act are possible in batch entry b of node, None for all of them'''
+        return self.masks[node.to_act][b] if node.street == 1 and self.is_turn else None
+
+    def _export_node(self, node, ID, action_seq, b, combo_index=None):
+        '''The json dict of batch entry b of node. combo_index[i] is the combo whose data combo i takes (isomorphic river cards)'''
+        entry = {'id': ID, 'atn-sq': action_seq, 'avl-acs': None, 'rg-strat': {}, 'act-EVs': {}, 'rg-EVs': {}}
+        player = node.to_act
+        mask = self.export_mask(node, b)
+        mass = node.mass[player][b]
+        values = node.values[player][b]
+        contrib = node.contribs[player]
+        if node.kind == 'chance':
+            entry['avl-acs'] = list(node.actions)
+            return entry
+        if node.kind == 'decision':
+            entry['avl-acs'] = list(node.actions)
+            strat = normalise_strategy(node.strat_sum[b])
+        for i, combo in enumerate(self.combos[player]):
+            src = i if combo_index is None else combo_index[i]
+            if mask is not None and not mask[src]:
+                continue
+            scale = 1 / mass[src] if mass[src] > 0 else 0
+            entry['rg-EVs'][combo] = json_floats([values[src] * scale + contrib], self.dtype)[0]
+            if node.kind == 'decision':
+                entry['rg-strat'][combo] = json_floats(strat[src], self.dtype)
+                entry['act-EVs'][combo] = json_floats(node.action_values[b, src] * scale + contrib, self.dtype)
+        if self.members is not None:
+            for key in ('rg-strat', 'act-EVs', 'rg-EVs'):
+                entry[key] = expand_combos(entry[key], self.members[player])
+        return entry
+
+    def export_solution(self):
+        '''Returns the list of node dicts that gets saved as the json solution, river nodes once per river card'''
+        self._evaluate(self.nodes[0], *self.root_reach())
+        entries = []
+        chance_nodes = []
+        for node in self.nodes:
+            if node.street == 0:
+                entries.append(self._export_node(node, len(entries), node.action_seq, 0))
+                if node.kind == 'chance':
+                    chance_nodes.append(node)
+        for chance in chance_nodes:
+            subtree = [chance.children[0]]
+            for node in subtree:
+                subtree.extend(node.children)
+            for k, card in enumerate(self.all_river_cards):
+                b, combo_index = k, None
+                if self.river_rep_index is not None:
+                    b = self.river_rep_index[k]
+                for node in subtree:
+                    if self.river_rep_index is not None:
+                        combo_index = self.river_combo_perm[node.to_act][k]
+                    seq = [card if action == '*' else action for action in node.action_seq]
+                    entries.append(self._export_node(node, len(entries), seq, b, combo_index))
+        return entries
+
+
+def main(inputs_file_name, outputs_file_name, profile=False, telemetry=None, adaptive_checks=False, check_budget=0.1, max_seconds=None, isomorphism=False, rank_cache=None, store=None,
+         dtype='float64', state_dir=None, templates=None, snapshot=None, snapshot_every=10, async_checks=False):
+    '''Solves the turn or river spot in inputs_file_name with the vectorized engine, arguments as pysolver_v10.main.
+    state_dir keeps the regrets and strategy sums in a memory-mapped file there (see VecTree.allocate), for trees bigger than RAM.
+    templates is a solver_templates.TemplateCache or its directory to take the betting trees from.
+    snapshot is a file the average strategies are published to every snapshot_every iterations (see solver_snapshot).
+    async_checks runs the exploitability checks in a background process while CFR carries on (see solver_async_check).
+    Returns the VecTree (its state_dir state closed), or None when the solution came from the store'''
+    if isinstance(rank_cache, str):
+        rank_cache = RankCache(rank_cache)
+    profiler = Profiler(enabled=profile)
+    profiler.start()
+    with profiler.timer('get_inputs'):
+        potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl = get_inputs(inputs_file_name)
+    set_bet_config(OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+    spot = None
+    engine = engine_name('vec', np.dtype(dtype).name)
+    if store is not None:
+        store = open_store(store)
+        with profiler.timer('store_lookup'):
+            spot = CanonicalSpot(potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+            entry = write_stored_solution(store, spot, outputs_file_name, target_expl, max_iters, engine)
+        if entry is not None:
+            print(f'stored solution {entry["id"]}: {entry["iterations"]} iterations, exploitability {entry["exploitability"]}')
+            profiler.stop()
+            if profiler.enabled:
+                profiler.set_info(inputs_file=inputs_file_name, store_hit=entry['id'], solution_bytes=os.path.getsize(outputs_file_name))
+                profiler.write_report(report_filename(outputs_file_name))
+            return None
+    templates = open_templates(templates)
+    tree = VecTree(potsz, stacksz, OOP_range, IP_range, board, dtype, isomorphism, state_dir, templates)
+    if isomorphism:
+        print(f'{len(tree.group)} suit symmetries, OOP {len(tree.full_combos[0])} -> {len(tree.combos[0])} combos, '
+              f'IP {len(tree.full_combos[1])} -> {len(tree.combos[1])} combos, {len(tree.all_river_cards)} -> {len(tree.river_cards)} river cards')
+    with profiler.timer('computeEquities'):
+        tree.compute_equities(rank_cache)
+    if rank_cache is not None:
+        profiler.set_info(rank_cache=rank_cache.stats())
+    with profiler.timer('buildTree'):
+        tree.buildTree()
+    profiler.set_info(inputs_file=inputs_file_name, engine='vec', street='turn' if tree.is_turn else 'river', num_nodes=len(tree.nodes),
+                      num_decision_nodes=sum(1 for node in tree.nodes if node.kind == 'decision'),
+                      OOP_combos=len(tree.combos[0]), IP_combos=len(tree.combos[1]), max_iters=max_iters, target_expl=target_expl,
+                      dtype=tree.dtype.name, state_bytes=tree.state.nbytes if tree.state is not None else None)
+    sink = open_sink(telemetry) if isinstance(telemetry, str) else telemetry
+    snapshot_writer = open_snapshot(snapshot, tree.snapshot_layout(), snapshot_every)
+    async_checker = None
+    try:
+        with profiler.timer('do_cfr'):
+            check_schedule = AdaptiveCheckSchedule(target_expl, check_budget, last_iter=max_iters - 1) if adaptive_checks else None
+            if async_checks:
+                with profiler.timer('start_async_checker'):
+                    async_checker = AsyncChecker(tree)
+            tree.do_cfr(max_iters, target_expl, outputs_file_name, profiler, sink, check_schedule, max_seconds, snapshot_writer, async_checker)
+    finally:
+        if async_checker is not None:
+            async_checker.close()
+        if isinstance(telemetry, str):
+            sink.close()
+        if snapshot_writer is not None and snapshot_writer is not snapshot:
+            snapshot_writer.close()
+        tree.close() # the memory-mapped state of state_dir, its file is deleted here where it couldn't be while mapped
+    if spot is not None:
+        with profiler.timer('store_put'):
+            store_solution(store, spot, tree, outputs_file_name, engine, target_expl)
+    profiler.stop()
+    if profiler.enabled:
+        profiler.set_info(solution_bytes=os.path.getsize(outputs_file_name))
+        profiler.write_report(report_filename(outputs_file_name))
+    return tree
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vectorized NLHE turn / river solver')
+    parser.add_argument('inputs', nargs='?', default='solver_inputs.txt')
+    parser.add_argument('outputs', nargs='?', default='solver_results.json')
+    parser.add_argument('--profile', action='store_true', help='write a timing report next to the solution')
+    parser.add_argument('--telemetry', help='write per iteration convergence stats to this .jsonl or .csv file')
+    parser.add_argument('--adaptive-checks', action='store_true', help='schedule exploitability checks from their measured cost')
+    parser.add_argument('--check-budget', type=float, default=0.1, help='max fraction of solve time spent on adaptive checks')
+    parser.add_argument('--max-seconds', type=float, help='stop the solve after this many seconds')
+    parser.add_argument('--isomorphism', action='store_true', help='solve one combo / river card per suit isomorphism class')
+    parser.add_argument('--rank-cache', nargs='?', const=default_cache_dir(), help='reuse hand ranks from this on-disk cache directory (default ~/.cache/pysolver)')
+    parser.add_argument('--store', nargs='?', const=default_store_dir(), help='look up / save solutions in this solution store (default ~/.cache/pysolver/solutions)')
+    parser.add_argument('--dtype', choices=['float64', 'float32'], default='float64', help='float type of every solver array')
+    parser.add_argument('--state-dir', help='keep regrets and strategy sums in a memory-mapped file in this directory instead of RAM')
+    parser.add_argument('--templates', nargs='?', const=default_template_dir(), help='reuse tree templates from this on-disk cache directory (default ~/.cache/pysolver/templates)')
+    parser.add_argument('--snapshot', help='publish the live strategies to this file (eg /dev/shm/spot.snap) for solver_snapshot.py / the viewer to read')
+    parser.add_argument('--snapshot-every', type=int, default=10, help='iterations between snapshot publishes')
+    parser.add_argument('--async-checks', action='store_true', help='check exploitability in a background process while CFR carries on')
+    parser.add_argument('--dry-run', action='store_true', help='only estimate the tree size, memory and time of the solve (see solver_estimate)')
+    args = parser.parse_args()
+    if args.dry_run:
+        import solver_estimate
+        solver_estimate.print_estimate(solver_estimate.estimate(args.inputs, 'vec', dtype=args.dtype, isomorphism=args.isomorphism, state_dir=args.state_dir, templates=args.templates))
+    else:
+        main(args.inputs, args.outputs, args.profile, args.telemetry, args.adaptive_checks, args.check_budget, args.max_seconds, args.isomorphism, args.rank_cache, args.store, args.dtype,
+             args.state_dir, args.templates, args.snapshot, args.snapshot_every, args.async_checks)
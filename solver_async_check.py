@@ -0,0 +1,84 @@
+# asynchronous exploitability checks
+# an exploitability check (a best response for each player) costs a few CFR iterations, and do_cfr normally stops to run it.
+# AsyncChecker runs the checks in a background process instead: the process gets its own copy of the tree when it starts,
+# then for every check only the average strategies are sent over (Tree.average_strategies / VecTree.average_strategies),
+# it puts them into its copy, works out [OOP, IP] exploitability and sends it back tagged with the iteration the strategies
+# are from. Meanwhile CFR carries on, and do_cfr picks the result up at the end of a later iteration, sends the next
+# check straight away (one check is in flight at a time, so checks run back to back on the spare core) and stops once a
+# reported value meets target_expl. The solution saved then has the few iterations done since the checked strategy on top,
+# so do_cfr ends by checking the saved strategy as well (on a short solve the first check may not even be back yet).
+# on a single core box the checker shares the core with CFR, so this only pays off with a free core
+
+import multiprocessing
+import time
+
+
+def _checker_main(conn, tree, init, init_args):
+    if init is not None:
+        init(*init_args)
+    while True:
+        message = conn.recv()
+        if message is None:
+            break
+        iteration, strategies = message
+        start = time.perf_counter()
+        tree.set_average_strategies(strategies)
+        conn.send((iteration, tree.calc_exploitabilities(), time.perf_counter() - start))
+    conn.close()
+
+
+class AsyncChecker(object):
+    '''Background process checking the exploitability of a copy of tree (a pysolver_v10.Tree or pysolver_vec.VecTree).
+    init(*init_args) runs in the process first, to set up module state the checks need (eg pysolver_v10's equities).
+    The tree's shape must not change afterwards (no size pruning)'''
+    def __init__(self, tree, init=None, init_args=()):
+        ctx = multiprocessing.get_context('spawn')
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_checker_main, args=(child_conn, tree, init, init_args), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.pending = None # iteration of the check in flight
+        self.checks = 0
+        self.check_s = 0.0
+
+    def idle(self):
+        return self.pending is None
+
+    def submit(self, iteration, strategies):
+        '''Starts a check of strategies (the tree's average_strategies() at iteration)'''
+        self.conn.send((iteration, strategies))
+        self.pending = iteration
+
+    def poll(self, wait=False):
+        '''(iteration, [OOP, IP] exploitability, seconds the check took) once the check in flight is done, else None.
+        wait=True blocks until it is'''
+        if self.pending is None or (not wait and not self.conn.poll()):
+            return None
+        result = self.conn.recv()
+        self.pending = None
+        self.checks += 1
+        self.check_s += result[2]
+        return result
+
+    def stats(self):
+        return {'checks': self.checks, 'check_s': self.check_s}
+
+    def close(self):
+        '''Stops the process, a check still in flight is dropped'''
+        if self.process.is_alive():
+            if self.pending is None:
+                try:
+                    self.conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+                self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,366 @@
+# benchmark suite of generated river spots
+# spots are generated over a grid of range sizes, bet tree sizes (with and without raises) and stack depths
+# each (spot, engine) run happens in a fresh process so peak RSS and the solver module globals are per run
+# results are appended to a csv and a jsonl history so regressions between versions / commits are obvious
+# v9 has no exploitability checks or profile report, so its strategies are checked with pysolver_v10's best response every
+# 5 iterations (left out of its timings) to get its time to target and final exploitability
+#
+# usage: python solver_benchmark.py --preset quick --engines v9,v10
+
+import argparse
+import csv
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from solver_isomorphism import DECK
+
+
+# canonical boards, dry / paired / monotone / connected
+BOARDS = {
+    'dry': 'Kh9s5d3c2h',
+    'paired': 'QsQd7h4c2s',
+    'monotone': 'Ah8h6h4h2c',
+    'connected': 'Td9c8h7s2d',
+}
+
+# bet tree size k uses the first k of these sizes (pct of pot, a = all in)
+BET_SIZES = ['33', '75', '150', 'a']
+RAISE_SIZES = ['50']
+
+PRESETS = {
+    'quick': {'range_sizes': [10, 30], 'bet_sizes': [1, 2], 'raises': [False, True], 'sprs': [1, 5], 'boards': ['dry']},
+    'standard': {'range_sizes': [10, 50, 200], 'bet_sizes': [1, 2, 3, 4], 'raises': [False, True], 'sprs': [1, 5, 10], 'boards': ['dry', 'paired']},
+    'full': {'range_sizes': [10, 50, 200, 500, 1000], 'bet_sizes': [1, 2, 3, 4], 'raises': [False, True], 'sprs': [1, 5, 10], 'boards': list(BOARDS)},
+}
+
+HISTORY_FIELDS = ['timestamp', 'commit', 'machine', 'python', 'spot', 'engine', 'status', 'board', 'OOP_combos', 'IP_combos',
+                  'num_bet_sizes', 'raises', 'spr', 'max_iters', 'target_expl', 'iterations', 'solve_s', 'iters_per_s',
+                  'time_to_target_s', 'final_exploitability', 'peak_rss_kb', 'output_bytes', 'error']
+
+
+class Spot(object):
+    '''One generated benchmark spot'''
+    def __init__(self, range_size, num_bet_sizes, raises, spr, board_name='dry', pot=100, AI_thresh=70, max_iters=100, target_expl=0.5, seed=0):
+        self.range_size = range_size
+        self.num_bet_sizes = num_bet_sizes
+        self.raises = raises
+        self.spr = spr
+        self.board_name = board_name
+        self.board = BOARDS[board_name]
+        self.pot = pot
+        self.AI_thresh = AI_thresh
+        self.max_iters = max_iters
+        self.target_expl = target_expl
+        self.seed = seed
+
+    @property
+    def key(self):
+        return f'{self.board_name}_r{self.range_size}_b{self.num_bet_sizes}_{"R" if self.raises else "nR"}_spr{self.spr}'
+
+    def random_range(self, rng):
+        board_cards = {self.board[i:i+2] for i in range(0, 10, 2)}
+        live = [card for card in DECK if card not in board_cards]
+        combos = list(itertools.combinations(live, 2))
+        picked = rng.sample(combos, min(self.range_size, len(combos)))
+        return ', '.join(c1 + c2 for c1, c2 in picked)
+
+    def input_lines(self):
+        '''Returns the 12 lines of a solver inputs file, see the header of pysolver_v10'''
+        rng = random.Random(f'{self.seed}-{self.key}')
+        bets = ','.join(BET_SIZES[:self.num_bet_sizes])
+        raises = ','.join(RAISE_SIZES) if self.raises else ''
+        return [str(self.pot), str(self.pot * self.spr), self.random_range(rng), self.random_range(rng), self.board,
+                bets, bets, raises, raises, str(self.AI_thresh), str(self.max_iters), str(self.target_expl)]
+
+    def write(self, filename):
+        with open(filename, 'w') as file:
+            file.write('\n'.join(self.input_lines()))
+        return filename
+
+
+def build_grid(range_sizes, bet_sizes, raises, sprs, boards, max_iters=100, target_expl=0.5, seed=0):
+    '''Returns the list of spots in the cartesian product of the grid'''
+    return [Spot(r, b, ra, spr, board, max_iters=max_iters, target_expl=target_expl, seed=seed)
+            for board, r, b, ra, spr in itertools.product(boards, range_sizes, bet_sizes, raises, sprs)]
+
+
+class V10Checker(object):
+    '''Measures the exploitability of another solver's average strategies with pysolver_v10's best response on the same spot,
+    for older solvers (v9) that have no exploitability check of their own'''
+    def __init__(self, inputs_file):
+        import pysolver_v10
+        potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, self.max_iters, self.target_expl = \
+            pysolver_v10.get_inputs(inputs_file)
+        pysolver_v10.set_bet_config(OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+        pysolver_v10.board = [pysolver_v10.Card.new(board[i:i+2]) for i in range(0, len(board), 2)]
+        pysolver_v10.class_pairs = None
+        pysolver_v10.computeEquities(OOP_range, IP_range)
+        self.tree = pysolver_v10.Tree(potsz, stacksz, OOP_range, IP_range)
+        self.tree.buildTree()
+        self.by_seq = {tuple(node.action_seq): node for node in self.tree.nodes if not node.endNode}
+
+    def check(self, nodes):
+        '''Returns [OOP, IP] exploitability of the avg_strat of the hands of nodes (the other solver's tree nodes)'''
+        for node in nodes:
+            own = self.by_seq.get(tuple(node.action_seq))
+            if own is None or node.endNode:
+                continue
+            strats = {hand.hand: hand.avg_strat for hand in node.player_range.hands_list}
+            for hand in own.player_range.hands_list:
+                if hand.hand in strats:
+                    hand.avg_strat = np.array(strats[hand.hand], dtype=float)
+        return self.tree.calc_exploitabilities()
+
+
+def _instrument_checks(solver, checker, timings, every=5):
+    '''Checks the exploitability of an older solver's strategies with checker every `every` iterations, through its
+    Tree.update_reach_probs, which it calls once before the first iteration and once after each one. The check time is added
+    up in timings['checks_s'] so it can be left out of the solve time, and timings gets iterations, final_exploitability,
+    target_iteration and time_to_target_s (solve time up to the first check under the inputs file's target)'''
+    orig_update_reach_probs = solver.Tree.update_reach_probs
+    timings.update(checks_s=0.0, calls=0, iterations=0, final_exploitability=None)
+
+    def checked_update_reach_probs(self):
+        orig_update_reach_probs(self)
+        iteration = timings['calls'] # iterations done, the first call is before the first iteration
+        timings['calls'] += 1
+        if not iteration or iteration > checker.max_iters:
+            return # before the solve, or do_cfr setting the average strategy after it
+        timings['iterations'] = iteration
+        if iteration % every and iteration != checker.max_iters:
+            return
+        check_start = time.perf_counter()
+        exploitability = max(checker.check(self.nodes))
+        timings['final_exploitability'] = exploitability
+        if exploitability <= checker.target_expl and 'time_to_target_s' not in timings:
+            timings['target_iteration'] = iteration - 1
+            timings['time_to_target_s'] = check_start - timings['do_cfr_start'] - timings['checks_s']
+        timings['checks_s'] += time.perf_counter() - check_start
+
+    solver.Tree.update_reach_probs = checked_update_reach_probs
+
+
+def _run_solver_module(module_name, inputs_file, outputs_file, dtype=None):
+    '''Runs the main of a solver module and returns a dict of solve_s (do_cfr seconds), iterations, final_exploitability and
+    time_to_target_s (do_cfr seconds until the first exploitability check under the target), None where unknown.
+    dtype is passed on to solvers that take one'''
+    solver = importlib.import_module(module_name)
+    timings = {}
+    has_report = 'profile' in solver.main.__code__.co_varnames
+    if hasattr(solver, 'Tree') and not has_report:
+        # older versions have no profile report and no exploitability checks, so time do_cfr directly and
+        # check its strategies with pysolver_v10 (left out of the time)
+        _instrument_checks(solver, V10Checker(inputs_file), timings)
+        orig_do_cfr = solver.Tree.do_cfr
+
+        def timed_do_cfr(self, *args, **kwargs):
+            timings['do_cfr_start'] = start = time.perf_counter()
+            result = orig_do_cfr(self, *args, **kwargs)
+            timings['do_cfr'] = time.perf_counter() - start - timings['checks_s']
+            return result
+
+        solver.Tree.do_cfr = timed_do_cfr
+    profile_file = os.path.splitext(outputs_file)[0] + '.profile.json'
+    kwargs = {}
+    if dtype is not None:
+        if 'dtype' not in solver.main.__code__.co_varnames:
+            raise ValueError(f'{module_name} has no dtype option')
+        kwargs['dtype'] = dtype
+    if has_report:
+        solver.main(inputs_file, outputs_file, profile=True, **kwargs)
+    else:
+        solver.main(inputs_file, outputs_file, **kwargs)
+
+    if os.path.exists(profile_file):
+        with open(profile_file) as file:
+            report = json.load(file)
+        return {'solve_s': report['phases']['do_cfr']['total_s'], 'iterations': report['counters'].get('iterations'),
+                'final_exploitability': report['info'].get('final_exploitability'),
+                'time_to_target_s': report['info'].get('time_to_target_s')}
+    return {'solve_s': timings.get('do_cfr'), 'iterations': timings.get('iterations'),
+            'final_exploitability': timings.get('final_exploitability'), 'time_to_target_s': timings.get('time_to_target_s')}
+
+
+# engine name -> solver module
+ENGINES = {
+    'v9': 'pysolver_v9',
+    'v10': 'pysolver_v10',
+    'vec': 'pysolver_vec',
+}
+
+
+def parse_engine(engine):
+    '''Splits an engine like vec@float32 into (module name, dtype or None)'''
+    name, _, dtype = engine.partition('@')
+    return ENGINES[name], dtype or None
+
+
+def _child(engine, inputs_file, outputs_file, result_queue):
+    import resource
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        module_name, dtype = parse_engine(engine)
+        result = dict(_run_solver_module(module_name, inputs_file, outputs_file, dtype), status='ok')
+    except Exception as e:
+        result = {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+    result['peak_rss_kb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result_queue.put(result)
+
+
+def run_spot(spot, engine, work_dir, timeout=None):
+    '''Solves spot with engine in a fresh process and returns a history row'''
+    inputs_file = spot.write(os.path.join(work_dir, f'{spot.key}.txt'))
+    outputs_file = os.path.join(work_dir, f'{spot.key}_{engine}.json')
+    ctx = multiprocessing.get_context('spawn')
+    result_queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(engine, inputs_file, outputs_file, result_queue))
+    proc.start()
+    proc.join(timeout)
+    if proc.is_alive():
+        proc.terminate()
+        proc.join()
+        result = {'status': 'timeout'}
+    else:
+        try:
+            result = result_queue.get(timeout=5)
+        except queue.Empty:
+            result = {'status': 'error', 'error': f'exit code {proc.exitcode}'}
+
+    iterations = result.get('iterations')
+    final_expl = result.get('final_exploitability')
+    solve_s = result.get('solve_s')
+    row = {
+        'spot': spot.key, 'engine': engine, 'status': result['status'], 'board': spot.board,
+        'OOP_combos': spot.range_size, 'IP_combos': spot.range_size, 'num_bet_sizes': spot.num_bet_sizes,
+        'raises': int(spot.raises), 'spr': spot.spr, 'max_iters': spot.max_iters, 'target_expl': spot.target_expl,
+        'iterations': iterations, 'solve_s': solve_s,
+        'iters_per_s': iterations / solve_s if solve_s else None,
+        'time_to_target_s': result.get('time_to_target_s'),
+        'final_exploitability': final_expl, 'peak_rss_kb': result.get('peak_rss_kb'),
+        'output_bytes': os.path.getsize(outputs_file) if os.path.exists(outputs_file) else None,
+        'error': result.get('error'),
+    }
+    return row
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_history(history_dir):
+    filename = os.path.join(history_dir, 'history.jsonl')
+    if not os.path.exists(filename):
+        return []
+    with open(filename) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def append_history(rows, history_dir):
+    '''Appends rows to history.csv and history.jsonl in history_dir'''
+    os.makedirs(history_dir, exist_ok=True)
+    csv_file = os.path.join(history_dir, 'history.csv')
+    new_file = not os.path.exists(csv_file)
+    with open(csv_file, 'a', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=HISTORY_FIELDS, extrasaction='ignore')
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(history_dir, 'history.jsonl'), 'a') as file:
+        for row in rows:
+            file.write(json.dumps(row) + '\n')
+
+
+def find_regressions(rows, history, threshold=0.2):
+    '''Returns (row, best previous iters/sec) for each row that is more than threshold slower than the best
+    previous run of the same spot and engine on the same machine'''
+    regressions = []
+    for row in rows:
+        if not row.get('iters_per_s'):
+            continue
+        previous = [old['iters_per_s'] for old in history if old['spot'] == row['spot'] and old['engine'] == row['engine']
+                    and old['machine'] == row['machine'] and old.get('iters_per_s')]
+        if previous and row['iters_per_s'] < (1 - threshold) * max(previous):
+            regressions.append((row, max(previous)))
+    return regressions
+
+
+def print_table(rows):
+    print(f'{"spot":<28}{"engine":<14}{"status":<9}{"iters/s":>10}{"to target s":>13}{"expl":>8}{"peak MB":>10}{"out KB":>10}')
+    for row in rows:
+        fmt = lambda value, spec: format(value, spec) if value is not None else '-'
+        print(f'{row["spot"]:<28}{row["engine"]:<14}{row["status"]:<9}{fmt(row["iters_per_s"], ".2f"):>10}'
+              f'{fmt(row["time_to_target_s"], ".2f"):>13}{fmt(row["final_exploitability"], ".3f"):>8}'
+              f'{fmt(row["peak_rss_kb"] / 1024 if row["peak_rss_kb"] else None, ".1f"):>10}'
+              f'{fmt(row["output_bytes"] / 1024 if row["output_bytes"] else None, ".1f"):>10}')
+
+
+def run_benchmarks(spots, engines, history_dir='benchmarks', timeout=None, work_dir=None):
+    '''Runs every spot with every engine, appends the results to the history and returns the rows'''
+    stamp = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': git_commit(),
+             'machine': f'{platform.node()}-{platform.machine()}', 'python': platform.python_version()}
+    history = load_history(history_dir)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        work_dir = work_dir or tmp_dir
+        for spot in spots:
+            for engine in engines:
+                row = dict(stamp, **run_spot(spot, engine, work_dir, timeout))
+                rows.append(row)
+                print(f'{spot.key} {engine}: {row["status"]} in {row["solve_s"] or 0:.2f}s')
+    append_history(rows, history_dir)
+    print_table(rows)
+    for row, best in find_regressions(rows, history):
+        print(f'REGRESSION {row["spot"]} {row["engine"]}: {row["iters_per_s"]:.2f} iters/s vs best {best:.2f}')
+    return rows
+
+
+def parse_list(text, cast=int):
+    return [cast(item) for item in text.split(',') if item]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the solver over a grid of generated river spots')
+    parser.add_argument('--preset', choices=PRESETS, default='quick')
+    parser.add_argument('--range-sizes', help='comma separated combos per range, overrides the preset')
+    parser.add_argument('--bet-sizes', help='comma separated number of bet sizes (1-4), overrides the preset')
+    parser.add_argument('--raises', choices=['yes', 'no', 'both'], help='overrides the preset')
+    parser.add_argument('--sprs', help='comma separated stack to pot ratios, overrides the preset')
+    parser.add_argument('--boards', help=f'comma separated board names from {",".join(BOARDS)}, overrides the preset')
+    parser.add_argument('--engines', default='v9,v10', help=f'comma separated engines from {",".join(ENGINES)}, '
+                        'with @float32 to run one in float32 (eg vec,vec@float32)')
+    parser.add_argument('--max-iters', type=int, default=100)
+    parser.add_argument('--target-expl', type=float, default=0.5)
+    parser.add_argument('--timeout', type=float, default=None, help='seconds before a single run is killed')
+    parser.add_argument('--history-dir', default='benchmarks')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    grid = dict(PRESETS[args.preset])
+    if args.range_sizes:
+        grid['range_sizes'] = parse_list(args.range_sizes)
+    if args.bet_sizes:
+        grid['bet_sizes'] = parse_list(args.bet_sizes)
+    if args.raises:
+        grid['raises'] = {'yes': [True], 'no': [False], 'both': [False, True]}[args.raises]
+    if args.sprs:
+        grid['sprs'] = parse_list(args.sprs, float)
+    if args.boards:
+        grid['boards'] = parse_list(args.boards, str)
+    spots = build_grid(max_iters=args.max_iters, target_expl=args.target_expl, seed=args.seed, **grid)
+    run_benchmarks(spots, parse_list(args.engines, str), args.history_dir, args.timeout)
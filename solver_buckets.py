@@ -0,0 +1,100 @@
+# hand strength bucketing
+# an approximate abstraction for quick solves of wide ranges: each range's combos are grouped into buckets of similar
+# river hand rank, every bucket is solved as one hand and the bucket's strategy is played by all of its combos.
+#  - strength: combos are sorted by their treys rank and cut into levels of equal range weight, combos with the same
+#    rank always share a level
+#  - blockers: each level is split in two (above / below its mean) by how much of the opponent's strong hands (the strongest
+#    third of their range weight) a combo blocks, so bluffs / bluff catchers that block the nuts are kept apart from those that don't
+# the buckets plug into the same machinery as suit isomorphism classes (solver_isomorphism): a bucket is a representative
+# Hand with the summed weight, and bucket vs bucket validity / equity are the pair weighted averages over the member pairs
+# (class_pair_tables). Unlike isomorphism this is lossy, so the mapped strategy has to be checked on the full game
+# (pysolver_v10.main does that with map_bucket_solution)
+
+from treys import Card, Evaluator
+
+from solver_isomorphism import board_list, combo_key
+
+
+def combo_ranks(combos, board, rank_cache=None):
+    '''dict of combo: treys rank on board (smaller is stronger)'''
+    combos = list(combos)
+    if rank_cache is not None:
+        return dict(zip(combos, (int(rank) for rank in rank_cache.combo_ranks(board_list(board), combos))))
+    evaluator = Evaluator()
+    board_ints = [Card.new(card) for card in board_list(board)]
+    return {combo: evaluator.evaluate(board_ints, [Card.new(combo[:2]), Card.new(combo[2:4])]) for combo in combos}
+
+
+def strength_levels(weights, ranks, num_levels):
+    '''dict of combo: level (0 = strongest) cutting the combos sorted by rank into num_levels levels of about equal weight'''
+    order = sorted(weights, key=lambda combo: ranks[combo])
+    total = sum(weights.values()) or 1
+    levels = {}
+    cumulative = 0
+    i = 0
+    while i < len(order):
+        # every combo of the same rank gets the level of the middle of their weight
+        j = i
+        tie_weight = 0
+        while j < len(order) and ranks[order[j]] == ranks[order[i]]:
+            tie_weight += weights[order[j]]
+            j += 1
+        level = min(num_levels - 1, int(num_levels * (cumulative + tie_weight / 2) / total))
+        for combo in order[i:j]:
+            levels[combo] = level
+        cumulative += tie_weight
+        i = j
+    return levels
+
+
+def blocker_shares(combos, opp_weights, opp_ranks):
+    '''dict of combo: share of the weight of the opponent's strongest third that combo blocks'''
+    order = sorted(opp_weights, key=lambda combo: opp_ranks[combo])
+    total = sum(opp_weights.values()) or 1
+    strong = {}
+    cumulative = 0
+    for combo in order:
+        if cumulative >= total / 3:
+            break
+        strong[combo] = opp_weights[combo]
+        cumulative += opp_weights[combo]
+    shares = {}
+    for combo in combos:
+        cards = combo_key(combo)
+        shares[combo] = sum(weight for opp_combo, weight in strong.items() if cards & combo_key(opp_combo)) / (cumulative or 1)
+    return shares
+
+
+def bucket_range(theRange, oppRange, board, num_buckets, blockers=True, rank_cache=None):
+    '''Returns (Range of one representative Hand per bucket with the summed weight, dict of representative: [(member, weight)])
+    with at most num_buckets buckets: num_buckets strength levels, or num_buckets // 2 each split by blockers (a single bucket isn't split)'''
+    from pysolver_v10 import Hand, Range
+    weights = {hand.hand: hand.weighting for hand in theRange.hands_list}
+    if num_buckets >= len(weights):
+        return Range([Hand(combo, weight) for combo, weight in weights.items()]), {combo: [(combo, weight)] for combo, weight in weights.items()}
+    opp_weights = {hand.hand: hand.weighting for hand in oppRange.hands_list}
+    ranks = combo_ranks(set(weights) | set(opp_weights), board, rank_cache)
+    blockers = blockers and num_buckets >= 2
+    num_levels = num_buckets // 2 if blockers else num_buckets
+    levels = strength_levels(weights, ranks, num_levels)
+    buckets = {}
+    for combo in weights:
+        buckets.setdefault(levels[combo], []).append(combo)
+    keys = {combo: (level, 0) for combo, level in levels.items()}
+    if blockers:
+        shares = blocker_shares(weights, opp_weights, ranks)
+        for level, combos in buckets.items():
+            mean = sum(shares[combo] for combo in combos) / len(combos)
+            for combo in combos:
+                keys[combo] = (level, int(shares[combo] > mean + 1e-12))
+
+    grouped = {}
+    for hand in theRange.hands_list: # range order, so a bucket's representative is its first combo in the range
+        grouped.setdefault(keys[hand.hand], []).append(hand.hand)
+    reps = []
+    members = {}
+    for key in sorted(grouped):
+        combos = grouped[key]
+        members[combos[0]] = [(combo, weights[combo]) for combo in combos]
+        reps.append(Hand(combos[0], sum(weights[combo] for combo in combos)))
+    return Range(reps), members
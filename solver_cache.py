@@ -0,0 +1,170 @@
+# persistent on-disk cache of river hand ranks
+# for a 5 card board the treys rank of every one of the 1326 two card combos (0 for the 245 combos the board blocks)
+# is stored as one .npy file named by a hash of the board, so every solve of the same board with any ranges reuses it.
+# equity matrices for any two ranges are then just a slice and a compare of the rank array (see equity_matrix)
+#
+# files are opened memory-mapped, written to a temp file and renamed into place (so readers never see half a file),
+# and the directory is kept under max_bytes by evicting the least recently used boards (file mtime, touched on every hit).
+# writes and evictions take an exclusive lock on a lock file where fcntl exists, so several solver processes can share a cache
+
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+import numpy as np
+from treys import Card, Evaluator
+from solver_isomorphism import CARD_INDEX, DECK
+
+try:
+    import fcntl
+except ImportError: # windows, renames are still atomic so the cache stays consistent, eviction may just overshoot
+    fcntl = None
+
+
+CACHE_VERSION = 1
+COMBOS = [DECK[i] + DECK[j] for i in range(52) for j in range(i + 1, 52)] # canonical order, 1326 combos
+COMBO_INDEX = {combo: i for i, combo in enumerate(COMBOS)}
+
+
+def default_cache_dir():
+    return os.environ.get('PYSOLVER_CACHE', os.path.join(os.path.expanduser('~'), '.cache', 'pysolver'))
+
+def board_list(board):
+    if isinstance(board, str):
+        return [board[i:i+2] for i in range(0, len(board), 2)]
+    return list(board)
+
+def canonical_board(board):
+    '''Board string with the cards in deck order, so Kh9s5d3c2h and 2h3c5d9sKh share a cache entry'''
+    return ''.join(sorted(board_list(board), key=CARD_INDEX.get))
+
+def combo_index(combo):
+    '''Index of a combo string (either card order) in COMBOS'''
+    a, b = CARD_INDEX[combo[:2]], CARD_INDEX[combo[2:4]]
+    if a > b:
+        a, b = b, a
+    return COMBO_INDEX[DECK[a] + DECK[b]]
+
+
+class RankCache(object):
+    '''Content addressed cache of combo rank arrays, one file per board'''
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.evaluator = None
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, board):
+        return hashlib.sha1(f'ranks-v{CACHE_VERSION}:{canonical_board(board)}'.encode()).hexdigest()
+
+    def path(self, board):
+        return os.path.join(self.directory, self.key(board) + '.npy')
+
+    @contextmanager
+    def _lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, '.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def compute_ranks(self, board):
+        '''treys rank of every combo on board, 0 where the board blocks the combo (smaller = stronger)'''
+        if self.evaluator is None:
+            self.evaluator = Evaluator()
+        cards = board_list(board)
+        if len(cards) != 5:
+            raise ValueError(f'rank cache needs a 5 card board, got {board}')
+        board_ints = [Card.new(card) for card in cards]
+        board_set = set(cards)
+        ranks = np.zeros(len(COMBOS), dtype=np.int32)
+        for i, combo in enumerate(COMBOS):
+            if combo[:2] in board_set or combo[2:] in board_set:
+                continue
+            ranks[i] = self.evaluator.evaluate(board_ints, [Card.new(combo[:2]), Card.new(combo[2:])])
+        return ranks
+
+    def ranks(self, board):
+        '''Read only memory-mapped rank array of board, indexed like COMBOS. Computed and stored on a miss'''
+        path = self.path(board)
+        try:
+            ranks = np.load(path, mmap_mode='r')
+            os.utime(path) # mark as recently used
+            self.hits += 1
+            return ranks
+        except (OSError, ValueError): # missing, or evicted / corrupt under us
+            pass
+        self.misses += 1
+        ranks = self.compute_ranks(board)
+        self._store(path, ranks)
+        return ranks
+
+    def _store(self, path, ranks):
+        with self._lock():
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as tmp_file:
+                    np.save(tmp_file, ranks)
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npy'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        return entries
+
+    def _evict(self):
+        '''Deletes least recently used boards until the cache is under max_bytes (call with the lock held)'''
+        if not self.max_bytes:
+            return
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def combo_ranks(self, board, combos):
+        '''Ranks of the given combo strings on board'''
+        return np.asarray(self.ranks(board)[[combo_index(combo) for combo in combos]])
+
+    def equity_matrix(self, board, combos1, combos2):
+        '''equity[i, j] of combos1[i] against combos2[j] on board: 1 win, 0 loss, 0.5 tie (card removal is left to the caller)'''
+        ranks = self.ranks(board)
+        ranks1 = ranks[[combo_index(combo) for combo in combos1]].astype(np.int64)
+        ranks2 = ranks[[combo_index(combo) for combo in combos2]].astype(np.int64)
+        return (np.sign(ranks2[None, :] - ranks1[:, None]) + 1) / 2
+
+    def stats(self):
+        entries = self._entries()
+        return {'directory': self.directory, 'boards': len(entries), 'bytes': sum(size for _, size, _ in entries),
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+    def clear(self):
+        with self._lock():
+            for _, _, name in self._entries():
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
@@ -0,0 +1,332 @@
+# pre-solve resource estimator (dry run)
+# works out the size of a solve from the inputs file without solving it: only the tree skeleton is built (from a tree
+# template, see solver_templates), no equities, no strategies. It reports node counts per street / player, the action
+# counts of the decision nodes and the combos per range, and turns the work of one iteration into estimated memory and
+# seconds per iteration for each engine / dtype.
+#
+# the estimates are linear models of counts taken from the skeleton (eg hands x actions over the decision nodes,
+# combo pairs over the terminal nodes), with constants fitted by calibrate() from small real solves on the machine.
+# calibrate writes them to <cache dir>/estimate_constants.json, DEFAULT_CONSTANTS are from a 1 core x86 box.
+# treat them as +-50%, they are for deciding whether a spot fits, not for benchmarking.
+#
+# usage: python solver_estimate.py inputs.txt --engine vec --dtype float32
+#        python solver_estimate.py --calibrate
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+import pysolver_v10
+import pysolver_vec
+from pysolver_v10 import get_inputs, set_bet_config
+from solver_cache import default_cache_dir
+from solver_buckets import bucket_range
+from solver_isomorphism import symmetry_group, reduce_range
+from solver_templates import open_templates
+
+
+ENGINES = ('v10', 'vec')
+ITEMSIZE = {'float64': 8, 'float32': 4}
+
+# seconds = sum of constant * count, bytes = sum of constant * count (+ the exactly known array bytes), see the features functions
+DEFAULT_CONSTANTS = {
+    'v10': {'iter_s': {'node_visits': 0.0, 'showdown_pairs': 0.0, 'hero_showdown_pairs': 0.0, 'reach_lookups': 7.7e-06},
+            'check_iters': 2.2,
+            'bytes': {'hands': 2830.0, 'hand_actions': 15.7, 'equity_pairs': 600.0, 'export_values': 190.0, 'base': 260000.0}},
+    'vec': {'iter_s': {'nodes': 2.1e-05, 'state_elems': 5.1e-08, 'terminal_pairs': 8.0e-10},
+            'check_iters': 2.7,
+            'bytes': {'state_elems': 1.93, 'eval_elems': 1.44, 'showdown_elems': 0.96, 'export_values': 57.8, 'base': 1155000.0}},
+}
+
+
+def constants_file():
+    return os.path.join(default_cache_dir(), 'estimate_constants.json')
+
+def load_constants(filename=None):
+    '''The calibrated constants from filename (default constants_file()), DEFAULT_CONSTANTS where there are none'''
+    constants = json.loads(json.dumps(DEFAULT_CONSTANTS))
+    try:
+        with open(filename or constants_file(), 'r') as constants_json:
+            for engine, values in json.load(constants_json).items():
+                if engine in constants:
+                    constants[engine].update(values)
+    except (OSError, ValueError):
+        pass
+    return constants
+
+
+def spot_ranges(OOP_range, IP_range, board, isomorphism, buckets=None):
+    '''The ranges the engine solves: with isomorphism on a river, one combo per class, with buckets one per bucket'''
+    if buckets:
+        return bucket_range(OOP_range, IP_range, board, buckets)[0], bucket_range(IP_range, OOP_range, board, buckets)[0]
+    if isomorphism and len(board) == 10:
+        group = symmetry_group(board, (OOP_range, IP_range))
+        if len(group) > 1:
+            return reduce_range(OOP_range, group)[0], reduce_range(IP_range, group)[0]
+    return OOP_range, IP_range
+
+
+def v10_features(template, num_combos):
+    '''Counts of one v10 iteration / solve from the template rows and the [OOP, IP] combo counts.
+    Range.calc_EVs walks the whole subtree below a decision node for every hand and action, evaluating every showdown
+    against the opponent's range (and rebuilding it, with a lookup per combo, where the hero closed the action)'''
+    rows = template.rows
+    children = [[] for _ in rows]
+    for i, row in enumerate(rows):
+        if row[0] is not None:
+            children[row[0]].append(i)
+    # per node, bottom up: nodes below it, and the showdown combo pairs below it per player to act at the showdown
+    below = [0] * len(rows)
+    showdowns = [[0, 0] for _ in rows] # [showdowns with OOP to act, with IP to act] below (and at) each node
+    for i in reversed(range(len(rows))):
+        parent, action, to_act, _, _, _, acts = rows[i]
+        if acts is None and action in ('X', 'C'):
+            showdowns[i][to_act] += 1
+        for child in children[i]:
+            below[i] += 1 + below[child]
+            showdowns[i][0] += showdowns[child][0]
+            showdowns[i][1] += showdowns[child][1]
+    counts = {'node_visits': 0, 'showdown_pairs': 0, 'hero_showdown_pairs': 0, 'reach_lookups': 0}
+    hands = hand_actions = export_values = 0
+    for i, (parent, action, to_act, _, _, _, acts) in enumerate(rows):
+        n_hero, n_opp = num_combos[to_act], num_combos[1 - to_act]
+        hands += n_hero
+        if acts is None:
+            export_values += n_hero
+            continue
+        hand_actions += n_hero * len(acts)
+        export_values += n_hero * (2 * len(acts) + 1)
+        counts['node_visits'] += n_hero * below[i]
+        counts['showdown_pairs'] += n_hero * (showdowns[i][0] + showdowns[i][1]) * n_opp
+        counts['hero_showdown_pairs'] += n_hero * showdowns[i][to_act] * n_opp * n_opp
+        grandchildren = sum(len(children[child]) for child in children[i])
+        counts['reach_lookups'] += n_hero * grandchildren * n_hero
+    sizes = {'hands': hands, 'hand_actions': hand_actions, 'equity_pairs': num_combos[0] * num_combos[1], 'export_values': export_values}
+    return counts, sizes
+
+def vec_features(nodes, num_combos, batch):
+    '''Counts of one vec iteration / solve from the VecNodes (with batch(node) the size of their leading dimension)'''
+    counts = {'nodes': len(nodes), 'state_elems': 0, 'terminal_pairs': 0}
+    eval_elems = export_values = 0
+    for node in nodes:
+        b = batch(node)
+        eval_elems += b * 2 * (num_combos[0] + num_combos[1])
+        n = num_combos[node.to_act]
+        if node.kind == 'decision':
+            counts['state_elems'] += b * n * len(node.actions)
+            eval_elems += b * n * len(node.actions)
+            export_values += b * n * (2 * len(node.actions) + 1)
+        elif node.kind in ('fold', 'showdown'):
+            counts['terminal_pairs'] += b * num_combos[0] * num_combos[1]
+            export_values += b * n
+    sizes = {'state_elems': counts['state_elems'], 'eval_elems': eval_elems, 'export_values': export_values}
+    return counts, sizes
+
+
+def estimate(inputs_file, engine='v10', dtype='float64', isomorphism=False, state_dir=None, templates=None, constants=None, buckets=None, **options):
+    '''Dry run of a solve of inputs_file: builds the tree skeleton only and returns a dict with the node counts
+    (per street and player), action counts, combos, and the estimated memory / seconds of the solve with engine and dtype.
+    buckets (v10) counts the bucketed game only, not the full game the strategy is mapped back to. Other solver options are accepted and ignored'''
+    if engine not in ENGINES:
+        raise ValueError(f'unknown engine {engine}, engines are {",".join(ENGINES)}')
+    constants = (constants or load_constants())[engine]
+    templates = open_templates(templates)
+    itemsize = ITEMSIZE[np.dtype(dtype).name]
+    potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl = get_inputs(inputs_file)
+    set_bet_config(OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+    report = {'inputs_file': inputs_file, 'engine': engine, 'dtype': np.dtype(dtype).name, 'isomorphism': bool(isomorphism),
+              'board': board, 'street': 'turn' if len(board) == 8 else 'river', 'max_iters': max_iters}
+
+    if engine == 'v10':
+        if len(board) != 10:
+            raise ValueError(f'the v10 engine solves river spots, got board {board}')
+        OOP_range, IP_range = spot_ranges(OOP_range, IP_range, board, isomorphism, buckets)
+        num_combos = [len(OOP_range.hands_list), len(IP_range.hands_list)]
+        template = pysolver_v10.tree_template(potsz, stacksz, templates)
+        kinds = [('decision' if row[6] else 'fold' if row[1] == 'F' else 'showdown', row[2], 'river', row[6]) for row in template.rows]
+        counts, sizes = v10_features(template, num_combos)
+        memory = constants['bytes']['base'] + sum(constants['bytes'][key] * value * (itemsize if key == 'hand_actions' else 1) for key, value in sizes.items())
+        state_bytes = sizes['hand_actions'] * 5 * itemsize
+        disk_bytes = 0
+    else:
+        tree = pysolver_vec.VecTree(potsz, stacksz, OOP_range, IP_range, board, dtype, isomorphism, templates=templates)
+        root = tree._build_street(tree.starting_pot, tree.starting_stack, [], 0)
+        nodes = [root]
+        for node in nodes:
+            nodes.extend(node.children)
+        num_combos = [len(tree.combos[0]), len(tree.combos[1])]
+        streets = ('turn', 'river') if tree.is_turn else ('river',)
+        kinds = [(node.kind, node.to_act, streets[node.street], node.actions if node.kind == 'decision' else None) for node in nodes]
+        counts, sizes = vec_features(nodes, num_combos, lambda node: tree.batch_size(node.street))
+        showdown_elems = len(tree.river_cards or [None]) * num_combos[0] * num_combos[1]
+        state_bytes = 2 * sizes['state_elems'] * itemsize
+        disk_bytes = state_bytes if state_dir else 0
+        memory = (constants['bytes']['base'] + state_bytes - disk_bytes + constants['bytes']['eval_elems'] * sizes['eval_elems'] * itemsize
+                  + constants['bytes']['showdown_elems'] * showdown_elems * itemsize + constants['bytes']['export_values'] * sizes['export_values'])
+        report['river_cards'] = len(tree.river_cards) if tree.is_turn else 0
+
+    nodes_by = {}
+    action_counts = {}
+    for kind, to_act, street, acts in kinds:
+        key = f'{street} {kind}' + (f' {"OOP" if to_act == 0 else "IP"}' if kind == 'decision' else '')
+        nodes_by[key] = nodes_by.get(key, 0) + 1
+        if acts:
+            action_counts[len(acts)] = action_counts.get(len(acts), 0) + 1
+    iter_s = sum(constants['iter_s'][key] * value for key, value in counts.items())
+    checks = max_iters // 5
+    report.update(num_nodes=len(kinds), num_decision_nodes=sum(1 for kind in kinds if kind[0] == 'decision'), nodes=nodes_by,
+                  decision_nodes_by_actions={str(acts): count for acts, count in sorted(action_counts.items())},
+                  OOP_combos=num_combos[0], IP_combos=num_combos[1], counts=counts, sizes=sizes,
+                  state_bytes=state_bytes, disk_bytes=disk_bytes, memory_bytes=int(memory), iter_s=iter_s,
+                  check_s=iter_s * constants['check_iters'], solve_s=iter_s * (max_iters + checks * constants['check_iters']))
+    return report
+
+
+def format_bytes(num):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if num < 1024 or unit == 'GB':
+            return f'{num:.1f}{unit}' if unit != 'B' else f'{int(num)}B'
+        num /= 1024
+
+def parse_bytes(text):
+    '''"512M", "8G", "1000000" -> bytes'''
+    text = str(text).strip().upper().rstrip('B')
+    scale = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}.get(text[-1:], 1)
+    return int(float(text.rstrip('KMGT')) * scale)
+
+def print_estimate(report):
+    print(f'{report["inputs_file"]}: {report["street"]} spot, board {report["board"]}, engine {report["engine"]} {report["dtype"]}'
+          f'{" isomorphism" if report["isomorphism"] else ""}')
+    print(f'combos: OOP {report["OOP_combos"]}, IP {report["IP_combos"]}' + (f', {report["river_cards"]} river cards' if report.get('river_cards') else ''))
+    print(f'nodes: {report["num_nodes"]} ({report["num_decision_nodes"]} decision)')
+    for key, count in sorted(report['nodes'].items()):
+        print(f'    {key:<24}{count:>8}')
+    print('decision nodes by number of actions: ' + ', '.join(f'{acts}: {count}' for acts, count in report['decision_nodes_by_actions'].items()))
+    print(f'memory: ~{format_bytes(report["memory_bytes"])} (regrets / strategies {format_bytes(report["state_bytes"])}'
+          + (f', {format_bytes(report["disk_bytes"])} of it on disk)' if report['disk_bytes'] else ')'))
+    print(f'time: ~{report["iter_s"]:.3g}s per iteration, ~{report["check_s"]:.3g}s per exploitability check, '
+          f'~{report["solve_s"]:.3g}s for {report["max_iters"]} iterations')
+
+
+# downgrades a runner tries in order when a spot is over its limits, each is kept if it helps
+DOWNGRADES = [{'dtype': 'float32'}, {'isomorphism': True}]
+
+class ResourceLimitError(Exception):
+    pass
+
+def fit_limits(inputs_file, engine, options=None, max_memory=None, max_seconds=None, constants=None):
+    '''Returns (options, estimate) for solving inputs_file within max_memory bytes and max_seconds: options with the
+    DOWNGRADES applied that were needed, and max_seconds set if the projected time is still over the limit (the solve then
+    stops early with what it has). Raises ResourceLimitError if the memory estimate stays over max_memory'''
+    options = dict(options or {})
+    report = estimate(inputs_file, engine, constants=constants, **options)
+    def over(report):
+        return (max_memory is not None and report['memory_bytes'] > max_memory) or (max_seconds is not None and report['solve_s'] > max_seconds)
+    for downgrade in DOWNGRADES:
+        if not over(report):
+            break
+        if all(options.get(key) == value for key, value in downgrade.items()):
+            continue
+        candidate = {**options, **downgrade}
+        candidate_report = estimate(inputs_file, engine, constants=constants, **candidate)
+        if candidate_report['memory_bytes'] < report['memory_bytes'] or candidate_report['solve_s'] < report['solve_s']:
+            options, report = candidate, candidate_report
+    if max_memory is not None and report['memory_bytes'] > max_memory:
+        raise ResourceLimitError(f'estimated memory {format_bytes(report["memory_bytes"])} is over the limit of {format_bytes(max_memory)}'
+                                 f' (options {json.dumps(options)})')
+    if max_seconds is not None and report['solve_s'] > max_seconds:
+        options['max_seconds'] = min(max_seconds, options.get('max_seconds') or max_seconds)
+    return options, report
+
+
+def _calibration_spot(filename, combos, board, bets, max_iters, seed):
+    rng = random.Random(seed)
+    deck = [rank + suit for rank in '23456789TJQKA' for suit in 'cdhs']
+    free = [card for card in deck if card not in {board[i:i+2] for i in range(0, len(board), 2)}]
+    ranges = []
+    for _ in range(2):
+        hands = set()
+        while len(hands) < combos:
+            a, b = rng.sample(free, 2)
+            hands.add(a + b)
+        ranges.append(', '.join(sorted(hands)))
+    with open(filename, 'w') as spot_file:
+        spot_file.write('\n'.join(['100', '300', ranges[0], ranges[1], board, bets, bets, '50,100', '50,100', '70', str(max_iters), '0']) + '\n')
+
+def calibrate(filename=None, quick=False):
+    '''Solves a few small generated spots with both engines (a minute or two), fits the constants to their measured iteration / check times
+    and peak memory, and writes them to filename (default constants_file()). Returns the constants'''
+    spots = {'v10': [(6, 'Kh9s5d3c2h', '33,75'), (12, 'Kh9s5d3c2h', '75'), (12, 'Kh9s5d3c2h', '33,75,150'), (16, 'Kh9s5d3c2h', '50,100')],
+             'vec': [(60, 'Kh9s5d3c2h', '33,75,150'), (250, 'Kh9s5d3c2h', '50'), (30, 'Jh8s5h2d', '75'), (60, 'Jh8s5h2d', '33,100')]}
+    constants = load_constants(os.devnull)
+    with tempfile.TemporaryDirectory() as directory:
+        for engine, engine_spots in spots.items():
+            solver = pysolver_v10 if engine == 'v10' else pysolver_vec
+            rows, times, checks, memories = [], [], [], []
+            for n, (combos, board, bets) in enumerate(engine_spots[:2] if quick else engine_spots):
+                spot = os.path.join(directory, f'{engine}-{n}.txt')
+                _calibration_spot(spot, combos, board, bets, 10, n)
+                output = os.path.join(directory, f'{engine}-{n}.json')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    solver.main(spot, output, profile=True)
+                    with open(output.replace('.json', '.profile.json')) as report_file:
+                        phases = json.load(report_file)['phases']
+                    tracemalloc.start()
+                    solver.main(spot, output)
+                    memories.append(tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                iter_phases = ('cfr_pass',) if engine == 'vec' else ('calc_EVs', 'update_strat_on_iteration', 'apply_next_strats', 'update_reach_probs')
+                times.append(sum(phases[name]['total_s'] for name in iter_phases if name in phases) / 10)
+                checks.append(phases['calc_exploitability']['mean_s'] / times[-1])
+                rows.append(estimate(spot, engine, constants={engine: constants[engine]}))
+            # iteration seconds: non negative least squares over the counts, by dropping negative terms and refitting
+            keys = list(rows[0]['counts'])
+            while keys:
+                matrix = np.array([[row['counts'][key] for key in keys] for row in rows], dtype=float)
+                fit = np.linalg.lstsq(matrix, np.array(times), rcond=None)[0]
+                if (fit >= 0).all():
+                    break
+                keys = [key for key, value in zip(keys, fit) if value >= 0]
+            constants[engine]['iter_s'] = {key: (float(dict(zip(keys, fit)).get(key, 0.0)) if keys else 0.0) for key in rows[0]['counts']}
+            constants[engine]['check_iters'] = float(np.median(checks))
+            # memory: a scale on the default byte model plus a fixed base (evaluator tables and the like), the sizes are too
+            # collinear to fit each term
+            model = np.array([row['memory_bytes'] - constants[engine]['bytes']['base'] for row in rows], dtype=float)
+            scale, base = np.linalg.lstsq(np.stack([model, np.ones(len(model))], axis=1), np.array(memories, dtype=float), rcond=None)[0]
+            if base < 0 or scale <= 0:
+                scale, base = float(np.median(np.array(memories) / model)), 0.0
+            constants[engine]['bytes'] = {key: value * scale for key, value in constants[engine]['bytes'].items()}
+            constants[engine]['bytes']['base'] = float(base)
+    filename = filename or constants_file()
+    os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+    with open(filename, 'w') as constants_json:
+        json.dump(constants, constants_json, indent=4)
+    return constants
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Estimate the size, memory and time of a solve without solving it')
+    parser.add_argument('inputs', nargs='?', help='solver inputs file')
+    parser.add_argument('--engine', choices=ENGINES, default='v10')
+    parser.add_argument('--dtype', choices=list(ITEMSIZE), default='float64')
+    parser.add_argument('--isomorphism', action='store_true')
+    parser.add_argument('--state-dir', help='vec engine: regrets and strategy sums memory-mapped in this directory')
+    parser.add_argument('--json', action='store_true', help='print the estimate as json')
+    parser.add_argument('--calibrate', action='store_true', help='fit the constants on this machine (takes a minute or two) and save them')
+    args = parser.parse_args()
+    if args.calibrate:
+        print(json.dumps(calibrate(), indent=4))
+        print(f'saved to {constants_file()}')
+    if args.inputs:
+        report = estimate(args.inputs, args.engine, args.dtype, args.isomorphism, args.state_dir)
+        if args.json:
+            print(json.dumps(report, indent=4))
+        else:
+            print_estimate(report)
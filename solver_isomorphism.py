@@ -0,0 +1,154 @@
+# suit isomorphism
+# on boards like 2c2h2s2d3h many combos are strategically identical, eg AsAc / AdAc / AsAd are all the same hand
+# the symmetry group of a spot is every suit permutation that maps the board to itself and each range to itself
+# (same combos with the same weights). Combos (and river cards) in the same orbit of that group get the same strategy,
+# so only one representative per orbit needs solving:
+#  - river spots: each orbit of combos becomes one class with the summed weight. Card removal differs between members,
+#    so class vs class validity / equity are the pair weighted averages over all member pairs
+#  - turn spots: only one river card per orbit is solved, the others are the same subgame with the suits permuted
+
+import itertools
+from treys import Card, Evaluator
+
+
+RANKS = '23456789TJQKA'
+SUITS = 'cdhs'
+DECK = [rank + suit for rank in RANKS for suit in SUITS] # deck order, the card indices used everywhere
+CARD_INDEX = {card: i for i, card in enumerate(DECK)}
+
+
+def permute_card(card, perm):
+    return card[0] + perm[card[1]]
+
+def combo_key(combo):
+    '''Order independent key of a combo string, AsKc and KcAs give the same key'''
+    return frozenset((combo[:2], combo[2:4]))
+
+def permute_combo_key(combo, perm):
+    return frozenset((permute_card(combo[:2], perm), permute_card(combo[2:4], perm)))
+
+def invert(perm):
+    return {v: k for k, v in perm.items()}
+
+def board_list(board):
+    if isinstance(board, str):
+        return [board[i:i+2] for i in range(0, len(board), 2)]
+    return list(board)
+
+
+def range_invariant(theRange, perm, tol=1e-9):
+    '''True if perm maps every combo of theRange to a combo of theRange with the same weight'''
+    weights = {combo_key(hand.hand): hand.weighting for hand in theRange.hands_list}
+    for key, weight in weights.items():
+        image = frozenset(permute_card(card, perm) for card in key)
+        if image not in weights or abs(weights[image] - weight) > tol:
+            return False
+    return True
+
+
+def symmetry_group(board, ranges=()):
+    '''Returns the suit permutations (dicts suit: suit, identity first) that fix the board and every range'''
+    board_set = set(board_list(board))
+    group = []
+    for image in itertools.permutations(SUITS):
+        perm = dict(zip(SUITS, image))
+        if {permute_card(card, perm) for card in board_set} != board_set:
+            continue
+        if all(range_invariant(theRange, perm) for theRange in ranges):
+            group.append(perm)
+    return group
+
+
+def combo_orbits(combos, group):
+    '''Splits combos into orbits under group. Returns a list of orbits, each a list of combos (in the given order),
+    the first of which is the representative'''
+    index = {combo_key(combo): combo for combo in combos}
+    seen = set()
+    orbits = []
+    for combo in combos:
+        key = combo_key(combo)
+        if key in seen:
+            continue
+        orbit = []
+        for perm in group:
+            image = permute_combo_key(combo, perm)
+            if image in index and image not in seen:
+                seen.add(image)
+                orbit.append(index[image])
+        orbits.append(sorted(orbit, key=combos.index))
+    return orbits
+
+
+def reduce_range(theRange, group):
+    '''Returns (Range of one representative Hand per orbit with the summed weight, dict of representative: [(member, weight)])'''
+    from pysolver_v10 import Hand, Range
+    weights = {hand.hand: hand.weighting for hand in theRange.hands_list}
+    reps = []
+    members = {}
+    for orbit in combo_orbits([hand.hand for hand in theRange.hands_list], group):
+        rep = orbit[0]
+        members[rep] = [(combo, weights[combo]) for combo in orbit]
+        reps.append(Hand(rep, sum(weights[combo] for combo in orbit)))
+    return Range(reps), members
+
+
+def card_orbits(cards, group):
+    '''Returns [(representative card, [(card, perm mapping the representative to card), ...]), ...]'''
+    seen = set()
+    orbits = []
+    for card in cards:
+        if card in seen:
+            continue
+        orbit = []
+        for perm in group:
+            image = permute_card(card, perm)
+            if image not in seen:
+                seen.add(image)
+                orbit.append((image, perm))
+        orbits.append((card, orbit))
+    return orbits
+
+
+def class_pair_tables(members0, members1, board, rank_cache=None):
+    '''Returns a dict of (rep a, rep b): (valid fraction, equity of a vs b) for every pair of classes of opposite players, both orders.
+    valid fraction is the weight share of member pairs that don't share a card, equity is over those pairs only.
+    rank_cache is an optional solver_cache.RankCache to read the hand ranks from'''
+    combos = {combo for members in (members0, members1) for orbit in members.values() for combo, _ in orbit}
+    if rank_cache is not None:
+        combos = list(combos)
+        ranks = dict(zip(combos, (int(rank) for rank in rank_cache.combo_ranks(board_list(board), combos))))
+    else:
+        evaluator = Evaluator()
+        board_ints = [Card.new(card) for card in board_list(board)]
+        ranks = {combo: evaluator.evaluate(board_ints, [Card.new(combo[:2]), Card.new(combo[2:4])]) for combo in combos}
+
+    tables = {}
+    for rep0, orbit0 in members0.items():
+        W0 = sum(w for _, w in orbit0)
+        for rep1, orbit1 in members1.items():
+            W1 = sum(w for _, w in orbit1)
+            valid = equity = 0.0
+            for combo0, w0 in orbit0:
+                key0 = combo_key(combo0)
+                for combo1, w1 in orbit1:
+                    if key0 & combo_key(combo1):
+                        continue
+                    valid += w0 * w1
+                    if ranks[combo0] < ranks[combo1]: # smallest evaluator value = strongest hand
+                        equity += w0 * w1
+                    elif ranks[combo0] == ranks[combo1]:
+                        equity += w0 * w1 / 2
+            valid_frac = valid / (W0 * W1) if W0 * W1 else 0
+            eq = equity / valid if valid else 0.5
+            tables[(rep0, rep1)] = (valid_frac, eq)
+            tables[(rep1, rep0)] = (valid_frac, 1 - eq)
+    return tables
+
+
+def expand_combos(values, members):
+    '''Expands a dict keyed by representative combos to every member of its class'''
+    expanded = {}
+    for rep, value in values.items():
+        for combo, _ in members.get(rep, [(rep, None)]):
+            expanded[combo] = value
+    return expanded
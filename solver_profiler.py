@@ -0,0 +1,174 @@
+# instrumentation for the solve pipeline
+# named timers and counters around each phase (and per CFR iteration), optional cProfile / tracemalloc capture
+# and a machine readable JSON report that is written next to the solution file
+
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+REPORT_VERSION = 1
+
+
+def report_filename(json_filename, suffix='.profile.json'):
+    '''Returns the path of a file that sits next to the solution file, eg solver_results.json -> solver_results.profile.json'''
+    return os.path.splitext(json_filename)[0] + suffix
+
+
+class PhaseTimer(object):
+    '''Accumulated wall time of one named phase'''
+    def __init__(self):
+        self.total = 0.0
+        self.calls = 0
+        self.min = None
+        self.max = 0.0
+
+    def add(self, elapsed):
+        self.total += elapsed
+        self.calls += 1
+        if self.min is None or elapsed < self.min:
+            self.min = elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self):
+        return {'total_s': self.total, 'calls': self.calls, 'mean_s': self.total / self.calls if self.calls else 0.0,
+                'min_s': self.min or 0.0, 'max_s': self.max}
+
+
+class Profiler(object):
+    '''Collects phase timings, counters and per iteration timings for one solve.
+    When enabled is False every method is a cheap no-op, so the solver can always be given a profiler'''
+    def __init__(self, enabled=True, use_cprofile=False, use_tracemalloc=False, top_n=25):
+        self.enabled = enabled
+        self.use_cprofile = enabled and use_cprofile
+        self.use_tracemalloc = enabled and use_tracemalloc
+        self.top_n = top_n
+        self.phases = {}
+        self.counters = {}
+        self.info = {}
+        self.iterations = []
+        self._iter_phases = None
+        self._cprofile = None
+        self._tracemalloc = None
+        self._started = None
+        self._wall = 0.0
+
+    def start(self):
+        if not self.enabled:
+            return
+        self._started = time.perf_counter()
+        if self.use_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.use_cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self):
+        if not self.enabled or self._started is None:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            top = tracemalloc.take_snapshot().statistics('lineno')[:self.top_n]
+            self._tracemalloc = {
+                'current_bytes': current,
+                'peak_bytes': peak,
+                'top': [{'location': str(stat.traceback[0]), 'size_bytes': stat.size, 'count': stat.count} for stat in top]
+            }
+            tracemalloc.stop()
+        self._wall = time.perf_counter() - self._started
+        self._started = None
+
+    @contextmanager
+    def timer(self, name):
+        '''Times the enclosed block under name. Inside an iteration the time is also added to that iteration's breakdown'''
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if name not in self.phases:
+                self.phases[name] = PhaseTimer()
+            self.phases[name].add(elapsed)
+            if self._iter_phases is not None:
+                self._iter_phases[name] = self._iter_phases.get(name, 0.0) + elapsed
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set_info(self, **kwargs):
+        '''Static facts about the solve (tree size, combos, ...) that are copied into the report'''
+        if self.enabled:
+            self.info.update(kwargs)
+
+    @contextmanager
+    def iteration(self, i):
+        '''Wraps one CFR iteration, recording its total time and the time of each phase timed within it'''
+        if not self.enabled:
+            yield
+            return
+        self._iter_phases = {}
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.iterations.append({'iter': i, 'total_s': elapsed, 'phases': self._iter_phases})
+            self._iter_phases = None
+            self.count('iterations')
+
+    def cprofile_stats(self):
+        '''Returns the top_n functions by cumulative time as a list of dicts'''
+        if self._cprofile is None:
+            return None
+        stats = pstats.Stats(self._cprofile, stream=io.StringIO())
+        rows = []
+        for (filename, lineno, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+            rows.append({'function': f'{os.path.basename(filename)}:{lineno}({func})', 'ncalls': nc,
+                         'tottime_s': tt, 'cumtime_s': ct})
+        rows.sort(key=lambda row: row['cumtime_s'], reverse=True)
+        return rows[:self.top_n]
+
+    def report(self):
+        '''Returns the report as a json serialisable dict'''
+        iter_times = [it['total_s'] for it in self.iterations]
+        summary = {}
+        if iter_times:
+            summary = {'count': len(iter_times), 'total_s': sum(iter_times), 'mean_s': sum(iter_times) / len(iter_times),
+                       'min_s': min(iter_times), 'max_s': max(iter_times),
+                       'iters_per_s': len(iter_times) / sum(iter_times) if sum(iter_times) else None}
+        return {
+            'version': REPORT_VERSION,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'wall_s': self._wall,
+            'info': self.info,
+            'phases': {name: timer.as_dict() for name, timer in self.phases.items()},
+            'counters': self.counters,
+            'iteration_summary': summary,
+            'iterations': self.iterations,
+            'tracemalloc': self._tracemalloc,
+            'cprofile': self.cprofile_stats()
+        }
+
+    def write_report(self, filename):
+        if not self.enabled:
+            return
+        with open(filename, 'w') as json_file:
+            json.dump(self.report(), json_file, indent=4)
+        if self._cprofile is not None:
+            # raw stats as well, for snakeviz / pstats
+            self._cprofile.dump_stats(os.path.splitext(filename)[0] + '.prof')
@@ -0,0 +1,201 @@
+# range weight what-if sweep
+# re-solves one spot for several variants of the ranges' weightings (eg more bluffs in OOP's range, IP's top pairs halved)
+# on a fixed tree. the tree (Tree.buildTree) and the equities only depend on the combos, the board and the bet config,
+# so they are built / computed once, and a variant only swaps the Hand.weighting of its combos (Tree.set_weights).
+# the base spot is solved first (or loaded from a solution of it), then the variants are split into one chain per worker
+# process: every worker gets a copy of the solved base tree and solves its chain one variant after the other, each
+# carrying on from the strategies / regrets the previous variant left, for at most variant_iters iterations.
+# the warm start keeps all the iterations behind it, scaling it down to a few iterations (as Tree.resolve does) lets
+# the first iterations on the new weights throw the strategies far off before they come back
+#
+# variants file: json list of {"name": ..., "OOP": {combo: multiplier}, "IP": {combo: multiplier}}, the multipliers
+# apply to the inputs file's weightings, combos not listed keep them
+#
+# output: one solution json per variant in the output directory and range_sweep.csv / range_sweep.json with the root EVs,
+# root strategy, exploitability and iterations of every variant
+#
+# usage: python solver_range_sweep.py inputs.txt variants.json sweep_dir --processes 4
+
+import argparse
+import copy
+import csv
+import json
+import math
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+import pysolver_v10
+from pysolver_v10 import FixedCheckSchedule, Tree, get_inputs, set_bet_config, computeEquities
+from treys import Card
+
+
+SUMMARY_FIELDS = ['variant', 'chain', 'warm_start', 'iterations', 'exploitability', 'OOP_EV', 'IP_EV', 'root_strategy', 'solve_s', 'solution']
+
+_base_tree = None
+
+
+def load_variants(filename):
+    with open(filename, 'r') as file:
+        variants = json.load(file)
+    for i, variant in enumerate(variants):
+        variant.setdefault('name', f'variant{i}')
+        variant.setdefault('OOP', {})
+        variant.setdefault('IP', {})
+    return variants
+
+def variant_weights(base_weights, variant):
+    '''[OOP, IP] dicts of combo: weighting of variant, every combo of the base ranges (base_weights) included so that
+    set_weights also undoes the previous variant of a chain'''
+    weights = []
+    for player, key in enumerate(('OOP', 'IP')):
+        unknown = set(variant[key]) - set(base_weights[player])
+        if unknown:
+            raise ValueError(f'{variant["name"]}: {", ".join(sorted(unknown))} not in the {key} range')
+        weights.append({combo: weight * variant[key].get(combo, 1) for combo, weight in base_weights[player].items()})
+    return weights
+
+def variant_distance(variant1, variant2):
+    '''Sum over the combos of the log ratio of their multipliers in the 2 variants, 0 for the same weights'''
+    distance = 0
+    for key in ('OOP', 'IP'):
+        for combo in set(variant1[key]) | set(variant2[key]):
+            multipliers = (variant1[key].get(combo, 1), variant2[key].get(combo, 1))
+            if min(multipliers) <= 0:
+                distance += 0 if max(multipliers) <= 0 else 10
+            else:
+                distance += abs(math.log(multipliers[0] / multipliers[1]))
+    return distance
+
+def make_chains(variants, processes):
+    '''Splits the variants into at most processes chains of similar size. The variants are sorted by distance from the base
+    and dealt round robin, then each chain goes from the variant closest to the base outwards'''
+    base = {'OOP': {}, 'IP': {}}
+    order = sorted(range(len(variants)), key=lambda i: variant_distance(variants[i], base))
+    return [chain for chain in (order[start::processes] for start in range(processes)) if chain]
+
+def file_name(name):
+    return re.sub(r'[^A-Za-z0-9_.+-]+', '_', name)
+
+
+def root_strategy(tree):
+    root = tree.nodes[0]
+    return dict(zip(root.availActs, (float(frequency) for frequency in root.player_range.get_range_action_freqs())))
+
+def _init_worker(tree, bet_config, equities, quiet):
+    '''Worker process start: a copy of the solved base tree, the bet config and the equities of the spot'''
+    global _base_tree
+    _base_tree = tree
+    set_bet_config(*bet_config)
+    pysolver_v10.equities = equities
+    pysolver_v10.class_pairs = None
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+def solve_chain(chain, variants, base_weights, outputs, variant_iters, target_expl, tree=None):
+    '''Solves the variants of chain (indices into variants) one after the other, each starting from where the previous one
+    (the first from the base solution) left the tree. Returns their summary rows'''
+    tree = copy.deepcopy(tree if tree is not None else _base_tree)
+    rows = []
+    warm_start = 'base'
+    for i in chain:
+        start = time.perf_counter()
+        OOP_weights, IP_weights = variant_weights(base_weights, variants[i])
+        tree.set_weights(0, OOP_weights)
+        tree.set_weights(1, IP_weights)
+        iterations_before = tree.iterations_done
+        tree.do_cfr(variant_iters, target_expl, outputs[i])
+        OOP_EV = float(tree.nodes[0].calc_EV_range())
+        rows.append({'variant': variants[i]['name'], 'chain': chain[0], 'warm_start': warm_start,
+                     'iterations': tree.iterations_done - iterations_before,
+                     'exploitability': max(tree.exploitabilities) if tree.exploitabilities else None,
+                     'OOP_EV': OOP_EV, 'IP_EV': tree.nodes[0].pot_size - OOP_EV, 'root_strategy': root_strategy(tree),
+                     'solve_s': time.perf_counter() - start, 'solution': outputs[i]})
+        warm_start = variants[i]['name']
+    return rows
+
+
+def range_sweep(inputs_file, output_dir, variants, processes=None, variant_iters=None, base_solution=None, quiet=True):
+    '''Solves the spot in inputs_file, then every variant of its range weights (see load_variants) on the same tree.
+    Returns the summary rows, the base spot first then the variants in order. variant_iters caps the iterations of every
+    variant (default a quarter of the inputs file's), base_solution is a solution json of the base spot to start from
+    instead of solving it'''
+    potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, max_iters, target_expl = get_inputs(inputs_file)
+    if variant_iters is None:
+        variant_iters = max(1, max_iters // 4)
+    bet_config = (OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+    set_bet_config(*bet_config)
+    pysolver_v10.board = [Card.new(board[i:i+2]) for i in range(0, 10, 2)]
+    computeEquities(OOP_range, IP_range)
+    os.makedirs(output_dir, exist_ok=True)
+    base_weights = [{hand.hand: hand.weighting for hand in theRange.hands_list} for theRange in (OOP_range, IP_range)]
+    for variant in variants:
+        variant_weights(base_weights, variant) # fails on unknown combos before anything is solved
+
+    start = time.perf_counter()
+    tree = Tree(potsz, stacksz, OOP_range, IP_range)
+    tree.buildTree()
+    base_output = os.path.join(output_dir, 'base.json')
+    if base_solution is not None:
+        print(f'starting from {base_solution}')
+        tree.load_solution(base_solution, max_iters)
+        # one iteration, checked, to get the exploitability of the loaded solution and write it out
+        tree.do_cfr(1, target_expl, base_output, check_schedule=FixedCheckSchedule(every=1, start=0))
+    else:
+        print('solving the base spot')
+        tree.do_cfr(max_iters, target_expl, base_output)
+    OOP_EV = float(tree.nodes[0].calc_EV_range())
+    base_row = {'variant': 'base', 'chain': None, 'warm_start': os.path.basename(base_solution) if base_solution else None,
+                'iterations': tree.iterations_done, 'exploitability': max(tree.exploitabilities) if tree.exploitabilities else None,
+                'OOP_EV': OOP_EV, 'IP_EV': potsz - OOP_EV, 'root_strategy': root_strategy(tree),
+                'solve_s': time.perf_counter() - start, 'solution': base_output}
+    print(f'base: OOP EV {OOP_EV:.3f}, exploitability {base_row["exploitability"]}, {base_row["solve_s"]:.1f}s')
+
+    outputs = [os.path.join(output_dir, file_name(variant['name']) + '.json') for variant in variants]
+    processes = min(processes or os.cpu_count(), len(variants)) or 1
+    chains = make_chains(variants, processes)
+    rows = [None] * len(variants)
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes, _init_worker, (tree, bet_config, pysolver_v10.equities, quiet)) as pool:
+        results = [pool.apply_async(solve_chain, (chain, variants, base_weights, outputs, variant_iters, target_expl)) for chain in chains]
+        for chain, result in zip(chains, results):
+            for i, row in zip(chain, result.get()):
+                rows[i] = row
+                print(f'{row["variant"]}: OOP EV {row["OOP_EV"]:.3f}, exploitability {row["exploitability"]}, {row["solve_s"]:.1f}s')
+    return [base_row] + rows
+
+
+def write_summary(rows, output_dir):
+    with open(os.path.join(output_dir, 'range_sweep.csv'), 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows({**row, 'root_strategy': json.dumps(row['root_strategy'])} for row in rows)
+    with open(os.path.join(output_dir, 'range_sweep.json'), 'w') as file:
+        json.dump(rows, file, indent=4)
+
+
+def print_table(rows):
+    print(f'{"variant":<24}{"OOP EV":>9}{"IP EV":>9}{"expl":>8}{"iters":>7}{"s":>7}  root strategy')
+    for row in rows:
+        expl = f'{row["exploitability"]:.3f}' if row['exploitability'] is not None else '-'
+        strategy = ' '.join(f'{action} {frequency:.0%}' for action, frequency in row['root_strategy'].items())
+        print(f'{row["variant"]:<24}{row["OOP_EV"]:>9.3f}{row["IP_EV"]:>9.3f}{expl:>8}{row["iterations"]:>7}{row["solve_s"]:>7.1f}  {strategy}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Re-solve one spot for variants of the range weights on the same tree')
+    parser.add_argument('inputs', help='solver inputs file of the base spot')
+    parser.add_argument('variants', help='json list of {"name", "OOP": {combo: multiplier}, "IP": {combo: multiplier}}')
+    parser.add_argument('output_dir')
+    parser.add_argument('--processes', type=int, help='worker processes, each solving a chain of variants (default one per cpu)')
+    parser.add_argument('--variant-iters', type=int, help='max iterations of every variant (default a quarter of the inputs file max)')
+    parser.add_argument('--base', help='solution json of the base spot to start from instead of solving it')
+    parser.add_argument('--verbose', action='store_true', help='show the solver output of every variant')
+    args = parser.parse_args()
+
+    rows = range_sweep(args.inputs, args.output_dir, load_variants(args.variants), args.processes, args.variant_iters, args.base,
+                       not args.verbose)
+    write_summary(rows, args.output_dir)
+    print_table(rows)
@@ -0,0 +1,186 @@
+# live strategy snapshots
+# a long solve publishes its current average strategy and exploitability every `every` iterations to a memory-mapped
+# file (put it in /dev/shm for plain shared memory) that any number of other processes can attach to read-only while it runs.
+#
+# file layout:
+#   header: magic, format version, state (0 solving, 1 finished), seq, iteration, exploitability, OOP / IP exploitability,
+#           publish time, layout bytes
+#   layout: json of the decision nodes (action sequence, actions, combos, batch labels) and where their values are
+#   data:   float64, every decision node's strategies (batch x combos x actions, row major) one node after the other
+#
+# the layout is written once when the file is created, the header fields and the data are rewritten by every publish
+# under a seqlock: the writer makes seq odd, writes, then makes it even again. A reader copies the data between two reads
+# of seq and retries if seq was odd or has moved, so it never returns a half written snapshot, and the writer never waits
+# for the readers. The file is created under a temp name and renamed into place, so readers still attached to the file of
+# an earlier solve keep reading that one.
+#
+# usage: python solver_snapshot.py /dev/shm/spot.snap                 (progress of the solve writing it)
+#        python solver_snapshot.py /dev/shm/spot.snap --out now.json  (the current strategy as a solution json)
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+from solver_isomorphism import expand_combos
+
+
+MAGIC = b'PYSNAP01'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIQqddddQ') # magic, version, state, seq, iteration, exploitability, OOP, IP, time, layout bytes
+SEQ_OFFSET = 16
+STATE_OFFSET = 12
+SOLVING, FINISHED = 0, 1
+
+
+class SnapshotWriter(object):
+    '''Creates the snapshot file at path for layout, a dict with 'nodes': [{'id', 'atn-sq', 'avl-acs', 'player', 'combos',
+    'batch' (list of labels, eg river cards, or None for one entry)}, ...] and optionally 'members' ([OOP, IP] dicts of
+    representative combo: member combos) and 'masks' ([OOP, IP] lists per batch entry of the combo indices not possible there).
+    Every node gets 'offset' / 'size' into the data, offsets has them by tuple(action sequence). publish every `every` iterations'''
+    def __init__(self, path, layout, every=10):
+        self.path = path
+        self.every = every
+        self.offsets = {}
+        size = 0
+        for node in layout['nodes']:
+            node['size'] = len(node['batch'] or [None]) * len(node['combos']) * len(node['avl-acs'])
+            node['offset'] = size
+            self.offsets[tuple(node['atn-sq'])] = (size, node['size'])
+            size += node['size']
+        layout_bytes = json.dumps(layout).encode()
+        self.data_offset = -(-(HEADER.size + len(layout_bytes)) // 8) * 8
+        self.seq = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w+b') as tmp_file:
+                tmp_file.truncate(self.data_offset + 8 * max(size, 1))
+                tmp_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, SOLVING, 0, -1, np.nan, np.nan, np.nan, time.time(), len(layout_bytes)))
+                tmp_file.write(layout_bytes)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.file = open(path, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        self.values = np.ndarray((size,), dtype=np.float64, buffer=self.mm, offset=self.data_offset)
+
+    def should_publish(self, i):
+        return (i + 1) % self.every == 0
+
+    def begin(self):
+        '''Starts a publish: readers retry until end() is called'''
+        self.seq += 1
+        struct.pack_into('<Q', self.mm, SEQ_OFFSET, self.seq)
+
+    def end(self, iteration, exploitabilities=None, finished=False):
+        '''Ends a publish, with the iteration the values are from and [OOP, IP] exploitability of the last check (None if none yet)'''
+        OOP_expl, IP_expl = exploitabilities if exploitabilities is not None else (np.nan, np.nan)
+        struct.pack_into('<I', self.mm, STATE_OFFSET, FINISHED if finished else SOLVING)
+        struct.pack_into('<qdddd', self.mm, SEQ_OFFSET + 8, iteration, max(OOP_expl, IP_expl), OOP_expl, IP_expl, time.time())
+        self.seq += 1
+        struct.pack_into('<Q', self.mm, SEQ_OFFSET, self.seq)
+
+    def close(self):
+        if self.mm is not None:
+            del self.values
+            self.mm.close()
+            self.file.close()
+            self.mm = None
+
+
+class SnapshotReader(object):
+    '''Read-only view of a snapshot file, safe to use while a solve is publishing to it'''
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as snapshot_file:
+            self.mm = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, *_, layout_len = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'{path} is not a version {FORMAT_VERSION} solver snapshot')
+        self.layout = json.loads(self.mm[HEADER.size:HEADER.size + layout_len])
+        size = sum(node['size'] for node in self.layout['nodes'])
+        self.values = np.frombuffer(self.mm, dtype=np.float64, count=size, offset=-(-(HEADER.size + layout_len) // 8) * 8)
+
+    def read(self, timeout=5):
+        '''Returns a consistent snapshot: dict of seq, iteration (-1 before the first publish), exploitability, OOP_exploitability,
+        IP_exploitability (None before the first check), time, finished and values (a copy of the data)'''
+        deadline = time.monotonic() + timeout
+        while True:
+            seq = struct.unpack_from('<Q', self.mm, SEQ_OFFSET)[0]
+            if seq % 2 == 0:
+                _, _, state, _, iteration, expl, OOP_expl, IP_expl, published, _ = HEADER.unpack_from(self.mm, 0)
+                values = self.values.copy()
+                if struct.unpack_from('<Q', self.mm, SEQ_OFFSET)[0] == seq:
+                    nan_to_none = lambda x: None if np.isnan(x) else x
+                    return {'seq': seq, 'iteration': iteration, 'exploitability': nan_to_none(expl), 'OOP_exploitability': nan_to_none(OOP_expl),
+                            'IP_exploitability': nan_to_none(IP_expl), 'time': published, 'finished': state == FINISHED, 'values': values}
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'{self.path} is being rewritten too often to read')
+            time.sleep(0)
+
+    def solution(self, snapshot=None):
+        '''The strategies of snapshot (default a new read) as solution json nodes ('id', 'atn-sq', 'avl-acs', 'rg-strat'), one per
+        batch entry, '*' in the action sequence replaced by its label. No EVs, those are only worked out at the end of a solve'''
+        snapshot = snapshot or self.read()
+        members = self.layout.get('members')
+        masks = self.layout.get('masks')
+        nodes = []
+        for node in self.layout['nodes']:
+            batch = node['batch'] or [None]
+            strats = snapshot['values'][node['offset']:node['offset'] + node['size']].reshape(len(batch), len(node['combos']), len(node['avl-acs']))
+            for b, label in enumerate(batch):
+                blocked = set(masks[node['player']][b]) if masks and label is not None else ()
+                rg_strat = {combo: [float(x) for x in strats[b, i]] for i, combo in enumerate(node['combos']) if i not in blocked}
+                if members:
+                    rg_strat = expand_combos(rg_strat, {rep: [(combo, None) for combo in combos] for rep, combos in members[node['player']].items()})
+                seq = [label if action == '*' else action for action in node['atn-sq']]
+                nodes.append({'id': len(nodes), 'atn-sq': seq, 'avl-acs': node['avl-acs'], 'rg-strat': rg_strat})
+        return nodes
+
+    def close(self):
+        del self.values
+        self.mm.close()
+
+
+def layout_members(iso_members):
+    '''layout 'members' from [OOP, IP] dicts of representative: [(member, weight)], None stays None'''
+    if iso_members is None:
+        return None
+    return [{rep: [combo for combo, _ in members] for rep, members in player_members.items()} for player_members in iso_members]
+
+
+def open_snapshot(snapshot, layout, every=10):
+    '''SnapshotWriter at path snapshot for layout, or snapshot itself if it already is one (None stays None)'''
+    if snapshot is None or isinstance(snapshot, SnapshotWriter):
+        return snapshot
+    return SnapshotWriter(snapshot, layout, every)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Read the live strategy snapshot of a running solve')
+    parser.add_argument('snapshot', help='snapshot file given to the solver with --snapshot')
+    parser.add_argument('--out', help='write the current strategies to this solution json')
+    parser.add_argument('--watch', type=float, help='print the progress every this many seconds until the solve finishes')
+    args = parser.parse_args()
+
+    reader = SnapshotReader(args.snapshot)
+    while True:
+        snapshot = reader.read()
+        expl = f'{snapshot["exploitability"]:.3f}' if snapshot['exploitability'] is not None else '-'
+        print(f'iteration {snapshot["iteration"]}, exploitability {expl}, {"finished" if snapshot["finished"] else "solving"}, '
+              f'published {time.time() - snapshot["time"]:.1f}s ago')
+        if args.watch is None or snapshot['finished']:
+            break
+        time.sleep(args.watch)
+    if args.out:
+        with open(args.out, 'w') as json_file:
+            json.dump(reader.solution(snapshot), json_file, indent=4)
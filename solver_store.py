@@ -0,0 +1,263 @@
+# local solution database
+# every solved spot is stored once under a canonical hash of the game: pot, stack, board, ranges and bet config.
+# spots that only differ by a suit permutation (eg Kh9s5d3c2h with hearts/spades swapped everywhere) get the same hash:
+# the spot is rewritten with the suit permutation giving the smallest description and the solution is stored in those
+# canonical suits, then mapped back to the caller's suits on a load
+#
+# layout: <directory>/index.sqlite has one row per stored solution (spot hash, precision metadata, blob filename),
+# <directory>/blobs/*.json.gz the gzipped solution json (same format as the solver output).
+# a spot can be stored several times, a lookup returns the most precise one that meets the requested exploitability
+
+import gzip
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import time
+import uuid
+
+from solver_cache import default_cache_dir
+from solver_isomorphism import CARD_INDEX, RANKS, SUITS, permute_card, invert, board_list
+
+
+STORE_VERSION = 1
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS solutions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spot_key TEXT NOT NULL,
+    created REAL NOT NULL,
+    engine TEXT,
+    board TEXT NOT NULL,
+    board_class TEXT NOT NULL,
+    pot REAL NOT NULL,
+    stack REAL NOT NULL,
+    OOP_combos INTEGER,
+    IP_combos INTEGER,
+    iterations INTEGER,
+    exploitability REAL,
+    OOP_exploitability REAL,
+    IP_exploitability REAL,
+    target_expl REAL,
+    blob TEXT NOT NULL,
+    bytes INTEGER,
+    spot TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS solutions_spot ON solutions (spot_key, exploitability);
+CREATE INDEX IF NOT EXISTS solutions_board ON solutions (board_class);
+'''
+
+
+def is_card(item):
+    return isinstance(item, str) and len(item) == 2 and item[0] in RANKS and item[1] in SUITS
+
+def normalise_combo(combo):
+    '''Combo string with the higher card (deck order) first, so AsKc and KcAs are the same string'''
+    cards = sorted((combo[:2], combo[2:4]), key=CARD_INDEX.get, reverse=True)
+    return cards[0] + cards[1]
+
+def permute_combo(combo, perm):
+    return normalise_combo(permute_card(combo[:2], perm) + permute_card(combo[2:4], perm))
+
+def sorted_board(cards):
+    return ''.join(sorted(cards, key=CARD_INDEX.get))
+
+def board_class(board):
+    '''Smallest sorted board string over all suit permutations, the same for every suit isomorphic board'''
+    cards = board_list(board)
+    return min(sorted_board(permute_card(card, dict(zip(SUITS, image))) for card in cards) for image in itertools.permutations(SUITS))
+
+
+class CanonicalSpot(object):
+    '''A spot from get_inputs in canonical suits. key is the hash that identical or suit isomorphic spots share,
+    perm maps the spot's suits to the canonical ones'''
+    def __init__(self, potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh):
+        self.pot = float(potsz)
+        self.stack = float(stacksz)
+        # combo names as the caller spelled them, to map a stored solution back
+        self.names = [{normalise_combo(hand.hand): hand.hand for hand in theRange.hands_list} for theRange in (OOP_range, IP_range)]
+        ranges = [[(hand.hand, round(float(hand.weighting), 9)) for hand in theRange.hands_list] for theRange in (OOP_range, IP_range)]
+        cards = board_list(board)
+
+        best = None
+        for image in itertools.permutations(SUITS):
+            perm = dict(zip(SUITS, image))
+            form = [sorted_board(permute_card(card, perm) for card in cards),
+                    [sorted((permute_combo(combo, perm), weight) for combo, weight in player_range) for player_range in ranges]]
+            text = json.dumps(form)
+            if best is None or text < best[0]:
+                best = (text, perm, form)
+        _, self.perm, (self.board, self.ranges) = best
+        self.inverse = invert(self.perm)
+        self.board_class = board_class(cards)
+        self.bet_config = {'OOP_bets': list(OOP_b_szs), 'IP_bets': list(IP_b_szs), 'OOP_raises': list(OOP_r_szs),
+                           'IP_raises': list(IP_r_szs), 'AI_thresh': float(AI_thresh)}
+        self.description = {'version': STORE_VERSION, 'pot': self.pot, 'stack': self.stack, 'board': self.board,
+                            'ranges': self.ranges, 'bets': self.bet_config}
+        self.key = hashlib.sha256(json.dumps(self.description, sort_keys=True).encode()).hexdigest()
+
+    def _map_solution(self, solution, perm, names=None):
+        '''Rewrites every combo and card of a solution (list of node dicts) with perm. names maps normalised combos to output names'''
+        combo_map = {} # a solution only has a few distinct combos / cards, so each is mapped once
+        card_map = {}
+        def map_combo(combo):
+            if combo not in combo_map:
+                combo_map[combo] = permute_combo(combo, perm)
+            return combo_map[combo]
+        def map_action(action):
+            if action not in card_map:
+                card_map[action] = permute_card(action, perm) if is_card(action) else action
+            return card_map[action]
+
+        mapped = []
+        for node in solution:
+            node = dict(node)
+            node['atn-sq'] = [map_action(action) for action in node['atn-sq']]
+            if node.get('avl-acs'):
+                node['avl-acs'] = [map_action(action) for action in node['avl-acs']]
+            player_names = {}
+            if names is not None:
+                # the node's combos are all from one player's range, whose spelling is used
+                combos = {map_combo(combo) for combo in node['rg-EVs']}
+                player_names = next((player for player in names if combos <= player.keys()), {})
+            for key in ('rg-strat', 'act-EVs', 'rg-EVs'):
+                node[key] = {player_names.get(map_combo(combo), map_combo(combo)): value for combo, value in node[key].items()}
+            mapped.append(node)
+        return mapped
+
+    def to_canonical(self, solution):
+        return self._map_solution(solution, self.perm)
+
+    def from_canonical(self, solution):
+        return self._map_solution(solution, self.inverse, self.names)
+
+
+class SolutionStore(object):
+    '''SQLite index + gzipped json blobs of solved spots'''
+    def __init__(self, directory=None):
+        self.directory = directory or default_store_dir()
+        self.blob_dir = os.path.join(self.directory, 'blobs')
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(self.directory, 'index.sqlite'), timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, spot, solution, engine=None, iterations=None, exploitability=None, OOP_exploitability=None,
+            IP_exploitability=None, target_expl=None):
+        '''Stores solution (list of node dicts in the spot's own suits) for spot (a CanonicalSpot). Returns the entry id'''
+        blob = f'{spot.key[:16]}-{uuid.uuid4().hex}.json.gz'
+        path = os.path.join(self.blob_dir, blob)
+        data = json.dumps(spot.to_canonical(solution)).encode()
+        # written under a temp name and renamed, so the index never points at a partial file
+        with gzip.open(path + '.tmp', 'wb') as blob_file:
+            blob_file.write(data)
+        os.replace(path + '.tmp', path)
+        with self.db:
+            cursor = self.db.execute(
+                'INSERT INTO solutions (spot_key, created, engine, board, board_class, pot, stack, OOP_combos, IP_combos, iterations, '
+                'exploitability, OOP_exploitability, IP_exploitability, target_expl, blob, bytes, spot) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (spot.key, time.time(), engine, spot.board, spot.board_class, spot.pot, spot.stack, len(spot.ranges[0]), len(spot.ranges[1]),
+                 iterations, exploitability, OOP_exploitability, IP_exploitability, target_expl, blob, len(data), json.dumps(spot.description)))
+        return cursor.lastrowid
+
+    def lookup(self, spot, max_exploitability=None, min_iterations=None, engine=None):
+        '''The most precise stored entry (dict of the index columns) of spot with exploitability <= max_exploitability,
+        or if min_iterations is given also one solved for at least min_iterations iterations by engine (see engine_name).
+        Iterations of different engines, modes or precisions don't compare, so without engine min_iterations is ignored.
+        None if there is none'''
+        query = 'SELECT * FROM solutions WHERE spot_key = ?'
+        params = [spot.key]
+        if max_exploitability is not None:
+            condition = 'exploitability <= ?'
+            params.append(max_exploitability)
+            if min_iterations is not None and engine is not None:
+                condition += ' OR (engine = ? AND iterations >= ?)'
+                params += [engine, min_iterations]
+            query += f' AND ({condition})'
+        row = self.db.execute(query + ' ORDER BY exploitability IS NULL, exploitability, created DESC LIMIT 1', params).fetchone()
+        return dict(row) if row is not None else None
+
+    def query(self, board=None, pot=None, stack=None, max_exploitability=None, limit=None):
+        '''Entries matching the filters, most recent first. board matches every suit isomorphic board'''
+        clauses, params = [], []
+        if board is not None:
+            clauses.append('board_class = ?')
+            params.append(board_class(board))
+        for column, value in (('pot', pot), ('stack', stack)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(float(value))
+        if max_exploitability is not None:
+            clauses.append('exploitability <= ?')
+            params.append(max_exploitability)
+        query = 'SELECT * FROM solutions' + (' WHERE ' + ' AND '.join(clauses) if clauses else '') + ' ORDER BY created DESC'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        return [dict(row) for row in self.db.execute(query, params)]
+
+    def get(self, entry_id):
+        row = self.db.execute('SELECT * FROM solutions WHERE id = ?', (entry_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def load(self, entry, spot=None):
+        '''The solution of entry (dict or id). Without spot it is in the canonical suits, with it in spot's suits'''
+        if not isinstance(entry, dict):
+            entry = self.get(entry)
+        with gzip.open(os.path.join(self.blob_dir, entry['blob']), 'rb') as blob_file:
+            solution = json.loads(blob_file.read())
+        return spot.from_canonical(solution) if spot is not None else solution
+
+    def delete(self, entry_id):
+        entry = self.get(entry_id)
+        if entry is None:
+            return
+        with self.db:
+            self.db.execute('DELETE FROM solutions WHERE id = ?', (entry_id,))
+        try:
+            os.remove(os.path.join(self.blob_dir, entry['blob']))
+        except OSError:
+            pass
+
+
+def default_store_dir():
+    return os.path.join(default_cache_dir(), 'solutions')
+
+def open_store(store):
+    '''SolutionStore from a directory name (None = default location), or store itself if it already is one'''
+    if isinstance(store, SolutionStore):
+        return store
+    return SolutionStore(store)
+
+
+def engine_name(engine, dtype='float64'):
+    '''The engine column of a solution: the engine and mode (eg v10, v10-mccfr, vec), with @float32 for a float32 solve'''
+    return engine if str(dtype) == 'float64' else f'{engine}@{dtype}'
+
+def write_stored_solution(store, spot, json_filename, max_exploitability=None, min_iterations=None, engine=None):
+    '''On a hit (see SolutionStore.lookup) writes the stored solution of spot to json_filename in the spot's suits and returns its entry,
+    else returns None'''
+    entry = store.lookup(spot, max_exploitability, min_iterations, engine)
+    if entry is None:
+        return None
+    with open(json_filename, 'w') as json_file:
+        json_file.write(json.dumps(store.load(entry, spot))) # compact, indenting a big solution costs seconds
+    return entry
+
+
+def store_solution(store, spot, tree, json_filename, engine, target_expl=None):
+    '''Stores the solution a solver just wrote to json_filename with the iterations / exploitability of tree (either engine)'''
+    with open(json_filename, 'r') as json_file:
+        solution = json.load(json_file)
+    expls = tree.exploitabilities or [None, None]
+    exploitability = max(expls) if expls[0] is not None else None
+    return store.put(spot, solution, engine, tree.iterations_done, exploitability, expls[0], expls[1], target_expl)
@@ -0,0 +1,176 @@
+# bet size sweep
+# solves one spot (ranges, board, pot, stacks from an inputs file) under a grid of bet / raise size configs and compares them.
+# the equities only depend on the ranges and the board, so they are computed once and handed to every worker process.
+# the config with every size of the grid (added to the sweep if the grid doesn't have it) is solved first from uniform.
+# after that every config is warm started (Tree.load_solution, actions matched by name) from the closest already solved
+# config that has all of its sizes, and solved in parallel for at most warm_iters iterations.
+# warm starts only ever remove sizes: a removed size's share is spread over the other actions and the solve carries on from
+# there, while a size the warm start didn't have starts at 0% and takes about as long to find as a cold solve.
+# the warm start counts as many iterations as went into it, a light warm start is soon washed out by the first noisy
+# iterations and ends up no better than a cold solve
+#
+# output: one solution json per config in the output directory and sweep.csv / sweep.json with the root EVs,
+# exploitability and iterations of every config
+#
+# usage: python solver_sweep.py inputs.txt sweep_dir --oop-bets "33;75;33,75" --ip-bets "50;100" --processes 4
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import pysolver_v10
+from pysolver_v10 import Tree, get_inputs, set_bet_config, computeEquities
+from treys import Card
+
+
+SIZE_LISTS = ('OOP_bets', 'IP_bets', 'OOP_raises', 'IP_raises')
+SUMMARY_FIELDS = ['config', 'OOP_bets', 'IP_bets', 'OOP_raises', 'IP_raises', 'warm_start', 'warm_weight', 'iterations', 'exploitability',
+                  'OOP_EV', 'IP_EV', 'solve_s', 'num_nodes', 'solution']
+
+
+def config_name(config):
+    return '_'.join(f'{key}-{"+".join(config[key]) or "none"}' for key in SIZE_LISTS)
+
+def size_key(size):
+    return float('inf') if 'a' in size.lower() else float(size)
+
+def config_union(configs):
+    '''The config with every size of configs'''
+    return {key: sorted({size for config in configs for size in config[key]}, key=size_key) for key in SIZE_LISTS}
+
+def config_contains(config, sub):
+    return all(set(sub[key]) <= set(config[key]) for key in SIZE_LISTS)
+
+def config_distance(config1, config2):
+    '''Number of sizes in one config and not the other, over the 4 size lists'''
+    return sum(len(set(config1[key]) ^ set(config2[key])) for key in SIZE_LISTS)
+
+def size_grid(OOP_bets, IP_bets, OOP_raises, IP_raises):
+    '''Every combination of the options for each size list (each a list of lists of sizes)'''
+    return [dict(zip(SIZE_LISTS, [list(sizes) for sizes in combo])) for combo in itertools.product(OOP_bets, IP_bets, OOP_raises, IP_raises)]
+
+def parse_options(text, default):
+    '''"33,75;150;" -> [['33', '75'], ['150'], []]. None keeps the inputs file's sizes'''
+    if text is None:
+        return [default]
+    return [[size.strip().replace('A', 'a') for size in option.split(',') if size.strip()] for option in text.split(';')]
+
+
+def _init_worker(equities, quiet):
+    '''Worker process start: the equities of the spot are the same for every config'''
+    pysolver_v10.equities = equities
+    pysolver_v10.class_pairs = None
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+
+def solve_config(spot, config, outputs_file, warm_file=None, max_iters=None, warm_weight=10):
+    '''Builds and solves the tree of one config (in this process, the equities must be set). Returns its summary row'''
+    start = time.perf_counter()
+    set_bet_config(config['OOP_bets'], config['IP_bets'], config['OOP_raises'], config['IP_raises'], spot['AI_thresh'])
+    tree = Tree(spot['pot'], spot['stack'], spot['OOP_range'], spot['IP_range'])
+    tree.buildTree()
+    if warm_file is not None:
+        tree.load_solution(warm_file, warm_weight)
+    tree.do_cfr(max_iters or spot['max_iters'], spot['target_expl'], outputs_file)
+    # do_cfr leaves the average strategy in place, so this is the EV of the solution
+    OOP_EV = float(tree.nodes[0].calc_EV_range())
+    return {'config': config_name(config), **{key: ','.join(config[key]) for key in SIZE_LISTS},
+            'warm_start': os.path.basename(warm_file) if warm_file else None, 'warm_weight': warm_weight if warm_file else 0,
+            'iterations': tree.iterations_done - (warm_weight if warm_file else 0),
+            'exploitability': max(tree.exploitabilities) if tree.exploitabilities else None,
+            'OOP_EV': OOP_EV, 'IP_EV': spot['pot'] - OOP_EV, 'solve_s': time.perf_counter() - start,
+            'num_nodes': len(tree.nodes), 'solution': outputs_file}
+
+
+def sweep(inputs_file, output_dir, configs, processes=None, warm_iters=None, warm_weight=None, quiet=True):
+    '''Solves the spot in inputs_file for every config (dict of OOP_bets, IP_bets, OOP_raises, IP_raises lists) and returns
+    the summary rows in config order (plus the config with every size, last, if configs don't have it). warm_iters caps the iterations of warm started configs (default a quarter of the inputs file's),
+    warm_weight is the iterations a warm start counts as (default the iterations behind the solution it starts from)'''
+    potsz, stacksz, OOP_range, IP_range, board, _, _, _, _, AI_thresh, max_iters, target_expl = get_inputs(inputs_file)
+    spot = {'pot': potsz, 'stack': stacksz, 'OOP_range': OOP_range, 'IP_range': IP_range, 'AI_thresh': AI_thresh,
+            'max_iters': max_iters, 'target_expl': target_expl}
+    if warm_iters is None:
+        warm_iters = max(1, max_iters // 4)
+    pysolver_v10.board = [Card.new(board[i:i+2]) for i in range(0, 10, 2)]
+    computeEquities(OOP_range, IP_range)
+    os.makedirs(output_dir, exist_ok=True)
+
+    configs = list(configs)
+    union = config_union(configs)
+    if not any(config_contains(union, config) and config_contains(config, union) for config in configs):
+        configs.append(union)
+    first = next(i for i, config in enumerate(configs) if config_contains(config, union))
+    outputs = [os.path.join(output_dir, config_name(config) + '.json') for config in configs]
+    rows = [None] * len(configs)
+    processes = processes or os.cpu_count()
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes, _init_worker, (pysolver_v10.equities, quiet)) as pool:
+        print(f'solving {configs[first]} from uniform')
+        rows[first] = pool.apply(solve_config, (spot, configs[first], outputs[first]))
+        solved = [first]
+        pending = [i for i in range(len(configs)) if i != first]
+        running = {}
+        while pending or running:
+            # keep every worker busy, each new config starting from the closest solution with all its sizes there is at that point
+            while pending and len(running) < processes:
+                sources = {j: min((k for k in solved if config_contains(configs[k], configs[j])), key=lambda k: config_distance(configs[j], configs[k]))
+                           for j in pending}
+                i = min(pending, key=lambda j: config_distance(configs[j], configs[sources[j]]))
+                pending.remove(i)
+                source = sources[i]
+                weight = warm_weight or rows[source]['iterations'] + rows[source]['warm_weight']
+                running[i] = pool.apply_async(solve_config, (spot, configs[i], outputs[i], outputs[source], warm_iters, weight))
+            done = [i for i, result in running.items() if result.ready()]
+            if not done:
+                time.sleep(0.05)
+                continue
+            for i in done:
+                rows[i] = running.pop(i).get()
+                solved.append(i)
+                print(f'{rows[i]["config"]}: OOP EV {rows[i]["OOP_EV"]:.3f}, exploitability {rows[i]["exploitability"]}, {rows[i]["solve_s"]:.1f}s')
+    return rows
+
+
+def write_summary(rows, output_dir):
+    with open(os.path.join(output_dir, 'sweep.csv'), 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(output_dir, 'sweep.json'), 'w') as file:
+        json.dump(rows, file, indent=4)
+
+
+def print_table(rows):
+    print(f'{"OOP bets":<14}{"IP bets":<14}{"OOP raises":<12}{"IP raises":<12}{"OOP EV":>9}{"IP EV":>9}{"expl":>8}{"iters":>7}{"s":>7}')
+    for row in sorted(rows, key=lambda row: -row['OOP_EV']):
+        expl = f'{row["exploitability"]:.3f}' if row['exploitability'] is not None else '-'
+        print(f'{row["OOP_bets"] or "-":<14}{row["IP_bets"] or "-":<14}{row["OOP_raises"] or "-":<12}{row["IP_raises"] or "-":<12}'
+              f'{row["OOP_EV"]:>9.3f}{row["IP_EV"]:>9.3f}{expl:>8}{row["iterations"]:>7}{row["solve_s"]:>7.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Solve one spot under a grid of bet / raise sizes and compare the root EVs')
+    parser.add_argument('inputs', help='solver inputs file, its sizes are used for any list not swept')
+    parser.add_argument('output_dir')
+    parser.add_argument('--oop-bets', help='semicolon separated options of comma separated sizes, eg "33;75;33,75"')
+    parser.add_argument('--ip-bets')
+    parser.add_argument('--oop-raises', help='an empty option ("50;") means no raise')
+    parser.add_argument('--ip-raises')
+    parser.add_argument('--processes', type=int, help='worker processes (default one per cpu)')
+    parser.add_argument('--warm-iters', type=int, help='max iterations of warm started configs (default a quarter of the inputs file max)')
+    parser.add_argument('--warm-weight', type=int, help='iterations a warm start counts as (default the iterations behind it)')
+    parser.add_argument('--verbose', action='store_true', help='show the solver output of every config')
+    args = parser.parse_args()
+
+    _, _, _, _, _, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, _, _, _ = get_inputs(args.inputs)
+    defaults = [[size for size in sizes if size] for sizes in (OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs)]
+    configs = size_grid(*(parse_options(text, default) for text, default in
+                          zip((args.oop_bets, args.ip_bets, args.oop_raises, args.ip_raises), defaults)))
+    rows = sweep(args.inputs, args.output_dir, configs, args.processes, args.warm_iters, args.warm_weight, not args.verbose)
+    write_summary(rows, args.output_dir)
+    print_table(rows)
@@ -0,0 +1,140 @@
+# convergence telemetry for do_cfr
+# the solver calls sink.record(event) once per iteration with a flat dict (see ITERATION_FIELDS)
+# sinks are pluggable: anything with record(event) and close() works, eg a CallbackSink wrapping a function
+# JSONLSink and CSVSink write to a file that is rotated once it grows past max_bytes (file -> file.1 -> file.2 ...)
+
+import csv
+import json
+import os
+
+
+ITERATION_FIELDS = ['iter', 'elapsed_s', 'iter_s', 'nodes_updated', 'hands_updated', 'regret_abs_sum', 'regret_pos_sum',
+                    'regret_max', 'exploitability', 'OOP_exploitability', 'IP_exploitability']
+
+
+class TelemetrySink(object):
+    '''Base class of a telemetry sink'''
+    def record(self, event):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CallbackSink(TelemetrySink):
+    '''Calls callback(event) for every event, eg to feed a dashboard or a stall detector'''
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, event):
+        self.callback(event)
+
+
+class MultiSink(TelemetrySink):
+    '''Sends every event to each of the sinks'''
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+
+    def record(self, event):
+        for sink in self.sinks:
+            sink.record(event)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class RotatingFileSink(TelemetrySink):
+    '''Writes one line per event, rotating the file when it grows past max_bytes and keeping backup_count old files'''
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.file = None
+        self._open()
+
+    def _open(self):
+        self.file = open(self.filename, 'a', newline='')
+
+    def format(self, event):
+        raise NotImplementedError
+
+    def rotate(self):
+        self.file.close()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f'{self.filename}.{i}'
+                if os.path.exists(src):
+                    os.replace(src, f'{self.filename}.{i + 1}')
+            os.replace(self.filename, f'{self.filename}.1')
+        else:
+            os.remove(self.filename)
+        self._open()
+
+    def record(self, event):
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            self.rotate()
+        self.file.write(self.format(event))
+        self.file.flush()
+
+    def close(self):
+        if self.file is not None and not self.file.closed:
+            self.file.close()
+
+
+class JSONLSink(RotatingFileSink):
+    '''One json object per line'''
+    def format(self, event):
+        return json.dumps(event) + '\n'
+
+
+class CSVSink(RotatingFileSink):
+    '''One csv row per event with a header row at the top of every file. Keys not in fields are dropped'''
+    def __init__(self, filename, fields=ITERATION_FIELDS, max_bytes=10 * 1024 * 1024, backup_count=5):
+        self.fields = fields
+        self.writer = None
+        super(CSVSink, self).__init__(filename, max_bytes, backup_count)
+
+    def _open(self):
+        self.file = open(self.filename, 'a', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fields, extrasaction='ignore')
+        if self.file.tell() == 0:
+            self.writer.writeheader()
+
+    def record(self, event):
+        if self.max_bytes and self.file.tell() >= self.max_bytes:
+            self.rotate()
+        self.writer.writerow(event)
+        self.file.flush()
+
+
+def open_sink(filename, max_bytes=10 * 1024 * 1024, backup_count=5):
+    '''Returns a CSVSink for .csv files and a JSONLSink otherwise'''
+    if filename.lower().endswith('.csv'):
+        return CSVSink(filename, max_bytes=max_bytes, backup_count=backup_count)
+    return JSONLSink(filename, max_bytes, backup_count)
+
+
+def regret_stats(nodes):
+    '''Returns (sum of |regret|, sum of positive regret, max regret) of the cumulative regrets over every hand in every decision node'''
+    abs_sum = pos_sum = 0.0
+    reg_max = None
+    for node in nodes:
+        if node.endNode:
+            continue
+        for hand in node.player_range.hands_list:
+            regs = hand.cumm_regrets
+            if not len(regs):
+                continue
+            abs_sum += float(abs(regs).sum())
+            pos_sum += float(regs[regs > 0].sum())
+            hand_max = float(regs.max())
+            if reg_max is None or hand_max > reg_max:
+                reg_max = hand_max
+    return abs_sum, pos_sum, reg_max
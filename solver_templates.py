@@ -0,0 +1,114 @@
+# reusable betting tree templates
+# the shape of a betting tree (which actions every node has, its pot and stacks) only depends on the pot, the stacks,
+# the 4 bet / raise size lists and AI_thresh, not on the board or the ranges. A TreeTemplate is that shape as a plain
+# node table, so a tree for any board / ranges with the same bet config can be laid out from it without applying the
+# action rules again (see pysolver_v10.Tree.build_from_template and pysolver_v10.tree_template).
+#
+# TemplateCache keeps templates by their key in memory (the most recently used max_entries) and, given a directory, as json
+# files there, written to a temp file and renamed into place, so worker processes sharing the directory build each shape once.
+# templates are plain lists and pickle cheaply, so they can also be handed to worker processes directly
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+from solver_cache import default_cache_dir
+
+
+TEMPLATE_VERSION = 1
+
+
+def template_key(pot, stack, OOP_bets, IP_bets, OOP_raises, IP_raises, AI_thresh):
+    '''Hash of everything the tree shape depends on'''
+    config = [TEMPLATE_VERSION, float(pot), float(stack), list(OOP_bets), list(IP_bets), list(OOP_raises), list(IP_raises), float(AI_thresh)]
+    return hashlib.sha1(json.dumps(config).encode()).hexdigest()
+
+
+class TreeTemplate(object):
+    '''Node table of a betting tree in BFS order. Each row is
+    [parent row (None for the root), action from the parent, to_act, pot, OOP stack, IP stack, available actions (None for an end node)]'''
+    def __init__(self, key, pot, stack, rows):
+        self.key = key
+        self.pot = pot
+        self.stack = stack
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def action_seqs(self):
+        '''The action sequence of every row'''
+        seqs = []
+        for parent, action, *_ in self.rows:
+            seqs.append([] if parent is None else seqs[parent] + [action])
+        return seqs
+
+    def to_dict(self):
+        return {'version': TEMPLATE_VERSION, 'key': self.key, 'pot': self.pot, 'stack': self.stack, 'rows': self.rows}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['key'], data['pot'], data['stack'], data['rows'])
+
+
+class TemplateCache(object):
+    '''TreeTemplates by key, in memory and in directory (if given)'''
+    def __init__(self, directory=None, max_entries=64):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.templates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.directory, f'template-{key}.json')
+
+    def get(self, key, build):
+        '''The template of key, from memory, then the directory, else build() (which returns the TreeTemplate) stored in both'''
+        template = self.templates.get(key)
+        if template is None and self.directory is not None:
+            try:
+                with open(self.path(key), 'r') as template_file:
+                    template = TreeTemplate.from_dict(json.load(template_file))
+            except (OSError, ValueError, KeyError):
+                template = None
+        if template is None:
+            self.misses += 1
+            template = build()
+            if self.directory is not None:
+                self._store(template)
+        else:
+            self.hits += 1
+        self.templates[key] = template
+        self.templates.move_to_end(key)
+        while len(self.templates) > self.max_entries:
+            self.templates.popitem(last=False)
+        return template
+
+    def _store(self, template):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as tmp_file:
+                json.dump(template.to_dict(), tmp_file)
+            os.replace(tmp_path, self.path(template.key))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def stats(self):
+        return {'directory': self.directory, 'in_memory': len(self.templates), 'hits': self.hits, 'misses': self.misses}
+
+
+def default_template_dir():
+    return os.path.join(default_cache_dir(), 'templates')
+
+def open_templates(templates):
+    '''TemplateCache from a directory name, or templates itself if it already is one (None stays None)'''
+    if templates is None or isinstance(templates, TemplateCache):
+        return templates
+    return TemplateCache(templates)
@@ -4,6 +4,7 @@ import json
 import os
 import re
 import pysolver_v10
+from solver_snapshot import SnapshotReader
 
 class PokerSolverGUI:
     def __init__(self, root):
@@ -11,6 +12,9 @@ class PokerSolverGUI:
         self.root.title("Poker Solver")
         self.json_data = None
         self.node_id_to_index = {}  # Mapping from node "id" to list index
+        self.snapshot_reader = None  # SnapshotReader of an attached live solve
+        self.snapshot_seq = None
+        self.snapshot_job = None
         self.ranks = ['A', 'K', 'Q', 'J', 'T', '9', '8', '7', '6', '5', '4', '3', '2']
         
         # Create notebook for tabs
@@ -195,9 +199,11 @@ class PokerSolverGUI:
         
         ttk.Button(file_frame, text="Load JSON File", command=self.load_json).grid(
             row=0, column=0, padx=5, pady=5)
+        ttk.Button(file_frame, text="Attach Snapshot", command=self.attach_snapshot).grid(
+            row=0, column=1, padx=5, pady=5)
         
         self.file_label = ttk.Label(file_frame, text="No file loaded")
-        self.file_label.grid(row=0, column=1, padx=5, pady=5)
+        self.file_label.grid(row=0, column=2, padx=5, pady=5)
         
         # Main display frame (will be populated after loading)
         self.display_frame = ttk.Frame(self.view_frame)
@@ -212,6 +218,7 @@ class PokerSolverGUI:
         )
         if filename:
             try:
+                self.detach_snapshot()
                 with open(filename, 'r') as file:
                     self.json_data = json.load(file)
                 # Build the node ID to index mapping
@@ -223,6 +230,7 @@ class PokerSolverGUI:
     
     def load_json_from_path(self, filename):
         try:
+            self.detach_snapshot()
             with open(filename, 'r') as file:
                 self.json_data = json.load(file)
             # Build the node ID to index mapping
@@ -232,6 +240,53 @@ class PokerSolverGUI:
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load JSON: {str(e)}")
     
+    def attach_snapshot(self):
+        """Follow the live strategies of a running solve (its --snapshot file), refreshed every 2 seconds until it finishes."""
+        filename = filedialog.askopenfilename(
+            filetypes=[("Solver snapshots", "*.snap"), ("All files", "*.*")]
+        )
+        if filename:
+            try:
+                self.detach_snapshot()
+                self.snapshot_reader = SnapshotReader(filename)
+                self.refresh_snapshot()
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to attach snapshot: {str(e)}")
+    
+    def detach_snapshot(self):
+        if self.snapshot_job is not None:
+            self.root.after_cancel(self.snapshot_job)
+            self.snapshot_job = None
+        if self.snapshot_reader is not None:
+            self.snapshot_reader.close()
+            self.snapshot_reader = None
+        self.snapshot_seq = None
+    
+    def refresh_snapshot(self):
+        self.snapshot_job = None
+        if self.snapshot_reader is None:
+            return
+        try:
+            snapshot = self.snapshot_reader.read()
+        except TimeoutError:
+            # the solve is publishing too often to get a consistent read right now, try again on the next refresh
+            self.snapshot_job = self.root.after(2000, self.refresh_snapshot)
+            return
+        if snapshot['seq'] != self.snapshot_seq:
+            first = self.snapshot_seq is None
+            self.snapshot_seq = snapshot['seq']
+            self.json_data = self.snapshot_reader.solution(snapshot)
+            self.node_id_to_index = {node["id"]: idx for idx, node in enumerate(self.json_data)}
+            if first:
+                self.setup_solution_display()
+            else:
+                self.update_solution_display()
+        expl = f"{snapshot['exploitability']:.3f}" if snapshot['exploitability'] is not None else "-"
+        status = "finished" if snapshot['finished'] else "solving"
+        self.file_label.config(text=f"{os.path.basename(self.snapshot_reader.path)}: iteration {snapshot['iteration']}, exploitability {expl}, {status}")
+        if not snapshot['finished']:
+            self.snapshot_job = self.root.after(2000, self.refresh_snapshot)
+    
     def find_root_node_id(self):
         """Find the node with an empty action sequence as the root node."""
         for node in self.json_data:
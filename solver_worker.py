@@ -0,0 +1,368 @@
+# distributed spot solving
+# a job queue of spots (the text of an inputs file + solver options) and workers that claim jobs, solve them with
+# pysolver_v10.main or pysolver_vec.main and write the solution, its profile report and telemetry to a shared results directory
+#
+# there is no coordinator: every worker claims its next job itself in one short transaction, heartbeats while it solves,
+# and before claiming puts back the jobs of workers whose heartbeat is older than the lease (crashed or lost machines).
+# a claim / heartbeat costs one small write, so the queue only sees a few writes a minute per worker and adding workers
+# scales throughput linearly until the solves themselves are that short
+#
+# the queue backend is pluggable (JobQueue), SQLiteQueue keeps it in a sqlite file in a directory, which works on one box
+# or on shared storage with working file locks
+#
+# a worker started with --max-memory / --max-solve-seconds dry runs every job first (solver_estimate.fit_limits): jobs over
+# the limits are downgraded (float32, suit isomorphism, then a time cap) or failed without being solved
+#
+# usage: python solver_worker.py submit queue_dir spot1.txt spot2.txt --engine vec --options '{"isomorphism": true}'
+#        python solver_worker.py work queue_dir --processes 4 --max-memory 8G
+#        python solver_worker.py status queue_dir
+
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+from solver_estimate import ResourceLimitError, fit_limits, parse_bytes
+from solver_profiler import report_filename
+from solver_telemetry import CallbackSink, JSONLSink, MultiSink
+
+
+# engine name -> solver module, both have main(inputs_file, outputs_file, profile=..., telemetry=..., ...)
+ENGINES = {
+    'v10': 'pysolver_v10',
+    'vec': 'pysolver_vec',
+}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    name TEXT,
+    engine TEXT NOT NULL,
+    inputs TEXT NOT NULL,
+    options TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    claimed REAL,
+    heartbeat REAL,
+    finished REAL,
+    iteration INTEGER,
+    exploitability REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, id);
+'''
+
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class JobQueue(object):
+    '''Interface of a queue backend. Jobs are dicts with at least id, name, engine, inputs (text of an inputs file),
+    options (dict of extra main arguments), status, worker, attempts'''
+    def submit(self, inputs, engine='v10', options=None, name=None, priority=0, max_attempts=3):
+        '''Adds a job, returns its id'''
+        raise NotImplementedError
+
+    def claim(self, worker):
+        '''Marks the next queued job (highest priority, then oldest) as running by worker and returns it, None if there is none'''
+        raise NotImplementedError
+
+    def heartbeat(self, job_id, worker, iteration=None, exploitability=None):
+        '''Records that worker is still solving job_id, with its progress. False if the job is no longer worker's'''
+        raise NotImplementedError
+
+    def complete(self, job_id, worker, result, iteration=None, exploitability=None):
+        '''Marks job_id done with result (the solution filename). False if the job is no longer worker's'''
+        raise NotImplementedError
+
+    def fail(self, job_id, worker, error):
+        raise NotImplementedError
+
+    def reclaim_stale(self, lease):
+        '''Puts running jobs with no heartbeat for lease seconds back in the queue (failed once out of attempts).
+        Returns the number of jobs reclaimed'''
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def jobs(self, status=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteQueue(JobQueue):
+    '''Job queue in <directory>/queue.sqlite. Every state change is a single statement or an immediate transaction,
+    so any number of worker processes can share it'''
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        # autocommit, transactions are explicit. The heartbeat thread shares the connection under the lock
+        self.db = sqlite3.connect(os.path.join(directory, 'queue.sqlite'), timeout=60, isolation_level=None, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def _row(self, row):
+        if row is None:
+            return None
+        job = dict(row)
+        job['options'] = json.loads(job['options'])
+        return job
+
+    def submit(self, inputs, engine='v10', options=None, name=None, priority=0, max_attempts=3):
+        if engine not in ENGINES:
+            raise ValueError(f'unknown engine {engine}, engines are {",".join(ENGINES)}')
+        with self.lock:
+            cursor = self.db.execute(
+                'INSERT INTO jobs (created, name, engine, inputs, options, priority, status, max_attempts) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (time.time(), name, engine, inputs, json.dumps(options or {}), priority, 'queued', max_attempts))
+        return cursor.lastrowid
+
+    def claim(self, worker):
+        now = time.time()
+        with self.lock:
+            self.db.execute('BEGIN IMMEDIATE') # takes the write lock, so two workers never claim the same job
+            try:
+                row = self.db.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, id LIMIT 1").fetchone()
+                if row is not None:
+                    self.db.execute("UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, claimed = ?, heartbeat = ?, "
+                                    "iteration = NULL, exploitability = NULL, error = NULL WHERE id = ?", (worker, now, now, row['id']))
+                self.db.execute('COMMIT')
+            except BaseException:
+                self.db.execute('ROLLBACK')
+                raise
+        return self.get(row['id']) if row is not None else None
+
+    def heartbeat(self, job_id, worker, iteration=None, exploitability=None):
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET heartbeat = ?, iteration = ?, exploitability = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                     (time.time(), iteration, exploitability, job_id, worker))
+        return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, result, iteration=None, exploitability=None):
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET status = 'done', finished = ?, result = ?, iteration = ?, exploitability = ? "
+                                     "WHERE id = ? AND worker = ? AND status = 'running'",
+                                     (time.time(), result, iteration, exploitability, job_id, worker))
+        return cursor.rowcount == 1
+
+    def fail(self, job_id, worker, error):
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                                     (time.time(), error, job_id, worker))
+        return cursor.rowcount == 1
+
+    def reclaim_stale(self, lease):
+        with self.lock:
+            cursor = self.db.execute("UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                                     "error = 'worker ' || worker || ' stopped heartbeating', worker = NULL "
+                                     "WHERE status = 'running' AND heartbeat < ?", (time.time() - lease,))
+        return cursor.rowcount
+
+    def get(self, job_id):
+        with self.lock:
+            return self._row(self.db.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone())
+
+    def jobs(self, status=None):
+        with self.lock:
+            if status is None:
+                rows = self.db.execute('SELECT * FROM jobs ORDER BY id').fetchall()
+            else:
+                rows = self.db.execute('SELECT * FROM jobs WHERE status = ? ORDER BY id', (status,)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def counts(self):
+        '''Returns {status: number of jobs}'''
+        with self.lock:
+            counts = dict(self.db.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+        return {status: counts.get(status, 0) for status in STATUSES}
+
+
+def open_queue(queue):
+    '''SQLiteQueue from a directory name, or queue itself if it already is a JobQueue'''
+    if isinstance(queue, JobQueue):
+        return queue
+    return SQLiteQueue(queue)
+
+
+class Worker(object):
+    '''Claims and solves jobs until the queue is empty (or forever with wait=True).
+    Results go in results_dir (default <queue directory>/results): job-<id>-<attempt>.json with its .profile.json report
+    and .telemetry.jsonl. Heartbeats go out every heartbeat_every seconds, jobs without one for lease seconds are reclaimed.
+    With max_memory (bytes) / max_seconds every job is estimated first (.estimate.json) and downgraded or failed to fit them'''
+    def __init__(self, queue, results_dir=None, worker_id=None, heartbeat_every=10, lease=60, max_memory=None, max_seconds=None):
+        self.queue = open_queue(queue)
+        if results_dir is None:
+            if not hasattr(self.queue, 'directory'):
+                raise ValueError('results_dir is needed for a queue without a directory')
+            results_dir = os.path.join(self.queue.directory, 'results')
+        self.results_dir = results_dir
+        os.makedirs(results_dir, exist_ok=True)
+        self.worker_id = worker_id or f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.heartbeat_every = heartbeat_every
+        self.lease = lease
+        self.max_memory = max_memory
+        self.max_seconds = max_seconds
+        self.solved = 0
+
+    def run(self, max_jobs=None, wait=False, poll_every=5):
+        '''Returns the number of jobs solved'''
+        while max_jobs is None or self.solved < max_jobs:
+            self.queue.reclaim_stale(self.lease)
+            job = self.queue.claim(self.worker_id)
+            if job is None:
+                if not wait:
+                    break
+                time.sleep(poll_every)
+                continue
+            self.solve(job)
+        return self.solved
+
+    def solve(self, job):
+        '''Solves one claimed job and reports the result to the queue'''
+        base = os.path.join(self.results_dir, f'job-{job["id"]}-{job["attempts"]}')
+        inputs_file = base + '.txt'
+        outputs_file = base + '.json'
+        with open(inputs_file, 'w') as file:
+            file.write(job['inputs'])
+        options = job['options']
+        if self.max_memory is not None or self.max_seconds is not None:
+            try:
+                options, report = fit_limits(inputs_file, job['engine'], options, self.max_memory, self.max_seconds)
+            except ResourceLimitError as e:
+                self.queue.fail(job['id'], self.worker_id, f'rejected: {e}')
+                return False
+            except Exception:
+                self.queue.fail(job['id'], self.worker_id, traceback.format_exc())
+                return False
+            with open(base + '.estimate.json', 'w') as file:
+                json.dump({**report, 'options': options}, file, indent=4)
+        progress = {'iteration': None, 'exploitability': None}
+
+        def record(event):
+            progress['iteration'] = event['iter']
+            if event.get('exploitability') is not None:
+                progress['exploitability'] = event['exploitability']
+
+        stop = threading.Event()
+        def beat():
+            while not stop.wait(self.heartbeat_every):
+                if not self.queue.heartbeat(job['id'], self.worker_id, progress['iteration'], progress['exploitability']):
+                    print(f'{self.worker_id}: job {job["id"]} was reclaimed, its result will be dropped')
+                    return
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        sink = MultiSink([JSONLSink(base + '.telemetry.jsonl'), CallbackSink(record)])
+        try:
+            solver = importlib.import_module(ENGINES[job['engine']])
+            solver.main(inputs_file, outputs_file, profile=True, telemetry=sink, **options)
+        except Exception:
+            self.queue.fail(job['id'], self.worker_id, traceback.format_exc())
+            return False
+        finally:
+            stop.set()
+            heartbeat.join()
+            sink.close()
+
+        with open(report_filename(outputs_file)) as file:
+            report = json.load(file)
+        iteration = report['counters'].get('iterations', progress['iteration'])
+        exploitability = report['info'].get('final_exploitability', progress['exploitability'])
+        if self.queue.complete(job['id'], self.worker_id, outputs_file, iteration, exploitability):
+            self.solved += 1
+            return True
+        return False
+
+
+def _work(queue_dir, results_dir, max_jobs, wait, heartbeat_every, lease, max_memory, max_seconds):
+    Worker(queue_dir, results_dir, heartbeat_every=heartbeat_every, lease=lease, max_memory=max_memory, max_seconds=max_seconds).run(max_jobs, wait)
+
+
+def run_workers(queue_dir, processes, results_dir=None, max_jobs=None, wait=False, heartbeat_every=10, lease=60, max_memory=None, max_seconds=None):
+    '''Runs processes independent workers on this machine until they are done'''
+    ctx = multiprocessing.get_context('spawn')
+    procs = [ctx.Process(target=_work, args=(queue_dir, results_dir, max_jobs, wait, heartbeat_every, lease, max_memory, max_seconds))
+             for _ in range(processes)]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+
+
+def print_status(queue):
+    counts = queue.counts()
+    print(', '.join(f'{status} {count}' for status, count in counts.items()))
+    for job in queue.jobs():
+        expl = f'{job["exploitability"]:.3f}' if job['exploitability'] is not None else '-'
+        iteration = job['iteration'] if job['iteration'] is not None else '-'
+        error = (job['error'] or '').strip().splitlines()[-1:] if job['status'] == 'failed' else []
+        print(f'{job["id"]:>6} {job["name"] or "":<24}{job["engine"]:<6}{job["status"]:<9}{job["worker"] or "":<32}'
+              f'iter {iteration:<8}expl {expl:<10}{" ".join(error)}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Queue spots and solve them with any number of workers')
+    commands = parser.add_subparsers(dest='command', required=True)
+    submit = commands.add_parser('submit', help='add inputs files to the queue')
+    submit.add_argument('queue', help='queue directory')
+    submit.add_argument('inputs', nargs='+', help='solver inputs files')
+    submit.add_argument('--engine', choices=ENGINES, default='v10')
+    submit.add_argument('--options', default='{}', help='json dict of extra main arguments, eg {"isomorphism": true, "dtype": "float32"}')
+    submit.add_argument('--priority', type=int, default=0, help='higher priority jobs are claimed first')
+    submit.add_argument('--max-attempts', type=int, default=3, help='times a job is retried after its worker dies')
+    work = commands.add_parser('work', help='claim and solve jobs')
+    work.add_argument('queue', help='queue directory')
+    work.add_argument('--results', help='directory for the solutions, reports and telemetry (default <queue>/results)')
+    work.add_argument('--processes', type=int, default=1, help='workers to run on this machine')
+    work.add_argument('--max-jobs', type=int, help='stop each worker after this many jobs')
+    work.add_argument('--wait', action='store_true', help='keep polling for new jobs instead of stopping when the queue is empty')
+    work.add_argument('--heartbeat', type=float, default=10, help='seconds between heartbeats')
+    work.add_argument('--lease', type=float, default=60, help='seconds without a heartbeat before a job is reclaimed')
+    work.add_argument('--max-memory', type=parse_bytes, help='estimated memory limit per job, eg 8G, bigger jobs are downgraded or rejected')
+    work.add_argument('--max-solve-seconds', type=float, help='estimated time limit per job, slower jobs are downgraded or capped')
+    status = commands.add_parser('status', help='show the queue')
+    status.add_argument('queue', help='queue directory')
+    args = parser.parse_args()
+
+    if args.command == 'submit':
+        options = json.loads(args.options)
+        with open_queue(args.queue) as queue:
+            for filename in args.inputs:
+                with open(filename) as file:
+                    job_id = queue.submit(file.read(), args.engine, options, os.path.basename(filename), args.priority, args.max_attempts)
+                print(f'job {job_id}: {filename}')
+    elif args.command == 'work':
+        if args.processes > 1:
+            run_workers(args.queue, args.processes, args.results, args.max_jobs, args.wait, args.heartbeat, args.lease,
+                        args.max_memory, args.max_solve_seconds)
+        else:
+            Worker(args.queue, args.results, heartbeat_every=args.heartbeat, lease=args.lease, max_memory=args.max_memory,
+                   max_seconds=args.max_solve_seconds).run(args.max_jobs, args.wait)
+    else:
+        with open_queue(args.queue) as queue:
+            print_status(queue)
@@ -0,0 +1,27 @@
+import os, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SMALL_SPOT = ['10', '10', 'AsAc, QsQc', 'KsKc', '2c2h2s2d3h', '100', '', '', '', '70', '200', '0.7']
+RIVER_SPOT = ['10', '50', 'AsAc, AdAh, QsQc, 7s7c, 6s6c, 4d4h', 'KsKc, KdKh, JsJc, JdJh, 8s8c, 4s4c',
+              'Td9s5d3c2h', '33,75', '50,100', '100', '100', '70', '80', '0.5']
+
+
+def write_spot(path, lines):
+    with open(path, 'w') as spot_file:
+        spot_file.write('\n'.join(lines) + '\n')
+    return str(path)
+
+
+@pytest.fixture
+def small_spot(tmp_path):
+    '''2 vs 1 combo spot with one bet size, solves in well under a second'''
+    return write_spot(tmp_path / 'small.txt', SMALL_SPOT)
+
+
+@pytest.fixture
+def river_spot(tmp_path):
+    '''12 combo river spot with two bet sizes and a raise for each player'''
+    return write_spot(tmp_path / 'river.txt', RIVER_SPOT)
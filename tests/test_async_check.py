@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+import pysolver_v10
+import pysolver_vec
+from solver_async_check import AsyncChecker
+from solver_profiler import report_filename
+
+
+def read(path):
+    with open(path, 'rb') as solution_file:
+        return solution_file.read()
+
+
+def final_exploitability(path):
+    with open(report_filename(path), 'r') as json_file:
+        return json.load(json_file)['info']['final_exploitability']
+
+
+class RecordingChecker(AsyncChecker):
+    '''AsyncChecker that also checks each submitted strategy inline, in the solving process'''
+    instances = []
+
+    def __init__(self, tree, *args):
+        super(RecordingChecker, self).__init__(tree, *args)
+        self.tree = tree
+        self.inline = {}
+        self.reported = {}
+        RecordingChecker.instances.append(self)
+
+    def submit(self, iteration, strategies):
+        self.inline[iteration] = self.tree.calc_exploitabilities()
+        super(RecordingChecker, self).submit(iteration, strategies)
+
+    def poll(self, wait=False):
+        result = super(RecordingChecker, self).poll(wait)
+        if result is not None:
+            self.reported[result[0]] = result[1]
+        return result
+
+
+@pytest.mark.parametrize('solver', [pysolver_v10, pysolver_vec])
+def test_background_checks_equal_inline_checks(monkeypatch, tmp_path, river_spot, solver):
+    RecordingChecker.instances = []
+    monkeypatch.setattr(solver, 'AsyncChecker', RecordingChecker)
+    solver.main(river_spot, str(tmp_path / 'out.json'), async_checks=True)
+    [checker] = RecordingChecker.instances
+    assert checker.reported
+    for iteration, expls in checker.reported.items():
+        assert list(expls) == list(checker.inline[iteration]), iteration
+
+
+@pytest.mark.parametrize('solver', [pysolver_v10, pysolver_vec])
+def test_solutions_are_identical(tmp_path, river_spot, solver):
+    # river_spot doesn't reach its target, so both solves run every iteration
+    inline, background = str(tmp_path / 'inline.json'), str(tmp_path / 'background.json')
+    solver.main(river_spot, inline, profile=True)
+    solver.main(river_spot, background, profile=True, async_checks=True)
+    assert read(inline) == read(background)
+    # the first background check can still be in flight when a short solve ends, the saved strategy is checked anyway
+    assert final_exploitability(background) == final_exploitability(inline)
@@ -0,0 +1,36 @@
+import json
+
+import pytest
+
+import pysolver_batch
+import pysolver_vec
+from conftest import RIVER_SPOT, write_spot
+
+
+BOARDS = ['Td9s5d3c2h', '9c7d5h3s2c']
+
+
+def load(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def test_each_board_matches_a_separate_solve(tmp_path, river_spot):
+    pysolver_batch.main(river_spot, str(tmp_path / 'batch'), boards=BOARDS)
+    summary = load(tmp_path / 'batch' / 'batch_summary.json')
+    assert sorted(row['board'] for row in summary) == sorted(BOARDS)
+    for board in BOARDS:
+        spot = write_spot(tmp_path / f'{board}.txt', RIVER_SPOT[:4] + [board] + RIVER_SPOT[5:])
+        pysolver_vec.main(spot, str(tmp_path / f'{board}.json'))
+        batched, separate = load(tmp_path / 'batch' / f'{board}.json'), load(tmp_path / f'{board}.json')
+        assert [node['atn-sq'] for node in batched] == [node['atn-sq'] for node in separate]
+        for batched_node, node in zip(batched, separate):
+            for combo, strat in node['rg-strat'].items():
+                assert batched_node['rg-strat'][combo] == pytest.approx(strat, abs=1e-9)
+
+
+def test_boards_must_be_distinct_rivers(tmp_path, river_spot):
+    with pytest.raises(ValueError):
+        pysolver_batch.main(river_spot, str(tmp_path), boards=[BOARDS[0], BOARDS[0]])
+    with pytest.raises(ValueError):
+        pysolver_batch.main(river_spot, str(tmp_path), boards=['Td9s5d3c'])
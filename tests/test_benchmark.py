@@ -0,0 +1,24 @@
+import pytest
+
+import solver_benchmark
+
+
+@pytest.mark.parametrize('engine', ['v9', 'v10', 'vec'])
+def test_run_spot_measures_time_to_target(tmp_path, engine):
+    spot = solver_benchmark.Spot(10, 1, False, 1, max_iters=60, target_expl=2.0)
+    row = solver_benchmark.run_spot(spot, engine, str(tmp_path))
+    assert row['status'] == 'ok', row['error']
+    assert row['final_exploitability'] is not None
+    assert 0 < row['iterations'] <= spot.max_iters
+    if row['final_exploitability'] <= spot.target_expl:
+        assert 0 < row['time_to_target_s'] <= row['solve_s']
+    assert row['iters_per_s'] > 0
+
+
+def test_history_and_regressions(tmp_path):
+    rows = [{'spot': 's', 'engine': 'v10', 'machine': 'm', 'iters_per_s': 50.0}]
+    solver_benchmark.append_history([{'spot': 's', 'engine': 'v10', 'machine': 'm', 'iters_per_s': 100.0}], str(tmp_path))
+    history = solver_benchmark.load_history(str(tmp_path))
+    assert len(history) == 1
+    assert solver_benchmark.find_regressions(rows, history) == [(rows[0], 100.0)]
+    assert solver_benchmark.find_regressions([dict(rows[0], iters_per_s=90.0)], history) == []
@@ -0,0 +1,34 @@
+import itertools
+
+import pytest
+
+import pysolver_v10
+from solver_buckets import bucket_range
+
+
+BOARD = 'Kh9s5d3c2h'
+
+
+def wide_range(offset, size=40):
+    board = {BOARD[i:i+2] for i in range(0, 10, 2)}
+    live = [rank + suit for rank in '23456789TJQKA' for suit in 'cdhs' if rank + suit not in board]
+    combos = list(itertools.combinations(live, 2))[offset::7][:size]
+    return pysolver_v10.Range([pysolver_v10.Hand(c1 + c2, 0.5 + (i % 3) / 4) for i, (c1, c2) in enumerate(combos)])
+
+
+@pytest.mark.parametrize('blockers', [True, False])
+@pytest.mark.parametrize('num_buckets', [1, 2, 3, 7, 15, 16])
+def test_at_most_num_buckets_covering_the_range(num_buckets, blockers):
+    theRange, oppRange = wide_range(0), wide_range(3)
+    buckets, members = bucket_range(theRange, oppRange, BOARD, num_buckets, blockers)
+    assert 1 <= len(buckets.hands_list) <= num_buckets
+    assert sorted(combo for group in members.values() for combo, _ in group) == sorted(hand.hand for hand in theRange.hands_list)
+    for hand in buckets.hands_list:
+        assert hand.weighting == pytest.approx(sum(weight for _, weight in members[hand.hand]))
+
+
+def test_small_range_is_not_bucketed():
+    theRange = wide_range(0, size=5)
+    buckets, members = bucket_range(theRange, wide_range(3), BOARD, 10)
+    assert [hand.hand for hand in buckets.hands_list] == [hand.hand for hand in theRange.hands_list]
+    assert all(len(group) == 1 for group in members.values())
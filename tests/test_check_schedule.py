@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import pysolver_v10
+import pysolver_vec
+from pysolver_v10 import AdaptiveCheckSchedule, FixedCheckSchedule
+from solver_profiler import report_filename
+
+
+def test_fixed_schedule():
+    schedule = FixedCheckSchedule(every=5, start=5)
+    assert [i for i in range(21) if schedule.should_check(i)] == [5, 10, 15, 20]
+
+
+def test_adaptive_gap_keeps_checks_under_the_budget():
+    schedule = AdaptiveCheckSchedule(target_expl=0.5, overhead_budget=0.1, first_check=5)
+    assert not schedule.should_check(4) and schedule.should_check(5)
+    schedule.record_iteration(0.01)
+    schedule.record_check(5, 0.5, 50.0)
+    # a check costs 50 iterations, so at most 10% overhead means at least 450 iterations between checks
+    assert schedule.next_check - 5 == 450
+
+
+def test_adaptive_checks_the_last_iteration():
+    schedule = AdaptiveCheckSchedule(target_expl=0.5, first_check=5, last_iter=99)
+    schedule.record_iteration(0.01)
+    schedule.record_check(5, 0.5, 50.0)
+    assert schedule.next_check == 99
+
+
+def test_adaptive_gap_shrinks_near_the_target():
+    schedule = AdaptiveCheckSchedule(target_expl=1.0, first_check=5, max_gap=100)
+    schedule.record_iteration(1.0)
+    schedule.record_check(9, 0.01, 8.0)
+    schedule.record_check(19, 0.01, 4.0) # expl ~ 80 / iter, target at iteration 80
+    assert schedule.predicted_iters_left() == pytest.approx(60)
+    assert schedule.next_gap() == 30
+
+
+@pytest.mark.parametrize('solver', [pysolver_v10, pysolver_vec])
+def test_time_budget_ends_with_a_check_of_the_saved_strategy(tmp_path, river_spot, solver):
+    out = str(tmp_path / 'out.json')
+    solver.main(river_spot, out, profile=True, max_seconds=0)
+    with open(report_filename(out)) as report_file:
+        report = json.load(report_file)
+    # the budget is used up after the first iteration, which the fixed schedule doesn't check
+    assert report['counters']['exploitability_checks'] == 1
+    assert report['info']['final_exploitability'] != 100
@@ -0,0 +1,64 @@
+import hashlib
+import json
+
+import numpy as np
+import pytest
+
+import pysolver_v10
+from solver_profiler import report_filename
+
+
+def test_set_dtype_rejects_invalid_dtype_and_keeps_previous():
+    pysolver_v10.set_dtype('float32')
+    try:
+        with pytest.raises(ValueError):
+            pysolver_v10.set_dtype('int32')
+        assert pysolver_v10.float_dtype == np.float32
+    finally:
+        pysolver_v10.set_dtype('float64')
+
+
+# sha256 of the river_spot solution written before the float32 mode existed
+FLOAT64_SOLUTION_SHA256 = 'dd0c5c71144699f091f02a9ca6d2a3166f9c98ad12176c5215f3d12a6f916e5c'
+
+
+def solve(spot, out, **kwargs):
+    pysolver_v10.main(spot, out, profile=True, **kwargs)
+    with open(out, 'r') as json_file:
+        solution = json.load(json_file)
+    with open(report_filename(out), 'r') as json_file:
+        return solution, json.load(json_file)['info']
+
+
+def test_float64_output_is_unchanged(tmp_path, river_spot):
+    out = str(tmp_path / 'out.json')
+    pysolver_v10.main(river_spot, out, dtype='float64')
+    with open(out, 'rb') as json_file:
+        assert hashlib.sha256(json_file.read()).hexdigest() == FLOAT64_SOLUTION_SHA256
+
+
+def test_float32_solve_is_close_to_float64(tmp_path, river_spot):
+    try:
+        solution64, info64 = solve(river_spot, str(tmp_path / 'out64.json'))
+        solution32, info32 = solve(river_spot, str(tmp_path / 'out32.json'), dtype='float32')
+    finally:
+        pysolver_v10.set_dtype('float64')
+    assert info32['dtype'] == 'float32' and info64['dtype'] == 'float64'
+    assert info32['final_exploitability'] == pytest.approx(info64['final_exploitability'], rel=1e-3)
+    assert [node['atn-sq'] for node in solution32] == [node['atn-sq'] for node in solution64]
+    for node32, node64 in zip(solution32, solution64):
+        for combo, strat in node64['rg-strat'].items():
+            assert node32['rg-strat'][combo] == pytest.approx(strat, abs=1e-4)
+            # written in the shortest form that reads back as the same float32
+            assert all(float(str(np.float32(x))) == x for x in node32['rg-strat'][combo])
+
+
+def test_ranges_use_the_dtype():
+    pysolver_v10.set_dtype('float32')
+    try:
+        theRange = pysolver_v10.Range([pysolver_v10.Hand('AsAc', 1)])
+        theRange.initialize_strats(3)
+        hand = theRange.hands_list[0]
+        assert hand.avg_strat.dtype == np.float32 and hand.cumm_regrets.dtype == np.float32
+    finally:
+        pysolver_v10.set_dtype('float64')
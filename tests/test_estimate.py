@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+import pysolver_v10
+import pysolver_vec
+from conftest import RIVER_SPOT, write_spot
+from solver_estimate import ResourceLimitError, estimate, fit_limits, format_bytes, parse_bytes
+from solver_profiler import report_filename
+
+
+def solved_info(solver, spot, out):
+    solver.main(spot, out, profile=True)
+    with open(report_filename(out), 'r') as json_file:
+        return json.load(json_file)['info']
+
+
+@pytest.fixture
+def turn_spot(tmp_path):
+    lines = list(RIVER_SPOT)
+    lines[4], lines[6], lines[7], lines[8], lines[10] = 'Td9s5d3c', '', '', '', '10'
+    return write_spot(tmp_path / 'turn.txt', lines)
+
+
+@pytest.mark.parametrize('engine, solver', [('v10', pysolver_v10), ('vec', pysolver_vec)])
+def test_node_counts_match_the_solved_tree(tmp_path, river_spot, engine, solver):
+    report = estimate(river_spot, engine)
+    info = solved_info(solver, river_spot, str(tmp_path / 'out.json'))
+    assert (report['num_nodes'], report['num_decision_nodes']) == (info['num_nodes'], info['num_decision_nodes'])
+    assert (report['OOP_combos'], report['IP_combos']) == (6, 6)
+    assert sum(report['nodes'].values()) == report['num_nodes']
+    assert report['memory_bytes'] > 0 and report['solve_s'] > 0
+
+
+def test_turn_spot(tmp_path, turn_spot):
+    report = estimate(turn_spot, 'vec')
+    info = solved_info(pysolver_vec, turn_spot, str(tmp_path / 'out.json'))
+    assert report['street'] == 'turn' and report['river_cards'] == 48
+    assert report['num_decision_nodes'] == info['num_decision_nodes']
+    with pytest.raises(ValueError):
+        estimate(turn_spot, 'v10')
+
+
+def test_float32_and_state_dir_need_less_memory(river_spot):
+    full = estimate(river_spot, 'vec')
+    assert estimate(river_spot, 'vec', dtype='float32')['state_bytes'] == full['state_bytes'] // 2
+    on_disk = estimate(river_spot, 'vec', state_dir='state')
+    assert on_disk['disk_bytes'] == full['state_bytes'] and on_disk['memory_bytes'] < full['memory_bytes']
+    with pytest.raises(ValueError):
+        estimate(river_spot, 'v9')
+
+
+def test_bytes():
+    assert parse_bytes('512M') == 512 * 1024 ** 2
+    assert parse_bytes('8GB') == 8 * 1024 ** 3
+    assert parse_bytes(1000) == 1000
+    assert format_bytes(1536) == '1.5KB' and format_bytes(100) == '100B'
+
+
+def test_fit_limits(river_spot):
+    report = estimate(river_spot, 'vec')
+    options, fitted = fit_limits(river_spot, 'vec', max_memory=report['memory_bytes'] - 1)
+    assert options['dtype'] == 'float32' and fitted['memory_bytes'] < report['memory_bytes']
+    options, _ = fit_limits(river_spot, 'vec', max_seconds=report['solve_s'] / 1000)
+    assert options['max_seconds'] == report['solve_s'] / 1000
+    assert fit_limits(river_spot, 'vec', max_memory=report['memory_bytes']) == ({}, report)
+    with pytest.raises(ResourceLimitError):
+        fit_limits(river_spot, 'vec', max_memory=1)
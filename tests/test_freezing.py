@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import pysolver_v10
+
+
+class CheckedFreezing(pysolver_v10.NodeFreezing):
+    '''NodeFreezing that freezes early and checks, at every window, that the nodes frozen at the last one still play and
+    average exactly the average strategy they were frozen with'''
+    def __init__(self):
+        super().__init__(tol=0.2, regret_tol=0.05, start=10)
+        self.frozen_avgs = {}
+        self.checked = 0
+
+    def active_nodes(self, nodes):
+        active = super().active_nodes(nodes)
+        skipped = [node for node in nodes if node not in active]
+        assert all(not node.endNode for node in skipped)
+        assert {tuple(node.action_seq) for node in skipped} == self.frozen & {tuple(node.action_seq) for node in nodes}
+        return active
+
+    def update(self, i, nodes, iterations=None):
+        by_seq = {tuple(node.action_seq): node for node in nodes}
+        for seq in self.frozen:
+            node = by_seq[seq]
+            assert not node.endNode
+            for hand in node.player_range.hands_list:
+                np.testing.assert_allclose(hand.avg_strat, self.frozen_avgs[seq][hand.hand], rtol=0, atol=1e-12)
+                np.testing.assert_allclose(hand.actions_taken, hand.avg_strat, rtol=0, atol=1e-12)
+                self.checked += 1
+        frozen = super().update(i, nodes, iterations)
+        self.frozen_avgs = {seq: {hand.hand: hand.avg_strat.copy() for hand in by_seq[seq].player_range.hands_list} for seq in self.frozen}
+        return frozen
+
+
+@pytest.mark.parametrize('prune_sizes', [False, True])
+def test_frozen_nodes_keep_their_average_strategy(monkeypatch, tmp_path, river_spot, prune_sizes):
+    freezings = []
+    def make_freezing():
+        freezings.append(CheckedFreezing())
+        return freezings[-1]
+    monkeypatch.setattr(pysolver_v10, 'NodeFreezing', make_freezing)
+    pysolver_v10.main(river_spot, str(tmp_path / 'out.json'), freeze=True, prune_sizes=prune_sizes)
+    assert freezings[0].freezes > 0
+    assert freezings[0].checked > 0
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import pysolver_v10
+import pysolver_vec
+from conftest import RIVER_SPOT, write_spot
+from solver_isomorphism import symmetry_group
+
+
+def strats(path):
+    with open(path, 'r') as json_file:
+        return {tuple(node['atn-sq']): node['rg-strat'] for node in json.load(json_file)}
+
+
+def assert_close(full, iso, tol):
+    assert full.keys() == iso.keys()
+    for seq, combos in full.items():
+        assert combos.keys() == iso[seq].keys(), seq
+        for combo, strat in combos.items():
+            assert iso[seq][combo] == pytest.approx(strat, abs=tol), (seq, combo)
+
+
+@pytest.fixture
+def symmetric_spot(tmp_path):
+    '''no clubs or spades on the board and both ranges symmetric in clubs / spades'''
+    lines = list(RIVER_SPOT)
+    lines[2], lines[3], lines[4] = 'AsAc, AdAh, AsAd, AcAd, QsQc, 7s7c', 'KsKc, KdKh, KsKd, KcKd, JsJc, 8s8c', 'Td9d5d3h2h'
+    return write_spot(tmp_path / 'symmetric.txt', lines)
+
+
+def test_symmetry_group():
+    assert len(symmetry_group('Td9d5d3h2h')) == 2
+    assert len(symmetry_group('Td9d5h3h')) == 2
+    assert len(symmetry_group('Td9s5d3c2h')) == 1
+
+
+@pytest.mark.parametrize('solver', [pysolver_v10, pysolver_vec])
+def test_isomorphic_solve_matches_full_solve(tmp_path, symmetric_spot, solver):
+    full, iso = str(tmp_path / 'full.json'), str(tmp_path / 'iso.json')
+    solver.main(symmetric_spot, full)
+    solver.main(symmetric_spot, iso, isomorphism=True)
+    full_strats, iso_strats = strats(full), strats(iso)
+    assert_close(full_strats, iso_strats, 1e-9)
+    assert iso_strats[()]['AsAd'] == iso_strats[()]['AcAd']
+
+
+def test_isomorphic_turn_solve_matches_full_solve(tmp_path, symmetric_spot):
+    lines = open(symmetric_spot).read().splitlines()
+    lines[4], lines[6], lines[7], lines[8], lines[10] = 'Td9d5d3h', '', '', '', '30'
+    turn = write_spot(tmp_path / 'turn.txt', lines)
+    full, iso = str(tmp_path / 'full.json'), str(tmp_path / 'iso.json')
+    pysolver_vec.main(turn, full)
+    pysolver_vec.main(turn, iso, isomorphism=True)
+    assert_close(strats(full), strats(iso), 1e-9)
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+
+import pysolver_v10
+
+
+def solution_nodes(path):
+    with open(path, 'r') as json_file:
+        return {tuple(node['atn-sq']): node for node in json.load(json_file)}
+
+
+@pytest.fixture
+def solved(tmp_path, river_spot):
+    out = str(tmp_path / 'solved.json')
+    pysolver_v10.main(river_spot, out)
+    return out
+
+
+def write_locks(tmp_path, locks):
+    path = tmp_path / 'locks.json'
+    path.write_text(json.dumps(locks))
+    return str(path)
+
+
+def test_locked_strategy_is_kept_in_warm_started_resolve(tmp_path, river_spot, solved):
+    root = solution_nodes(solved)[()]
+    locks = write_locks(tmp_path, {'': {'strategy': [1] + [0] * (len(root['avl-acs']) - 1)}})
+    out = str(tmp_path / 'locked.json')
+    pysolver_v10.main(river_spot, out, locks=locks, warm_start=solved)
+    for combo, strat in solution_nodes(out)[()]['rg-strat'].items():
+        assert strat == pytest.approx([1] + [0] * (len(strat) - 1)), combo
+
+
+def test_never_removes_the_action_and_renormalises(tmp_path, river_spot, solved):
+    root = solution_nodes(solved)[()]
+    banned = root['avl-acs'][-1]
+    out = str(tmp_path / 'locked.json')
+    pysolver_v10.main(river_spot, out, locks=write_locks(tmp_path, {'': {'never': [banned]}}), warm_start=solved)
+    for combo, strat in solution_nodes(out)[()]['rg-strat'].items():
+        assert strat[-1] == 0, combo
+        assert sum(strat) == pytest.approx(1), combo
+
+
+def test_lock_rejects_unknown_node_and_action(tmp_path, river_spot):
+    with pytest.raises(ValueError):
+        pysolver_v10.main(river_spot, str(tmp_path / 'out.json'), locks=write_locks(tmp_path, {'X,B999': {'never': ['RA']}}))
+    with pytest.raises(ValueError):
+        pysolver_v10.main(river_spot, str(tmp_path / 'out.json'), locks=write_locks(tmp_path, {'': {'never': ['B999']}}))
@@ -0,0 +1,37 @@
+import json
+
+import pysolver_v10
+from conftest import RIVER_SPOT, write_spot
+from solver_profiler import report_filename
+from solver_telemetry import CallbackSink
+
+
+def read(path):
+    with open(path, 'r') as json_file:
+        return json.load(json_file)
+
+
+def test_same_seed_gives_the_same_solution(tmp_path, river_spot):
+    outs = [str(tmp_path / f'{name}.json') for name in ('a', 'b', 'c')]
+    for out, seed in zip(outs, (1, 1, 2)):
+        pysolver_v10.main(river_spot, out, mccfr=True, seed=seed)
+    assert read(outs[0]) == read(outs[1])
+    assert read(outs[0]) != read(outs[2])
+
+
+def test_samples_per_iteration(tmp_path, river_spot):
+    out = str(tmp_path / 'out.json')
+    pysolver_v10.main(river_spot, out, profile=True, mccfr=True, samples=3, seed=1)
+    report = read(report_filename(out))
+    assert report['info']['mccfr_samples'] == 3
+    assert report['counters']['sampled_deals'] == 2 * 3 * report['counters']['iterations']
+
+
+def test_exploitability_falls(tmp_path):
+    lines = list(RIVER_SPOT)
+    lines[10] = '1000'
+    spot = write_spot(tmp_path / 'long.txt', lines)
+    events = []
+    pysolver_v10.main(spot, str(tmp_path / 'out.json'), mccfr=True, seed=3, telemetry=CallbackSink(events.append))
+    checked = [event['exploitability'] for event in events if event['exploitability'] is not None]
+    assert min(checked[-3:]) < checked[0] / 2
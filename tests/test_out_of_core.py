@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+import pysolver_vec
+from pysolver_v10 import Hand, Range
+
+
+def read(path):
+    with open(path, 'rb') as solution_file:
+        return solution_file.read()
+
+
+def test_memory_mapped_state_gives_the_same_solution(tmp_path, river_spot):
+    in_ram, mapped = str(tmp_path / 'ram.json'), str(tmp_path / 'mapped.json')
+    state_dir = tmp_path / 'state'
+    pysolver_vec.main(river_spot, in_ram)
+    tree = pysolver_vec.main(river_spot, mapped, state_dir=str(state_dir))
+    assert read(in_ram) == read(mapped)
+    assert tree.state is None # closed by main
+    assert os.listdir(state_dir) == []
+
+
+def test_state_is_one_mapped_block_in_node_order(tmp_path):
+    pysolver_vec.set_bet_config(['50'], ['50'], [], [], 70)
+    tree = pysolver_vec.VecTree(10, 50, Range([Hand('AsAc'), Hand('QsQc')]), Range([Hand('KsKc')]), 'Td9s5d3c2h', state_dir=str(tmp_path))
+    tree.buildTree()
+    try:
+        assert isinstance(tree.state, np.memmap)
+        offset = 0
+        for node in tree.nodes:
+            if node.kind == 'decision':
+                for values in (node.regrets, node.strat_sum):
+                    assert np.shares_memory(values, tree.state)
+                    assert values.__array_interface__['data'][0] - tree.state.__array_interface__['data'][0] == offset * tree.dtype.itemsize
+                    offset += values.size
+        assert offset == tree.state.size
+    finally:
+        tree.close()
+    assert tree.state is None
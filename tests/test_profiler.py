@@ -0,0 +1,56 @@
+import json
+import time
+
+import pysolver_v10
+from solver_profiler import Profiler, report_filename
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler(enabled=False)
+    profiler.start()
+    with profiler.iteration(0):
+        with profiler.timer('phase'):
+            profiler.count('calls')
+    profiler.set_info(nodes=3)
+    profiler.stop()
+    assert profiler.phases == {} and profiler.counters == {} and profiler.info == {} and profiler.iterations == []
+
+
+def test_iteration_breakdown_adds_up_to_phase_totals():
+    profiler = Profiler()
+    profiler.start()
+    for i in range(3):
+        with profiler.iteration(i):
+            with profiler.timer('a'):
+                time.sleep(0.001)
+            with profiler.timer('b'):
+                pass
+    with profiler.timer('a'): # outside an iteration: only in the phase totals
+        pass
+    profiler.stop()
+    report = profiler.report()
+    assert report['counters']['iterations'] == 3
+    assert report['iteration_summary']['count'] == 3
+    assert [it['iter'] for it in report['iterations']] == [0, 1, 2]
+    assert report['phases']['a']['calls'] == 4 and report['phases']['b']['calls'] == 3
+    assert sum(it['phases']['a'] for it in report['iterations']) <= report['phases']['a']['total_s']
+    json.dumps(report)
+
+
+def test_solve_writes_profile_report(tmp_path, small_spot):
+    out = str(tmp_path / 'out.json')
+    pysolver_v10.main(small_spot, out, profile=True)
+    with open(report_filename(out), 'r') as json_file:
+        report = json.load(json_file)
+    assert report['info']['max_iters'] == 200
+    assert report['info']['num_decision_nodes'] > 0
+    assert report['counters']['iterations'] == report['iteration_summary']['count']
+    assert report['counters']['exploitability_checks'] > 0
+    for phase in ('get_inputs', 'buildTree', 'do_cfr', 'calc_EVs'):
+        assert report['phases'][phase]['calls'] > 0
+
+
+def test_solve_without_profile_writes_no_report(tmp_path, small_spot):
+    out = str(tmp_path / 'out.json')
+    pysolver_v10.main(small_spot, out)
+    assert not (tmp_path / 'out.profile.json').exists()
@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+
+import pysolver_v10
+from conftest import RIVER_SPOT, write_spot
+from pysolver_v10 import Hand, RegretPruning
+from solver_profiler import report_filename
+
+
+def solve(spot, out, **kwargs):
+    pysolver_v10.main(spot, out, profile=True, **kwargs)
+    with open(report_filename(out), 'r') as json_file:
+        return json.load(json_file)
+
+
+def test_full_passes():
+    pruning = RegretPruning(recheck_every=10, start=20)
+    assert all(pruning.full_pass(i) for i in range(20))
+    assert [i for i in range(20, 60) if pruning.full_pass(i)] == [20, 30, 40, 50]
+
+
+def test_only_very_negative_regrets_are_pruned():
+    class Node(object):
+        pot_size = 10
+    hand = Hand('AsAc', 1)
+    hand.cumm_regrets = np.array([-20.0, -5.0, 3.0])
+    assert RegretPruning(regret_threshold=1.0).pruned_actions(hand, Node()).tolist() == [True, False, False]
+    hand.cumm_regrets = np.array([-20.0, -50.0])
+    assert RegretPruning(regret_threshold=1.0).pruned_actions(hand, Node()).tolist() == [False, False]
+
+
+def test_node_value_leaves_pruned_actions_out():
+    pruning = RegretPruning()
+    assert pruning.live_freqs(np.array([0.5, 0.25, 0.25]), np.array([True, False, False])).tolist() == [0, 0.5, 0.5]
+    assert pruning.live_freqs(np.array([1.0, 0.0, 0.0]), np.array([True, False, False])).tolist() == [0, 0.5, 0.5]
+
+
+def test_pruned_solve_does_less_work_and_converges_as_well(tmp_path):
+    lines = list(RIVER_SPOT)
+    lines[10], lines[11] = '400', '0.01'
+    spot = write_spot(tmp_path / 'long.txt', lines)
+    full = solve(spot, str(tmp_path / 'full.json'))
+    pruned = solve(spot, str(tmp_path / 'pruned.json'), prune=True)
+    assert pruned['counters']['pruned_nodes'] > 0
+    assert pruned['counters']['hand_action_EV_evals'] < full['counters']['hand_action_EV_evals']
+    assert pruned['info']['final_exploitability'] < 1.25 * full['info']['final_exploitability']
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+import solver_range_sweep
+from solver_range_sweep import make_chains, variant_distance, variant_weights
+
+
+BASE_WEIGHTS = [{'AsAc': 1, 'QsQc': 0.5}, {'KsKc': 1}]
+
+
+def variant(name, OOP=None, IP=None):
+    return {'name': name, 'OOP': OOP or {}, 'IP': IP or {}}
+
+
+def test_variant_weights_cover_every_combo():
+    assert variant_weights(BASE_WEIGHTS, variant('a', {'QsQc': 2})) == [{'AsAc': 1, 'QsQc': 1.0}, {'KsKc': 1}]
+    with pytest.raises(ValueError):
+        variant_weights(BASE_WEIGHTS, variant('b', IP={'AsAc': 2}))
+
+
+def test_distance_and_chains():
+    variants = [variant('far', {'AsAc': 8}), variant('same'), variant('near', {'AsAc': 2}), variant('none', {'AsAc': 0})]
+    assert variant_distance(variants[1], variant('base')) == 0
+    assert variant_distance(variants[2], variants[0]) == pytest.approx(variant_distance(variant('x', {'AsAc': 4}), variants[1]))
+    assert variant_distance(variants[3], variants[1]) == 10
+    assert make_chains(variants, 2) == [[1, 0], [2, 3]]
+    assert make_chains(variants, 8) == [[1], [2], [0], [3]]
+
+
+def test_range_sweep_chains_variants_from_the_base(tmp_path, river_spot):
+    variants = [variant('same'), variant('fewer aces', {'AsAc': 0.5, 'AdAh': 0.5})]
+    rows = solver_range_sweep.range_sweep(river_spot, str(tmp_path / 'sweep'), variants, processes=1, variant_iters=20)
+    base, same, fewer = rows
+    assert base['variant'] == 'base' and base['iterations'] == 80
+    assert same['warm_start'] == 'base' and fewer['warm_start'] == 'same'
+    assert same['iterations'] <= 20 and fewer['iterations'] <= 20
+    # the same weights carry on from the base solution
+    assert same['OOP_EV'] == pytest.approx(base['OOP_EV'], abs=0.5)
+    for row in rows:
+        assert os.path.exists(row['solution'])
+        assert sum(row['root_strategy'].values()) == pytest.approx(1)
+    assert os.path.basename(fewer['solution']) == 'fewer_aces.json'
+
+
+def test_range_sweep_from_base_solution(tmp_path, river_spot):
+    first = solver_range_sweep.range_sweep(river_spot, str(tmp_path / 'first'), [variant('same')], variant_iters=5)
+    rows = solver_range_sweep.range_sweep(river_spot, str(tmp_path / 'second'), [variant('same')], variant_iters=5,
+                                          base_solution=first[0]['solution'])
+    assert rows[0]['warm_start'] == 'base.json'
+    assert rows[0]['exploitability'] is not None
+    assert rows[0]['OOP_EV'] == pytest.approx(first[0]['OOP_EV'], abs=0.05)
@@ -0,0 +1,64 @@
+import json
+import os
+import time
+
+from treys import Card, Evaluator
+
+import pysolver_v10
+from solver_cache import COMBOS, RankCache, canonical_board, combo_index
+
+
+BOARD = 'Td9s5d3c2h'
+
+
+def test_combo_index_ignores_card_order():
+    assert combo_index('AsAc') == combo_index('AcAs')
+    assert COMBOS[combo_index('2c2d')] == '2c2d'
+
+
+def test_ranks_match_treys_and_are_zero_where_blocked(tmp_path):
+    cache = RankCache(str(tmp_path))
+    ranks = cache.ranks(BOARD)
+    evaluator = Evaluator()
+    board = [Card.new(BOARD[i:i + 2]) for i in range(0, 10, 2)]
+    for combo in ('AsAc', 'KdKh', '7s6s', '4d4h'):
+        assert ranks[combo_index(combo)] == evaluator.evaluate(board, [Card.new(combo[:2]), Card.new(combo[2:])])
+    assert ranks[combo_index('TdAs')] == 0
+    assert (ranks == 0).sum() == 1326 - 1081
+
+
+def test_board_order_shares_an_entry(tmp_path):
+    cache = RankCache(str(tmp_path))
+    cache.ranks(BOARD)
+    cache.ranks(''.join(reversed([BOARD[i:i + 2] for i in range(0, 10, 2)])))
+    assert canonical_board(BOARD) == canonical_board('2h3c5d9sTd')
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert RankCache(str(tmp_path)).ranks(BOARD) is not None
+    assert cache.stats()['boards'] == 1
+
+
+def test_least_recently_used_boards_are_evicted(tmp_path):
+    cache = RankCache(str(tmp_path), max_bytes=int(2.5 * (1326 * 4 + 128)))
+    boards = ['Td9s5d3c2h', 'Kh9s5d3c2h', 'Qh9s5d3c2h']
+    cache.ranks(boards[0])
+    cache.ranks(boards[1])
+    old = time.time() - 100
+    os.utime(cache.path(boards[1]), (old, old))
+    cache.ranks(boards[0]) # touched, so boards[1] is the least recently used
+    cache.ranks(boards[2])
+    assert os.path.exists(cache.path(boards[0])) and os.path.exists(cache.path(boards[2]))
+    assert not os.path.exists(cache.path(boards[1]))
+
+
+def test_equity_matrix(tmp_path):
+    cache = RankCache(str(tmp_path))
+    equity = cache.equity_matrix(BOARD, ['AsAc', '4d4h'], ['KsKc', '4s4c'])
+    assert equity.tolist() == [[1, 1], [0, 0.5]]
+
+
+def test_solve_with_rank_cache_gives_same_solution(tmp_path, river_spot):
+    plain, cached = str(tmp_path / 'plain.json'), str(tmp_path / 'cached.json')
+    pysolver_v10.main(river_spot, plain)
+    pysolver_v10.main(river_spot, cached, rank_cache=str(tmp_path / 'cache'))
+    with open(plain, 'r') as plain_file, open(cached, 'r') as cached_file:
+        assert json.load(plain_file) == json.load(cached_file)
@@ -0,0 +1,29 @@
+import json
+
+import pysolver_v10
+
+
+def test_verification_resolve_keeps_check_schedule_and_time_budget(monkeypatch, tmp_path, river_spot):
+    calls = []
+    do_cfr = pysolver_v10.Tree.do_cfr
+    def recorded_do_cfr(self, max_iter, target_expl, json_filename, profiler=None, telemetry=None, check_schedule=None, max_seconds=None,
+                        *args, **kwargs):
+        calls.append((max_iter, check_schedule, max_seconds, None if check_schedule is None else check_schedule.last_iter))
+        return do_cfr(self, max_iter, target_expl, json_filename, profiler, telemetry, check_schedule, max_seconds, *args, **kwargs)
+    monkeypatch.setattr(pysolver_v10.Tree, 'do_cfr', recorded_do_cfr)
+    pysolver_v10.main(river_spot, str(tmp_path / 'out.json'), prune_sizes=True, adaptive_checks=True, max_seconds=1000)
+    assert len(calls) == 2 # the spot's pruned tree is worse on the full tree, so it is re-solved
+    (_, schedule, budget, last_iter), (verify_iters, verify_schedule, verify_budget, verify_last_iter) = calls
+    assert last_iter == 79
+    assert verify_schedule is schedule and verify_last_iter == verify_iters - 1
+    assert 0 < verify_budget < budget
+
+
+def test_pruned_sizes_come_back_at_zero(tmp_path, river_spot):
+    out = str(tmp_path / 'out.json')
+    pysolver_v10.main(river_spot, out, prune_sizes=True)
+    full = str(tmp_path / 'full.json')
+    pysolver_v10.main(river_spot, full)
+    with open(out) as pruned_file, open(full) as full_file:
+        pruned, unpruned = json.load(pruned_file), json.load(full_file)
+    assert [node['atn-sq'] for node in pruned] == [node['atn-sq'] for node in unpruned]
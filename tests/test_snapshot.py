@@ -0,0 +1,91 @@
+import json
+import multiprocessing
+import os
+import time
+
+import pytest
+
+import pysolver_v10
+import pysolver_vec
+from solver_snapshot import SnapshotReader, SnapshotWriter
+
+
+def snapshot_strats(path):
+    reader = SnapshotReader(path)
+    try:
+        snapshot = reader.read()
+        assert snapshot['finished']
+        return {tuple(node['atn-sq']): node['rg-strat'] for node in reader.solution(snapshot)}
+    finally:
+        reader.close()
+
+
+def solution_strats(path):
+    with open(path, 'r') as json_file:
+        return {tuple(node['atn-sq']): node['rg-strat'] for node in json.load(json_file) if node['avl-acs']}
+
+
+def assert_same_strats(snapshot, solution):
+    assert snapshot.keys() == solution.keys()
+    for seq, strats in solution.items():
+        assert snapshot[seq].keys() == strats.keys(), seq
+        for combo, strat in strats.items():
+            assert snapshot[seq][combo] == pytest.approx(strat, abs=1e-12), (seq, combo)
+
+
+def test_final_snapshot_matches_solution(tmp_path, river_spot):
+    out, snap = str(tmp_path / 'out.json'), str(tmp_path / 'spot.snap')
+    pysolver_v10.main(river_spot, out, snapshot=snap, snapshot_every=5)
+    assert_same_strats(snapshot_strats(snap), solution_strats(out))
+
+
+def test_final_snapshot_matches_solution_with_size_pruning(tmp_path, river_spot):
+    # prune_sizes rebuilds the tree with renumbered node IDs, the snapshot has to follow the nodes by action sequence
+    out, snap = str(tmp_path / 'out.json'), str(tmp_path / 'spot.snap')
+    pysolver_v10.main(river_spot, out, prune_sizes=True, snapshot=snap, snapshot_every=5)
+    assert_same_strats(snapshot_strats(snap), solution_strats(out))
+
+
+def test_final_snapshot_matches_vec_solution(tmp_path, river_spot):
+    out, snap = str(tmp_path / 'out.json'), str(tmp_path / 'spot.snap')
+    pysolver_vec.main(river_spot, out, snapshot=snap, snapshot_every=5)
+    assert_same_strats(snapshot_strats(snap), solution_strats(out))
+
+
+def republish(path, stop):
+    writer = SnapshotWriter(path + '.w', {'nodes': [{'id': 0, 'atn-sq': [], 'avl-acs': ['X', 'B50'], 'player': 0,
+                                                    'combos': [f'c{i}' for i in range(5000)], 'batch': None}]})
+    os.replace(path + '.w', path)
+    i = 0
+    while not stop.is_set():
+        writer.begin()
+        writer.values[:] = i # every value of one publish is the same, a torn read mixes two
+        writer.end(i)
+        i += 1
+    writer.close()
+
+
+def test_reads_during_constant_republishing_are_never_torn(tmp_path):
+    path = str(tmp_path / 'stress.snap')
+    stop = multiprocessing.Event()
+    writer = multiprocessing.Process(target=republish, args=(path, stop))
+    writer.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not os.path.exists(path):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        reader = SnapshotReader(path)
+        iterations = set()
+        for _ in range(2000):
+            snapshot = reader.read(timeout=10)
+            values = snapshot['values']
+            assert (values == values[0]).all()
+            if snapshot['iteration'] >= 0:
+                assert values[0] == snapshot['iteration']
+            iterations.add(snapshot['iteration'])
+        reader.close()
+        assert len(iterations) > 1
+    finally:
+        stop.set()
+        writer.join()
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+import pysolver_v10
+from conftest import write_spot
+from solver_store import CanonicalSpot, SolutionStore, engine_name
+
+
+def canonical_spot(spot_file):
+    potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh, _, _ = pysolver_v10.get_inputs(spot_file)
+    return CanonicalSpot(potsz, stacksz, OOP_range, IP_range, board, OOP_b_szs, IP_b_szs, OOP_r_szs, IP_r_szs, AI_thresh)
+
+
+def test_iterations_only_count_for_the_same_engine(tmp_path, small_spot):
+    spot = canonical_spot(small_spot)
+    with SolutionStore(str(tmp_path / 'store')) as store:
+        mccfr = store.put(spot, [], engine_name('v10-mccfr'), iterations=120, exploitability=9.87)
+        assert store.lookup(spot, 0.7, 60, engine_name('v10')) is None
+        assert store.lookup(spot, 0.7, 60, engine_name('v10', 'float32')) is None
+        assert store.lookup(spot, 0.7, 60) is None
+        assert store.lookup(spot, 0.7, 60, engine_name('v10-mccfr'))['id'] == mccfr
+        full = store.put(spot, [], engine_name('v10'), iterations=60, exploitability=2.0)
+        assert store.lookup(spot, 0.7, 60, engine_name('v10'))['id'] == full
+        assert store.lookup(spot, 0.7, 60, engine_name('vec')) is None
+
+
+def test_precise_solution_is_a_hit_for_any_engine(tmp_path, small_spot):
+    spot = canonical_spot(small_spot)
+    with SolutionStore(str(tmp_path / 'store')) as store:
+        entry = store.put(spot, [], engine_name('v10-mccfr', 'float32'), iterations=5000, exploitability=0.5)
+        assert store.lookup(spot, 0.7, 100000, engine_name('vec'))['id'] == entry
+
+
+def test_mccfr_solution_is_not_returned_for_a_full_width_solve(tmp_path, small_spot):
+    store = str(tmp_path / 'store')
+    pysolver_v10.main(small_spot, str(tmp_path / 'mccfr.json'), store=store, mccfr=True, seed=1)
+    with SolutionStore(store) as solutions:
+        [entry] = solutions.query()
+    assert entry['engine'] == 'v10-mccfr'
+    pysolver_v10.main(small_spot, str(tmp_path / 'full.json'), store=store)
+    with SolutionStore(store) as solutions:
+        assert sorted(entry['engine'] for entry in solutions.query()) == ['v10', 'v10-mccfr']
+
+
+def test_suit_isomorphic_spot_is_a_hit_in_its_own_suits(tmp_path, river_spot):
+    store = str(tmp_path / 'store')
+    pysolver_v10.main(river_spot, str(tmp_path / 'first.json'), store=store)
+    swap = str.maketrans('shcd', 'hsdc')
+    lines = open(river_spot).read().splitlines()
+    # suits swapped, and the cards of every combo spelled the other way round
+    for i in (2, 3):
+        lines[i] = ', '.join(combo.strip()[2:] + combo.strip()[:2] for combo in lines[i].translate(swap).split(','))
+    lines[4] = lines[4].translate(swap)
+    swapped = write_spot(tmp_path / 'swapped.txt', lines)
+    pysolver_v10.main(swapped, str(tmp_path / 'second.json'), store=store)
+    with SolutionStore(store) as solutions:
+        assert len(solutions.query()) == 1
+
+    with open(tmp_path / 'first.json', 'r') as first_file, open(tmp_path / 'second.json', 'r') as second_file:
+        first = {tuple(node['atn-sq']): node for node in json.load(first_file)}
+        second = {tuple(node['atn-sq']): node for node in json.load(second_file)}
+    assert first.keys() == second.keys()
+    for seq, node in first.items():
+        expected = {(combo[2:] + combo[:2]).translate(swap): strat for combo, strat in node['rg-strat'].items()}
+        assert second[seq]['rg-strat'] == pytest.approx(expected), seq
+
+
+def test_other_bet_sizes_are_another_spot(small_spot):
+    spot = canonical_spot(small_spot)
+    lines = open(small_spot).read().splitlines()
+    lines[5] = '50'
+    other = canonical_spot(write_spot(small_spot + '.other', lines))
+    assert spot.board_class == other.board_class
+    assert spot.key != other.key
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import pysolver_v10
+from pysolver_v10 import Hand, Range, merge_solution, reach_ranges, subgame_reach
+
+
+SOLUTION = [
+    {'id': 0, 'atn-sq': [], 'avl-acs': ['X', 'B50'], 'rg-strat': {'AsAc': [0.25, 0.75], 'QsQc': [1.0, 0.0]}},
+    {'id': 1, 'atn-sq': ['B50'], 'avl-acs': ['F', 'C'], 'rg-strat': {'KsKc': [0.5, 0.5], 'JsJc': [0.0, 1.0]}},
+    {'id': 2, 'atn-sq': ['B50', 'C'], 'avl-acs': None, 'rg-strat': {}},
+]
+
+
+def test_subgame_reach_multiplies_each_players_actions():
+    assert subgame_reach(SOLUTION, ['B50']) == [{'AsAc': 0.75, 'QsQc': 0.0}, {}]
+    assert subgame_reach(SOLUTION, ['B50', 'C']) == [{'AsAc': 0.75, 'QsQc': 0.0}, {'KsKc': 0.5, 'JsJc': 1.0}]
+    with pytest.raises(ValueError):
+        subgame_reach(SOLUTION, ['B75'])
+
+
+def test_reach_ranges_drops_combos_without_reach():
+    OOP_range, IP_range = reach_ranges(Range([Hand('AsAc', 1), Hand('QsQc', 0.5)]), Range([Hand('KsKc', 1)]),
+                                       [{'AsAc': 0.75, 'QsQc': 0.0}, {}])
+    assert [(hand.hand, hand.weighting) for hand in OOP_range.hands_list] == [('AsAc', 0.75)]
+    assert [(hand.hand, hand.weighting) for hand in IP_range.hands_list] == [('KsKc', 1)]
+
+
+def test_merge_keeps_parent_ids_and_combos_the_subgame_dropped():
+    subgame = [{'id': 0, 'atn-sq': ['B50'], 'avl-acs': ['F', 'C'], 'rg-strat': {'KsKc': [0.1, 0.9]}, 'act-EVs': {}, 'rg-EVs': {}}]
+    parent = [dict(node, **{'act-EVs': {}, 'rg-EVs': {}}) for node in SOLUTION]
+    merged = merge_solution(parent, subgame)
+    assert [node['id'] for node in merged] == [0, 1, 2]
+    assert merged[1]['rg-strat'] == {'KsKc': [0.1, 0.9], 'JsJc': [0.0, 1.0]}
+    assert merged[0] is parent[0]
+
+
+def test_subgame_solve_merged_into_parent(tmp_path, river_spot):
+    parent = str(tmp_path / 'parent.json')
+    pysolver_v10.main(river_spot, parent)
+    sub, merged = str(tmp_path / 'sub.json'), str(tmp_path / 'merged.json')
+    pysolver_v10.main(river_spot, sub, subgame='X', reach=parent)
+    pysolver_v10.main(river_spot, merged, subgame='X', reach=parent, merge_into=parent)
+    with open(parent, 'r') as parent_file, open(sub, 'r') as sub_file, open(merged, 'r') as merged_file:
+        parent, sub, merged = json.load(parent_file), json.load(sub_file), json.load(merged_file)
+    assert all(node['atn-sq'][:1] == ['X'] for node in sub)
+    assert [node['atn-sq'] for node in merged] == [node['atn-sq'] for node in parent]
+    by_seq = {tuple(node['atn-sq']): node for node in sub}
+    for parent_node, merged_node in zip(parent, merged):
+        sub_node = by_seq.get(tuple(parent_node['atn-sq']))
+        if sub_node is None:
+            assert merged_node == parent_node
+        else:
+            assert merged_node['id'] == parent_node['id']
+            for combo, strat in sub_node['rg-strat'].items():
+                assert merged_node['rg-strat'][combo] == strat
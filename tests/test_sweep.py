@@ -0,0 +1,44 @@
+import os
+
+import solver_sweep
+from solver_sweep import config_contains, config_distance, config_name, config_union, parse_options, size_grid
+
+
+def config(OOP_bets, IP_bets=(), OOP_raises=(), IP_raises=()):
+    return {'OOP_bets': list(OOP_bets), 'IP_bets': list(IP_bets), 'OOP_raises': list(OOP_raises), 'IP_raises': list(IP_raises)}
+
+
+def test_parse_options_and_grid():
+    assert parse_options('33,75;150;', ['50']) == [['33', '75'], ['150'], []]
+    assert parse_options(None, ['50']) == [['50']]
+    assert parse_options('A', []) == [['a']]
+    grid = size_grid([['33'], ['75']], [['50']], [[]], [['100'], []])
+    assert len(grid) == 4 and grid[0] == config(['33'], ['50'], [], ['100'])
+
+
+def test_union_contains_every_config():
+    configs = [config(['33']), config(['75', 'a'], ['50'])]
+    union = config_union(configs)
+    assert union == config(['33', '75', 'a'], ['50'])
+    assert all(config_contains(union, c) for c in configs)
+    assert not config_contains(configs[0], union)
+    assert config_distance(configs[0], union) == 3
+    assert config_name(configs[0]) == 'OOP_bets-33_IP_bets-none_OOP_raises-none_IP_raises-none'
+
+
+def test_sweep_warm_starts_from_the_union(tmp_path, river_spot):
+    configs = [config(['33'], ['50']), config(['75'], ['50'])]
+    rows = solver_sweep.sweep(river_spot, str(tmp_path / 'sweep'), configs, processes=2, warm_iters=20)
+    assert len(rows) == 3 # the union is added
+    union = rows[2]
+    assert union['config'] == config_name(config(['33', '75'], ['50']))
+    assert union['warm_start'] is None and union['iterations'] == 80
+    for row in rows[:2]:
+        assert row['warm_start'] == os.path.basename(union['solution'])
+        assert row['warm_weight'] == 80 and row['iterations'] <= 20
+        assert row['num_nodes'] < union['num_nodes']
+    for row in rows:
+        assert os.path.exists(row['solution'])
+        assert row['OOP_EV'] + row['IP_EV'] == 10
+    solver_sweep.write_summary(rows, str(tmp_path / 'sweep'))
+    assert os.path.exists(tmp_path / 'sweep' / 'sweep.csv')
@@ -0,0 +1,68 @@
+import csv
+import json
+
+import pysolver_v10
+from solver_telemetry import ITERATION_FIELDS, CallbackSink, CSVSink, JSONLSink, MultiSink, open_sink
+
+
+def test_open_sink_picks_format_from_extension(tmp_path):
+    csv_sink = open_sink(str(tmp_path / 'stats.CSV'))
+    jsonl_sink = open_sink(str(tmp_path / 'stats.jsonl'))
+    try:
+        assert isinstance(csv_sink, CSVSink) and isinstance(jsonl_sink, JSONLSink)
+    finally:
+        csv_sink.close()
+        jsonl_sink.close()
+
+
+def test_jsonl_sink_rotates_and_keeps_backup_count(tmp_path):
+    path = tmp_path / 'stats.jsonl'
+    with JSONLSink(str(path), max_bytes=100, backup_count=2) as sink:
+        for i in range(50):
+            sink.record({'iter': i, 'exploitability': None})
+    assert (tmp_path / 'stats.jsonl.1').exists() and (tmp_path / 'stats.jsonl.2').exists()
+    assert not (tmp_path / 'stats.jsonl.3').exists()
+    last = [json.loads(line) for line in path.read_text().splitlines()]
+    assert last[-1]['iter'] == 49
+    previous = [json.loads(line) for line in (tmp_path / 'stats.jsonl.1').read_text().splitlines()]
+    assert previous[-1]['iter'] == last[0]['iter'] - 1
+
+
+def test_csv_sink_writes_header_in_every_file(tmp_path):
+    path = tmp_path / 'stats.csv'
+    with CSVSink(str(path), max_bytes=200, backup_count=1) as sink:
+        for i in range(20):
+            sink.record({'iter': i, 'iter_s': 0.5, 'unknown': 'dropped'})
+    for name in ('stats.csv', 'stats.csv.1'):
+        with open(tmp_path / name, newline='') as csv_file:
+            rows = list(csv.reader(csv_file))
+        assert rows[0] == ITERATION_FIELDS
+        assert all(len(row) == len(ITERATION_FIELDS) for row in rows)
+
+
+def test_multi_sink_fans_out_and_closes_all(tmp_path):
+    first, second = [], []
+    jsonl = JSONLSink(str(tmp_path / 'stats.jsonl'))
+    sink = MultiSink([CallbackSink(first.append), CallbackSink(second.append), jsonl])
+    sink.record({'iter': 0})
+    sink.close()
+    assert first == second == [{'iter': 0}]
+    assert jsonl.file.closed
+
+
+def test_solve_records_one_event_per_iteration(tmp_path, small_spot):
+    events = []
+    pysolver_v10.main(small_spot, str(tmp_path / 'out.json'), telemetry=CallbackSink(events.append))
+    assert [event['iter'] for event in events] == list(range(len(events)))
+    assert all(set(ITERATION_FIELDS) <= set(event) for event in events)
+    checked = [event for event in events if event['exploitability'] is not None]
+    assert checked
+    assert all(event['exploitability'] == max(event['OOP_exploitability'], event['IP_exploitability']) for event in checked)
+    assert all(event['regret_max'] is not None and event['hands_updated'] > 0 for event in events)
+
+
+def test_solve_writes_telemetry_file(tmp_path, small_spot):
+    path = tmp_path / 'stats.jsonl'
+    pysolver_v10.main(small_spot, str(tmp_path / 'out.json'), telemetry=str(path))
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert events and events[0]['iter'] == 0
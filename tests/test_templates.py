@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+import pysolver_v10
+import pysolver_vec
+from solver_templates import TemplateCache, template_key
+
+
+def read(path):
+    with open(path, 'rb') as solution_file:
+        return solution_file.read()
+
+
+def test_key_depends_on_the_bet_config_only():
+    key = template_key(10, 50, ['33', '75'], ['50'], ['100'], [], 70)
+    assert key == template_key(10.0, 50.0, ['33', '75'], ['50'], ['100'], [], 70)
+    assert key != template_key(10, 50, ['33'], ['50'], ['100'], [], 70)
+    assert key != template_key(10, 60, ['33', '75'], ['50'], ['100'], [], 70)
+
+
+def test_cache_builds_each_shape_once_across_instances(tmp_path):
+    built = []
+    def build():
+        built.append(1)
+        return pysolver_v10.tree_template(10, 50)
+    pysolver_v10.set_bet_config(['33'], ['50'], [], [], 70)
+    key = template_key(10, 50, ['33'], ['50'], [], [], 70)
+    first = TemplateCache(str(tmp_path))
+    template = first.get(key, build)
+    assert template.key == key
+    assert first.get(key, build) is template
+    second = TemplateCache(str(tmp_path))
+    assert second.get(key, build).action_seqs() == template.action_seqs()
+    assert len(built) == 1
+    assert (first.stats()['misses'], first.stats()['hits'], second.stats()['hits']) == (1, 1, 1)
+
+
+def test_lru_keeps_max_entries():
+    cache = TemplateCache(max_entries=2)
+    pysolver_v10.set_bet_config(['33'], ['50'], [], [], 70)
+    for key in 'abc':
+        cache.get(key, lambda: pysolver_v10.tree_template(10, 50))
+    assert list(cache.templates) == ['b', 'c']
+
+
+@pytest.mark.parametrize('solver', [pysolver_v10, pysolver_vec])
+def test_solutions_are_byte_identical_with_templates(tmp_path, river_spot, solver):
+    plain, templated, reused = (str(tmp_path / f'{name}.json') for name in ('plain', 'templated', 'reused'))
+    templates = str(tmp_path / 'templates')
+    solver.main(river_spot, plain)
+    solver.main(river_spot, templated, templates=templates)
+    solver.main(river_spot, reused, templates=templates) # from the template file written by the first solve
+    assert len(os.listdir(templates)) == 1
+    assert read(plain) == read(templated) == read(reused)
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+import pysolver_vec
+from solver_telemetry import CallbackSink
+from conftest import RIVER_SPOT, write_spot
+
+
+@pytest.fixture
+def turn_spot(tmp_path):
+    '''RIVER_SPOT on the turn with one bet size per player'''
+    lines = list(RIVER_SPOT)
+    lines[4], lines[6], lines[7], lines[8], lines[10] = 'Td9s5d3c', '', '', '', '40'
+    return write_spot(tmp_path / 'turn.txt', lines)
+
+
+def solve(spot, out, **kwargs):
+    pysolver_vec.main(spot, out, profile=True, **kwargs)
+    with open(out, 'r') as json_file:
+        nodes = {tuple(node['atn-sq']): node for node in json.load(json_file)}
+    with open(out.replace('.json', '.profile.json'), 'r') as json_file:
+        return nodes, json.load(json_file)['info']
+
+
+def test_turn_chance_nodes_deal_every_river_card(tmp_path, turn_spot):
+    nodes, info = solve(turn_spot, str(tmp_path / 'out.json'))
+    assert info['street'] == 'turn'
+    rivers = nodes[('X', 'X')]['avl-acs']
+    assert len(rivers) == 48 and not {'Td', '9s', '5d', '3c'} & set(rivers)
+    for river in rivers:
+        assert ('X', 'X', river) in nodes and ('B33', 'C', river) in nodes
+
+
+def test_river_card_combos_are_masked_out(tmp_path, turn_spot):
+    nodes, _ = solve(turn_spot, str(tmp_path / 'out.json'))
+    assert 'AsAc' not in nodes[('X', 'X', 'As')]['rg-strat']
+    assert 'AsAc' in nodes[('X', 'X', 'Ad')]['rg-strat']
+    assert 'KsKc' not in nodes[('X', 'X', 'Ks', 'X')]['rg-strat']
+    for node in nodes.values():
+        for combo, strat in node['rg-strat'].items():
+            assert sum(strat) == pytest.approx(1), (node['atn-sq'], combo)
+
+
+def test_turn_exploitability_falls_with_iterations(tmp_path, turn_spot):
+    _, info_few = solve(turn_spot, str(tmp_path / 'few.json'))
+    lines = open(turn_spot).read().splitlines()
+    lines[10] = '200'
+    longer = write_spot(tmp_path / 'longer.txt', lines)
+    _, info_many = solve(longer, str(tmp_path / 'many.json'))
+    assert info_many['final_exploitability'] < info_few['final_exploitability']
+
+
+def test_river_spot_converges(tmp_path, river_spot):
+    events = []
+    _, info = solve(river_spot, str(tmp_path / 'out.json'), telemetry=CallbackSink(events.append))
+    assert info['street'] == 'river'
+    checked = [event['exploitability'] for event in events if event['exploitability'] is not None]
+    assert checked[-1] < checked[0] / 2
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+
+import pytest
+
+from solver_worker import SQLiteQueue, Worker
+from conftest import SMALL_SPOT
+
+
+INPUTS = '\n'.join(SMALL_SPOT) + '\n'
+
+
+def claim_all(directory, worker, claimed):
+    with SQLiteQueue(directory) as queue:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                return
+            claimed.put(job['id'])
+
+
+def test_claims_are_exclusive_across_processes(tmp_path):
+    with SQLiteQueue(str(tmp_path)) as queue:
+        ids = [queue.submit(INPUTS, name=f'spot{i}') for i in range(40)]
+    claimed = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=claim_all, args=(str(tmp_path), f'w{k}', claimed)) for k in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    got = [claimed.get(timeout=5) for _ in range(len(ids))]
+    assert sorted(got) == ids
+    assert claimed.empty()
+
+
+def test_claim_order_is_priority_then_age(tmp_path):
+    with SQLiteQueue(str(tmp_path)) as queue:
+        first = queue.submit(INPUTS)
+        urgent = queue.submit(INPUTS, priority=1)
+        second = queue.submit(INPUTS)
+        assert [queue.claim('w')['id'] for _ in range(3)] == [urgent, first, second]
+        assert queue.claim('w') is None
+
+
+def test_stale_jobs_are_requeued_until_out_of_attempts(tmp_path):
+    with SQLiteQueue(str(tmp_path)) as queue:
+        job_id = queue.submit(INPUTS, max_attempts=2)
+        assert queue.claim('crashed')['attempts'] == 1
+        assert queue.reclaim_stale(lease=60) == 0 # heartbeat is fresh
+        assert queue.reclaim_stale(lease=-1) == 1
+        job = queue.get(job_id)
+        assert job['status'] == 'queued' and job['worker'] is None and 'crashed' in job['error']
+        assert queue.claim('crashed again')['attempts'] == 2
+        assert queue.reclaim_stale(lease=-1) == 1
+        assert queue.get(job_id)['status'] == 'failed'
+        assert queue.claim('w') is None
+
+
+def test_reclaimed_worker_cannot_complete(tmp_path):
+    with SQLiteQueue(str(tmp_path)) as queue:
+        job_id = queue.submit(INPUTS)
+        queue.claim('slow')
+        queue.reclaim_stale(lease=-1)
+        queue.claim('fast')
+        assert not queue.heartbeat(job_id, 'slow')
+        assert not queue.complete(job_id, 'slow', 'slow.json')
+        assert not queue.fail(job_id, 'slow', 'error')
+        assert queue.heartbeat(job_id, 'fast', 10, 1.5)
+        assert queue.complete(job_id, 'fast', 'fast.json')
+        job = queue.get(job_id)
+        assert (job['status'], job['worker'], job['result']) == ('done', 'fast', 'fast.json')
+
+
+def test_unknown_engine_is_rejected(tmp_path):
+    with SQLiteQueue(str(tmp_path)) as queue:
+        with pytest.raises(ValueError):
+            queue.submit(INPUTS, engine='v8')
+
+
+@pytest.mark.parametrize('engine', ['v10', 'vec'])
+def test_worker_solves_the_queue(tmp_path, engine):
+    with SQLiteQueue(str(tmp_path)) as queue:
+        job_id = queue.submit(INPUTS, engine=engine)
+        worker = Worker(queue, worker_id='w')
+        assert worker.run() == 1
+        job = queue.get(job_id)
+    assert job['status'] == 'done'
+    assert job['result'] == os.path.join(str(tmp_path), 'results', f'job-{job_id}-1.json')
+    assert os.path.exists(job['result'])
+    assert job['exploitability'] is not None and job['iteration'] is not None
+    assert os.path.exists(os.path.join(str(tmp_path), 'results', f'job-{job_id}-1.telemetry.jsonl'))